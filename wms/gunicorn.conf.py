@@ -0,0 +1,17 @@
+# Picked up automatically by a plain `gunicorn` started from this folder.
+#
+# By default the ASGI app runs on uvicorn workers, so async views keep
+# serving other requests while one waits on the database or a report.
+# GUNICORN_MODE=wsgi goes back to sync workers and wms.wsgi.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+if os.environ.get("GUNICORN_MODE", "asgi") == "wsgi":
+    wsgi_app = "wms.wsgi:application"
+    worker_class = "sync"
+else:
+    wsgi_app = "wms.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
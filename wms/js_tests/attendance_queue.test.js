@@ -0,0 +1,194 @@
+/*
+ * The offline attendance queue against a local stand-in for the sync
+ * endpoint. Run with: node --test js_tests/
+ */
+"use strict";
+
+var test = require("node:test");
+var assert = require("node:assert");
+
+var AttendanceQueue = require("../static/js/attendance_queue.js").AttendanceQueue;
+
+
+function memoryStorage() {
+    var items = {};
+    return {
+        getItem: function (key) { return key in items ? items[key] : null; },
+        setItem: function (key, value) { items[key] = String(value); }
+    };
+}
+
+// Upserts on (worker, date, slot) like the real endpoint; fails while
+// ``offline`` is set, refuses the workers in ``refuse`` (worker -> reason),
+// and can hold a reply until ``release`` is called.
+function fakeServer() {
+    var server = { rows: {}, batches: [], offline: false, hold: false, pending: [], refuse: {} };
+
+    server.send = function (marks) {
+        if (server.offline) {
+            return Promise.reject(Object.assign(new Error("offline"), { status: 0 }));
+        }
+        server.batches.push(marks);
+        var rejected = [];
+        marks.forEach(function (mark) {
+            if (server.refuse[mark.worker]) {
+                rejected.push({ mark: mark, reason: server.refuse[mark.worker] });
+            } else {
+                server.rows[mark.date + ":" + mark.slot + ":" + mark.worker] = mark.present;
+            }
+        });
+        var reply = { inserted: marks.length - rejected.length, rejected: rejected };
+        if (!server.hold) {
+            return Promise.resolve(reply);
+        }
+        return new Promise(function (resolve) {
+            server.pending.push(function () { resolve(reply); });
+        });
+    };
+
+    server.release = function () {
+        server.pending.splice(0).forEach(function (resolve) { resolve(); });
+    };
+
+    return server;
+}
+
+function mark(worker, present) {
+    return { worker: worker, slot: 1, date: "2026-01-31", present: present, at: "2026-01-31T08:00:00.000Z" };
+}
+
+
+test("toggles of one worker collapse and are sent in batches", async function () {
+    var server = fakeServer();
+    var queue = AttendanceQueue.createQueue({ storage: memoryStorage(), send: server.send, batchSize: 2 });
+
+    queue.add([mark(1, true), mark(2, true), mark(3, true)]);
+    queue.add([mark(1, false)]);
+    assert.strictEqual(queue.size(), 3);
+
+    assert.strictEqual(await queue.flush(), 0);
+    assert.deepStrictEqual(server.batches.map(function (batch) { return batch.length; }), [2, 1]);
+    assert.deepStrictEqual(server.rows, {
+        "2026-01-31:1:1": false,
+        "2026-01-31:1:2": true,
+        "2026-01-31:1:3": true
+    });
+});
+
+test("a failed batch stays queued, across a reload, until it is sent", async function () {
+    var server = fakeServer();
+    var storage = memoryStorage();
+    var queue = AttendanceQueue.createQueue({ storage: storage, send: server.send });
+
+    server.offline = true;
+    queue.add([mark(1, true)]);
+    await assert.rejects(queue.flush());
+    assert.strictEqual(queue.size(), 1);
+
+    server.offline = false;
+    var reloaded = AttendanceQueue.createQueue({ storage: storage, send: server.send });
+    assert.strictEqual(reloaded.size(), 1);
+    assert.strictEqual(await reloaded.flush(), 0);
+    assert.strictEqual(server.rows["2026-01-31:1:1"], true);
+});
+
+test("resending a batch whose reply was lost changes nothing", async function () {
+    var server = fakeServer();
+    var queue = AttendanceQueue.createQueue({ storage: memoryStorage(), send: server.send });
+
+    queue.add([mark(1, true), mark(2, false)]);
+    await queue.flush();
+    var rows = Object.assign({}, server.rows);
+
+    queue.add([mark(1, true), mark(2, false)]);
+    await queue.flush();
+    assert.deepStrictEqual(server.rows, rows);
+});
+
+test("a worker toggled again while its batch is in flight is sent again", async function () {
+    var server = fakeServer();
+    var queue = AttendanceQueue.createQueue({ storage: memoryStorage(), send: server.send });
+
+    server.hold = true;
+    queue.add([mark(1, true)]);
+    var flushed = queue.flush();
+    assert.strictEqual(queue.flush(), flushed);
+
+    queue.add([mark(1, false)]);
+    server.hold = false;
+    server.release();
+    await flushed;
+
+    assert.strictEqual(server.rows["2026-01-31:1:1"], false);
+    assert.strictEqual(queue.size(), 0);
+});
+
+test("refused marks are kept with their reason until the worker is marked again", async function () {
+    var server = fakeServer();
+    var reports = [];
+    var queue = AttendanceQueue.createQueue({
+        storage: memoryStorage(),
+        send: server.send,
+        onChange: function (count, rejected) { reports.push(AttendanceQueue.statusText(count, rejected)); }
+    });
+
+    server.refuse = { 2: "outside slot time", 3: "unknown worker" };
+    queue.add([mark(1, true), mark(2, true), mark(3, true)]);
+    assert.strictEqual(await queue.flush(), 0);
+
+    assert.deepStrictEqual(queue.rejected().map(function (entry) { return entry.reason; }).sort(),
+                           ["outside slot time", "unknown worker"]);
+    assert.strictEqual(reports[reports.length - 1],
+                       "2 mark(s) not saved (outside slot time: 1, unknown worker: 1)");
+
+    server.refuse = {};
+    queue.add([mark(2, true)]);
+    await queue.flush();
+    assert.deepStrictEqual(queue.rejected().map(function (entry) { return entry.mark.worker; }), [3]);
+});
+
+test("a batch answered with 400 is reported as refused, not saved", async function () {
+    var realFetch = global.fetch;
+    global.fetch = function () {
+        return Promise.resolve({
+            ok: false,
+            status: 400,
+            json: function () { return Promise.resolve({ error: "At most 2000 marks per request." }); }
+        });
+    };
+
+    try {
+        var queue = AttendanceQueue.createQueue({
+            storage: memoryStorage(),
+            send: AttendanceQueue.postMarks("/sync/", "token")
+        });
+        queue.add([mark(1, true), mark(2, false)]);
+
+        assert.strictEqual(await queue.flush(), 0);
+        assert.deepStrictEqual(queue.rejected().map(function (entry) { return entry.reason; }),
+                               ["At most 2000 marks per request.", "At most 2000 marks per request."]);
+    } finally {
+        global.fetch = realFetch;
+    }
+});
+
+test("queues stored under different keys don't see each other", function () {
+    var storage = memoryStorage();
+    var first = AttendanceQueue.createQueue({ storage: storage, send: fakeServer().send, key: "queue.1" });
+    var second = AttendanceQueue.createQueue({ storage: storage, send: fakeServer().send, key: "queue.2" });
+
+    first.add([mark(1, true)]);
+    assert.strictEqual(first.size(), 1);
+    assert.strictEqual(second.size(), 0);
+});
+
+test("the status line counts waiting and refused marks", function () {
+    var refused = [
+        { mark: mark(1, true), reason: "outside slot time" },
+        { mark: mark(2, true), reason: "outside slot time" }
+    ];
+    assert.strictEqual(AttendanceQueue.statusText(0, []), "All marks saved");
+    assert.strictEqual(AttendanceQueue.statusText(3, []), "3 mark(s) waiting to sync");
+    assert.strictEqual(AttendanceQueue.statusText(3, refused),
+                       "3 mark(s) waiting to sync - 2 mark(s) not saved (outside slot time: 2)");
+});
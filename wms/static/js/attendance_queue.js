@@ -0,0 +1,326 @@
+/*
+ * Offline-capable attendance marking for home.html.
+ *
+ * Every checkbox change is queued in localStorage as one mark
+ * ({worker, slot, date, present, at}) and sent to the sync endpoint in
+ * batches. Only toggled workers travel; a later toggle of the same
+ * worker replaces the queued one. A batch that fails (no signal, server
+ * restart) stays queued and is retried with backoff, after a reload too.
+ * The endpoint upserts on (worker, date, slot), so a batch that reached
+ * the server but whose reply was lost is harmless to send again. "at"
+ * is when the mark was made, so the server can check it against the
+ * slot's hours however late it arrives.
+ *
+ * Marks the server refuses (outside the slot's hours, an unknown worker,
+ * a whole batch answered with 400) are kept with the reason until that
+ * worker is marked again, and counted in the status line. The queue is
+ * stored per user, so a shared device never sends one supervisor's
+ * marks under another's login.
+ *
+ * Without fetch or localStorage the form falls back to a normal POST.
+ */
+(function (global) {
+    "use strict";
+
+    var STORAGE_KEY = "wms.attendance.queue";
+    var BATCH_SIZE = 200;
+    var RETRY_DELAYS = [2000, 5000, 15000, 30000, 60000];
+
+    function markKey(mark) {
+        return mark.date + ":" + mark.slot + ":" + mark.worker;
+    }
+
+    function createQueue(options) {
+        var storage = options.storage;
+        var send = options.send;
+        var onChange = options.onChange || function () {};
+        var key = options.key || STORAGE_KEY;
+        var rejectedKey = key + ".rejected";
+        var batchSize = options.batchSize || BATCH_SIZE;
+        var inFlight = null;
+
+        function read(name) {
+            try {
+                return JSON.parse(storage.getItem(name)) || {};
+            } catch (e) {
+                return {};
+            }
+        }
+
+        function load() {
+            return read(key);
+        }
+
+        function loadRejected() {
+            return read(rejectedKey);
+        }
+
+        function rejectedList() {
+            var refused = loadRejected();
+            return Object.keys(refused).map(function (k) { return refused[k]; });
+        }
+
+        function changed() {
+            onChange(Object.keys(load()).length, rejectedList());
+        }
+
+        function save(pending) {
+            storage.setItem(key, JSON.stringify(pending));
+            changed();
+        }
+
+        function saveRejected(refused) {
+            storage.setItem(rejectedKey, JSON.stringify(refused));
+            changed();
+        }
+
+        // The server's verdict on a sent batch: refused marks are kept
+        // with their reason, accepted ones clear an earlier refusal.
+        function settle(batch, rejected) {
+            var refused = loadRejected();
+            batch.forEach(function (mark) {
+                delete refused[markKey(mark)];
+            });
+            (rejected || []).forEach(function (entry) {
+                if (entry && entry.mark) {
+                    refused[markKey(entry.mark)] = { mark: entry.mark, reason: entry.reason };
+                }
+            });
+            saveRejected(refused);
+        }
+
+        // Forget refusals, all of them or those ``drop`` returns true for.
+        function clearRejected(drop) {
+            var refused = loadRejected();
+            Object.keys(refused).forEach(function (k) {
+                if (!drop || drop(refused[k])) {
+                    delete refused[k];
+                }
+            });
+            saveRejected(refused);
+        }
+
+        function add(marks) {
+            var pending = load();
+            marks.forEach(function (mark) {
+                pending[markKey(mark)] = mark;
+            });
+            save(pending);
+        }
+
+        function sendBatch() {
+            var pending = load();
+            var keys = Object.keys(pending).slice(0, batchSize);
+            var batch = keys.map(function (k) { return pending[k]; });
+
+            return send(batch).then(function (result) {
+                // Drop what was sent, unless it was toggled again meanwhile.
+                var current = load();
+                keys.forEach(function (k, i) {
+                    if (current[k] && current[k].present === batch[i].present) {
+                        delete current[k];
+                    }
+                });
+                save(current);
+                settle(batch, result && result.rejected);
+                return result;
+            });
+        }
+
+        // Send everything queued, one batch at a time. Resolves with the
+        // number of marks still queued; rejects if a batch fails.
+        function flush() {
+            if (inFlight) {
+                return inFlight;
+            }
+
+            function next() {
+                if (!Object.keys(load()).length) {
+                    return Promise.resolve(0);
+                }
+                return sendBatch().then(next);
+            }
+
+            inFlight = next().then(function (left) {
+                inFlight = null;
+                return left;
+            }, function (error) {
+                inFlight = null;
+                throw error;
+            });
+            return inFlight;
+        }
+
+        return {
+            add: add,
+            flush: flush,
+            pending: load,
+            rejected: rejectedList,
+            clearRejected: clearRejected,
+            size: function () { return Object.keys(load()).length; }
+        };
+    }
+
+    function postMarks(url, csrfToken) {
+        return function (marks) {
+            return fetch(url, {
+                method: "POST",
+                credentials: "same-origin",
+                headers: {
+                    "Content-Type": "application/json",
+                    "X-CSRFToken": csrfToken
+                },
+                body: JSON.stringify({ marks: marks })
+            }).then(function (response) {
+                // A 400 will never succeed on retry; take the batch off the
+                // queue as refused rather than block everything behind it.
+                if (response.status === 400) {
+                    return response.json().then(function (result) {
+                        return result.error;
+                    }, function () {
+                        return "refused";
+                    }).then(function (reason) {
+                        return {
+                            rejected: marks.map(function (mark) {
+                                return { mark: mark, reason: reason || "refused" };
+                            })
+                        };
+                    });
+                }
+                if (response.ok) {
+                    return response.json();
+                }
+                var error = new Error("Attendance sync failed: HTTP " + response.status);
+                error.status = response.status;
+                throw error;
+            });
+        };
+    }
+
+    // "3 mark(s) waiting to sync - 2 not saved (outside slot time: 2)"
+    function statusText(count, rejected) {
+        var text = count ? count + " mark(s) waiting to sync" : "All marks saved";
+        if (!rejected.length) {
+            return text;
+        }
+
+        var reasons = {};
+        rejected.forEach(function (entry) {
+            reasons[entry.reason] = (reasons[entry.reason] || 0) + 1;
+        });
+        var detail = Object.keys(reasons).map(function (reason) {
+            return reason + ": " + reasons[reason];
+        }).join(", ");
+
+        return (count ? text + " - " : "") + rejected.length + " mark(s) not saved (" + detail + ")";
+    }
+
+    function attach(form) {
+        var url = form.getAttribute("data-sync-url");
+        var slot = Number(form.getAttribute("data-slot"));
+        var day = form.getAttribute("data-date");
+        var status = form.querySelector("[data-sync-status]");
+        var csrf = form.querySelector("[name=csrfmiddlewaretoken]");
+        var checkboxes = Array.prototype.slice.call(form.querySelectorAll("input[data-worker]"));
+        var attempts = 0;
+        var timer = null;
+
+        if (!url || !slot || !global.fetch || !global.localStorage) {
+            return null;
+        }
+
+        function show(text) {
+            if (status) {
+                status.textContent = text;
+            }
+        }
+
+        var queue = createQueue({
+            storage: global.localStorage,
+            key: STORAGE_KEY + "." + form.getAttribute("data-user"),
+            send: postMarks(url, csrf ? csrf.value : ""),
+            onChange: function (count, rejected) {
+                show(statusText(count, rejected));
+            }
+        });
+
+        // Refusals for other days can't be fixed from this page any more.
+        queue.clearRejected(function (entry) {
+            return entry.mark.date !== day;
+        });
+
+        function schedule(delay) {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                queue.flush().then(function () {
+                    attempts = 0;
+                }, function (error) {
+                    var wait = RETRY_DELAYS[Math.min(attempts, RETRY_DELAYS.length - 1)];
+                    attempts += 1;
+                    if (error.status === 401 || error.status === 403) {
+                        show(queue.size() + " mark(s) saved on this device - log in again to sync");
+                    } else {
+                        show(queue.size() + " mark(s) saved on this device - retrying");
+                    }
+                    schedule(wait);
+                });
+            }, delay);
+        }
+
+        function markFor(checkbox) {
+            return {
+                worker: Number(checkbox.getAttribute("data-worker")),
+                slot: slot,
+                date: day,
+                present: checkbox.checked,
+                at: new Date().toISOString()
+            };
+        }
+
+        // Marks made on this device but not yet synced win over the page.
+        var pending = queue.pending();
+        checkboxes.forEach(function (checkbox) {
+            var queued = pending[markKey(markFor(checkbox))];
+            if (queued) {
+                checkbox.checked = queued.present;
+            }
+            checkbox.addEventListener("change", function () {
+                queue.add([markFor(checkbox)]);
+                schedule(1000);
+            });
+        });
+
+        // "Save" records the whole page, absences included, like the plain POST.
+        form.addEventListener("submit", function (event) {
+            event.preventDefault();
+            queue.add(checkboxes.map(markFor));
+            schedule(0);
+        });
+
+        global.addEventListener("online", function () {
+            schedule(0);
+        });
+
+        if (queue.size()) {
+            schedule(0);
+        }
+
+        return queue;
+    }
+
+    global.AttendanceQueue = {
+        createQueue: createQueue,
+        postMarks: postMarks,
+        statusText: statusText,
+        attach: attach
+    };
+
+    if (global.document) {
+        global.document.addEventListener("DOMContentLoaded", function () {
+            var form = global.document.querySelector("form[data-sync-url]");
+            if (form) {
+                attach(form);
+            }
+        });
+    }
+})(typeof window !== "undefined" ? window : this);
@@ -0,0 +1,98 @@
+/*
+ * Background PDF and Excel downloads for the attendance report form.
+ *
+ * Instead of waiting on one long request, the form is posted to the
+ * report job endpoint. The job is then polled until run_report_worker
+ * has rendered the file, which is then downloaded. CSV streams straight
+ * away and still uses the plain GET. Without fetch, the plain GET queues
+ * the same job and redirects to a status page that reloads until the
+ * file is ready.
+ */
+(function (global) {
+    "use strict";
+
+    var POLL_DELAYS = [1000, 2000, 3000, 5000];
+    var BACKGROUND_FORMATS = ["pdf", "xlsx"];
+
+    function attach(form) {
+        var url = form.getAttribute("data-report-jobs-url");
+        var csrf = form.getAttribute("data-csrf");
+        var status = form.querySelector("[data-report-status]");
+        var button = form.querySelector("button");
+
+        if (!url || !global.fetch) {
+            return;
+        }
+
+        function show(text) {
+            if (status) {
+                status.textContent = text;
+            }
+        }
+
+        function finish(text) {
+            show(text);
+            button.disabled = false;
+        }
+
+        function request(target, options) {
+            return fetch(target, options).then(function (response) {
+                return response.json().then(function (job) {
+                    if (!response.ok) {
+                        throw new Error(job.error || "HTTP " + response.status);
+                    }
+                    return job;
+                });
+            });
+        }
+
+        function poll(job, attempt) {
+            if (job.status === "done") {
+                finish("Report ready.");
+                global.location.href = job.download_url;
+                return;
+            }
+            if (job.status === "failed") {
+                finish("Report failed: " + (job.error || "unknown error"));
+                return;
+            }
+
+            show(job.status === "running" ? "Preparing report..." : "Report queued...");
+            var delay = POLL_DELAYS[Math.min(attempt, POLL_DELAYS.length - 1)];
+            setTimeout(function () {
+                request(job.status_url, { credentials: "same-origin" }).then(function (next) {
+                    poll(next, attempt + 1);
+                }, function (error) {
+                    finish("Could not check the report: " + error.message);
+                });
+            }, delay);
+        }
+
+        form.addEventListener("submit", function (event) {
+            if (BACKGROUND_FORMATS.indexOf(form.elements.format.value) < 0) {
+                return;
+            }
+            event.preventDefault();
+            button.disabled = true;
+            show("Queuing report...");
+
+            request(url, {
+                method: "POST",
+                credentials: "same-origin",
+                headers: { "X-CSRFToken": csrf },
+                body: new URLSearchParams(new FormData(form))
+            }).then(function (job) {
+                poll(job, 0);
+            }, function (error) {
+                finish("Could not queue the report: " + error.message);
+            });
+        });
+    }
+
+    if (global.document) {
+        global.document.addEventListener("DOMContentLoaded", function () {
+            var forms = global.document.querySelectorAll("form[data-report-jobs-url]");
+            Array.prototype.forEach.call(forms, attach);
+        });
+    }
+})(typeof window !== "undefined" ? window : this);
@@ -0,0 +1,126 @@
+/*
+ * Typeahead for the roster search box (roster_pager.html).
+ *
+ * Typing asks the worker search endpoint for the best few fuzzy matches
+ * on name, phone or email. Picking one opens the roster on just that
+ * worker (?worker=<id>) instead of paging through everyone. Submitting
+ * the box without picking still runs the plain roster search.
+ */
+(function (global) {
+    "use strict";
+
+    var DELAY = 150;
+    var LIMIT = 8;
+    var MIN_LENGTH = 2;
+
+    function attach(input) {
+        var url = input.getAttribute("data-typeahead-url");
+        var list = input.form.querySelector("[data-typeahead-results]");
+        var timer = null;
+        var latest = 0;
+        var active = -1;
+
+        if (!url || !list || !global.fetch) {
+            return;
+        }
+
+        function items() {
+            return Array.prototype.slice.call(list.querySelectorAll("a"));
+        }
+
+        function close() {
+            list.hidden = true;
+            list.textContent = "";
+            active = -1;
+        }
+
+        function highlight(index) {
+            var links = items();
+            links.forEach(function (link, i) {
+                link.classList.toggle("active", i === index);
+            });
+            active = index;
+        }
+
+        function show(results) {
+            list.textContent = "";
+            results.forEach(function (worker) {
+                var item = global.document.createElement("li");
+                var link = global.document.createElement("a");
+                link.href = "?worker=" + encodeURIComponent(worker.id);
+                link.textContent = worker.name;
+
+                var detail = [worker.phone, worker.email].filter(Boolean).join(" · ");
+                if (detail) {
+                    var small = global.document.createElement("small");
+                    small.textContent = detail;
+                    link.appendChild(small);
+                }
+
+                item.appendChild(link);
+                list.appendChild(item);
+            });
+            list.hidden = !results.length;
+            active = -1;
+        }
+
+        function lookup() {
+            var q = input.value.trim();
+            var request = ++latest;
+
+            if (q.length < MIN_LENGTH) {
+                close();
+                return;
+            }
+
+            fetch(url + "?limit=" + LIMIT + "&q=" + encodeURIComponent(q), { credentials: "same-origin" })
+                .then(function (response) {
+                    return response.ok ? response.json() : { results: [] };
+                })
+                .then(function (data) {
+                    // Answers can arrive out of order; only the newest counts.
+                    if (request === latest) {
+                        show(data.results);
+                    }
+                }, close);
+        }
+
+        input.setAttribute("autocomplete", "off");
+
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(lookup, DELAY);
+        });
+
+        input.addEventListener("keydown", function (event) {
+            var links = items();
+            if (list.hidden || !links.length) {
+                return;
+            }
+            if (event.key === "ArrowDown") {
+                event.preventDefault();
+                highlight((active + 1) % links.length);
+            } else if (event.key === "ArrowUp") {
+                event.preventDefault();
+                highlight((active - 1 + links.length) % links.length);
+            } else if (event.key === "Enter" && active >= 0) {
+                event.preventDefault();
+                global.location.href = links[active].href;
+            } else if (event.key === "Escape") {
+                close();
+            }
+        });
+
+        input.addEventListener("blur", function () {
+            // Late enough for a click on a result to land first.
+            setTimeout(close, 200);
+        });
+    }
+
+    if (global.document) {
+        global.document.addEventListener("DOMContentLoaded", function () {
+            var inputs = global.document.querySelectorAll("input[data-typeahead-url]");
+            Array.prototype.forEach.call(inputs, attach);
+        });
+    }
+})(typeof window !== "undefined" ? window : this);
@@ -12,6 +12,11 @@ import os
 # ================= BASE =================
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
 DEBUG = False   # 👈 IMPORTANT FOR RENDER
@@ -35,6 +40,31 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded photos are re-encoded and thumbnailed by workers.images on a
+# background thread pool ("thread") or right after commit ("sync").
+PHOTO_PROCESSING = os.environ.get("PHOTO_PROCESSING", "thread")
+PHOTO_WORKERS = int(os.environ.get("PHOTO_WORKERS", 2))
+
+# ================= REPORTS =================
+# PDF and XLSX reports (ReportJob) are rendered by `manage.py run_report_worker`
+# on this many processes.
+REPORT_JOB_PROCESSES = int(os.environ.get("REPORT_JOB_PROCESSES", 2))
+
+# ================= ATTENDANCE =================
+# With ATTENDANCE_PRESENCE_ONLY only present marks are stored; absence is
+# the lack of a row, so the table grows by present workers only.
+ATTENDANCE_PRESENCE_ONLY = env_flag("ATTENDANCE_PRESENCE_ONLY", False)
+
+# Months kept in the live attendance table (the current one included).
+# Older months are detached by `manage.py attendance_partitions maintain`;
+# see workers/partitions.py.
+ATTENDANCE_RETAIN_MONTHS = int(os.environ.get("ATTENDANCE_RETAIN_MONTHS", 12))
+
+# STORAGES alias that `maintain --archive` writes closed months to before
+# deleting them. It must be durable (object storage, not MEDIA_ROOT on an
+# instance disk that a deploy wipes); archiving is refused while unset.
+ATTENDANCE_ARCHIVE_STORAGE = os.environ.get("ATTENDANCE_ARCHIVE_STORAGE", "")
+
 # ================= APPS =================
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -43,12 +73,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Trigram lookups for workers.search (the index exists on PostgreSQL only).
+    'django.contrib.postgres',
 
     'workers'
 ]
 
 # ================= MIDDLEWARE =================
 MIDDLEWARE = [
+    'workers.perf.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
 
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,50 +93,169 @@ MIDDLEWARE = [
 
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'workers.middleware.StaticFilesMiddleware',
 ]
 
 ROOT_URLCONF = 'wms.urls'
 
 # ================= TEMPLATES =================
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # In production every template is compiled once per process.
+            'loaders': template_loaders if DEBUG else [
+                ('django.template.loaders.cached.Loader', template_loaders),
+            ],
         },
     },
 ]
 
+# Part of every page ETag (workers.views.page_validators), so a deploy
+# never answers 304 for markup rendered by the previous release. Render
+# sets RENDER_GIT_COMMIT on each deploy.
+RELEASE = os.environ.get("RELEASE", os.environ.get("RENDER_GIT_COMMIT", ""))
+
 WSGI_APPLICATION = 'wms.wsgi.application'
+ASGI_APPLICATION = 'wms.asgi.application'
+
+# ================= DATABASE CONFIG =================
+# Everything comes from the environment, so each deployment is tuned
+# without code changes:
+#   DATABASE_URL            primary database (required)
+#   DATABASE_REPLICA_URL    optional read replica for the reporting views
+#   DATABASE_SSL_REQUIRE    "false" to allow non-SSL Postgres connections
+#   DATABASE_CONN_MAX_AGE   seconds a connection is kept open (default 600,
+#                           WSGI only)
+#   DATABASE_HEALTH_CHECKS  "false" to skip the check before reusing one
+#   DATABASE_POOL           "true" for psycopg's connection pool, which
+#                           replaces persistent connections (CONN_MAX_AGE 0);
+#                           on by default when serving ASGI
+#   DATABASE_POOL_MIN_SIZE, DATABASE_POOL_MAX_SIZE, DATABASE_POOL_TIMEOUT
+#
+# Under ASGI, sync code runs on short-lived executor threads and each
+# keeps its own persistent connection open until the server closes it,
+# so there persistent connections are never used: it is the pool, or a
+# new connection per request.
+
+# gunicorn.conf.py serves wms.asgi unless GUNICORN_MODE=wsgi.
+SERVE_ASGI = os.environ.get("GUNICORN_MODE", "asgi") != "wsgi"
+
+
+def database_config(url):
+    postgres = url.startswith(("postgres://", "postgresql://"))
+    pooled = postgres and env_flag("DATABASE_POOL", SERVE_ASGI)
+    persistent = not pooled and not SERVE_ASGI
+
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=int(os.environ.get("DATABASE_CONN_MAX_AGE", 600)) if persistent else 0,
+        # Reused connections are pinged first, so one that died while
+        # idle is replaced instead of failing the first request after.
+        conn_health_checks=env_flag("DATABASE_HEALTH_CHECKS", True),
+        ssl_require=postgres and env_flag("DATABASE_SSL_REQUIRE", True),
+    )
+
+    if pooled:
+        config.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+        }
+
+    return config
 
-# ===========================================================
-# 🔥🔥🔥 ONLY RENDER POSTGRES – NO SQLITE AT ALL 🔥🔥🔥
-# ===========================================================
-# ============== DATABASE CONFIG ==============
-import os
-import dj_database_url
 
 DATABASES = {}
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
 if DATABASE_URL:
-    DATABASES["default"] = dj_database_url.parse(
-        DATABASE_URL,
-        conn_max_age=600,
-        ssl_require=True
-    )
+    DATABASES["default"] = database_config(DATABASE_URL)
 else:
     raise Exception("❌ DATABASE_URL NOT FOUND IN RENDER")
 
-# ===========================================================
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = database_config(DATABASE_REPLICA_URL)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["workers.routers.ReplicaRouter"]
+
+# ================= CACHE =================
+# CACHE_BACKEND picks the store behind every cache region in workers.cache:
+#   locmem (default) - per process, nothing to set up
+#   file             - shared by all workers on one host (CACHE_LOCATION = directory)
+#   db               - shared through Postgres, run "manage.py createcachetable" once
+#   redis            - CACHE_LOCATION = redis://host:6379/0
+#
+# The regions are invalidated when data changes, which only reaches the
+# other processes through a shared backend. With locmem (one store per
+# gunicorn worker) they are switched off and every read goes to the
+# database; a single-process deployment can turn them back on with
+# CACHE_SHARED=true.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+CACHE_LOCATIONS = {
+    "locmem": "wms",
+    "file": str(BASE_DIR / "cache"),
+    "db": "wms_cache",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_LOCATIONS.get(CACHE_BACKEND, "")),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 300)),
+        "KEY_PREFIX": "wms",
+    }
+}
+
+CACHE_SHARED = env_flag("CACHE_SHARED", CACHE_BACKEND in ("file", "db", "redis"))
+
+# {% cache %} fragments are keyed by change versions kept in the cache
+# (workers.cache.changes), which another process can't see move without
+# a shared backend; they are not cached at all then.
+if not CACHE_SHARED:
+    CACHES["template_fragments"] = {"BACKEND": CACHE_BACKENDS["dummy"]}
+
+# ================= LOGGING =================
+# workers.perf writes one JSON line per request at INFO and warns about
+# likely N+1 queries; PERF_LOG_LEVEL=WARNING keeps only the warnings.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "workers.perf": {
+            "handlers": ["console"],
+            "level": os.environ.get("PERF_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
 
 # ================= AUTH =================
 AUTH_PASSWORD_VALIDATORS = [
@@ -121,10 +273,41 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Same as ModelBackend, but the user and profile behind each session
+# come from the "users" cache region instead of two queries per request
+# (only with a shared cache, see CACHE_SHARED).
+AUTHENTICATION_BACKENDS = [
+    'workers.auth.CachedModelBackend',
+]
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Proxies in front of the app that append the client address to
+# X-Forwarded-For (Render: 1). With 0 the header is ignored, since any
+# client can send it; login throttling then counts REMOTE_ADDR.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
+
+# ================= SESSIONS =================
+# SESSION_BACKEND picks where sessions live:
+#   cached_db (default) - read from the cache, written through to the DB
+#   signed_cookies      - kept in the browser, no server-side storage
+#   db                  - the database on every request
+# cached_db falls back to db without a shared cache: a per-process copy
+# would keep a logged-out session alive in the other workers.
+SESSION_ENGINES = {
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
+}
+
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "cached_db")
+if SESSION_BACKEND == "cached_db" and not CACHE_SHARED:
+    SESSION_BACKEND = "db"
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
 # ================= INTERNATIONAL =================
 LANGUAGE_CODE = 'en-us'
 
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import posixpath
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+
+from .attendance import MAX_SYNC_MARKS, apply_marks
+from .changes import changes_since, decode_watermark, encode_watermark
+from .exports import CONTENT_TYPES, parse_date, parse_id, parse_report_filters
+from .models import Attendance, ReportJob, Slot, Worker
+from .pagination import decode_cursor, encode_cursor, keyset_page, parse_limit
+from .partitions import require_live
+from .reports import enqueue_report
+from .search import MAX_TOP_K, TOP_K, search
+
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+
+def api_view(view=None, methods=("GET", "HEAD")):
+    """Staff-only JSON endpoint; errors come back as JSON, not redirects."""
+    if view is None:
+        return lambda view: api_view(view, methods)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        if not request.user.is_staff:
+            return JsonResponse({"error": "Not allowed."}, status=403)
+        if request.method not in methods:
+            return JsonResponse({"error": "Method not allowed."}, status=405)
+        try:
+            return view(request, *args, **kwargs)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return wrapper
+
+
+def page_response(request, queryset):
+    """
+    One keyset page of a ``values()`` queryset as JSON, with an ETag over
+    the body so pollers that already have it get a bodiless 304.
+    """
+    page = keyset_page(
+        queryset,
+        after=decode_cursor(request.GET.get("cursor")),
+        limit=parse_limit(request.GET.get("limit"), API_PAGE_SIZE, API_MAX_PAGE_SIZE),
+    )
+
+    body = json.dumps(
+        {"results": page.object_list, "next": encode_cursor(page.next_after)},
+        cls=DjangoJSONEncoder,
+    )
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+
+    response["ETag"] = etag
+    return response
+
+
+# ================= ENDPOINTS =================
+@api_view
+def workers(request):
+    return page_response(
+        request,
+        Worker.objects.values("id", "name", "dob", "phone", "email"),
+    )
+
+
+@api_view
+def worker_search(request):
+    """Typeahead: the best ``limit`` fuzzy matches for ``q`` on name, phone or email."""
+    limit = parse_limit(request.GET.get("limit"), TOP_K, MAX_TOP_K)
+    return JsonResponse({"results": search(request.GET.get("q", ""), limit)})
+
+
+@api_view
+def slots(request):
+    return page_response(
+        request,
+        Slot.objects.values("id", "name", "start_time", "end_time", "is_active"),
+    )
+
+
+@api_view
+def attendance(request):
+    records = Attendance.objects.all()
+
+    start = parse_date(request.GET.get("start"), None)
+    end = parse_date(request.GET.get("end"), None)
+    worker = parse_id(request.GET.get("worker"), "worker")
+    slot = parse_id(request.GET.get("slot"), "slot")
+    require_live(start, end)
+
+    if start:
+        records = records.filter(date__gte=start)
+    if end:
+        records = records.filter(date__lte=end)
+    if worker is not None:
+        records = records.filter(worker_id=worker)
+    if slot is not None:
+        records = records.filter(slot=slot)
+    if request.GET.get("present") in ("true", "false"):
+        records = records.filter(present=request.GET["present"] == "true")
+
+    # values() across the FK is a single JOIN, like select_related, but
+    # without building Attendance or Worker instances.
+    return page_response(
+        request,
+        records.values("id", "worker_id", "worker__name", "date", "slot", "present"),
+    )
+
+
+@api_view
+def attendance_changes(request):
+    """
+    Rows created or modified after ``since`` (a watermark from an earlier
+    response, or an ISO datetime for the first sync). Keep passing the
+    returned watermark back until ``more`` is false.
+    """
+    limit = parse_limit(request.GET.get("limit"), API_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    since = decode_watermark(request.GET.get("since"))
+
+    rows = list(changes_since(since)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        watermark = encode_watermark(rows[-1]["updated_at"], rows[-1]["id"])
+    else:
+        watermark = request.GET.get("since") or None
+
+    return JsonResponse(
+        {"results": rows, "watermark": watermark, "more": more},
+        encoder=DjangoJSONEncoder,
+    )
+
+
+@api_view(methods=("POST",))
+def attendance_sync(request):
+    """
+    Apply marks queued by the offline client (static/js/attendance_queue.js).
+
+    Body: ``{"marks": [{"worker": 1, "slot": 2, "date": "2026-01-31",
+    "present": true, "at": "2026-01-31T08:02:11.000Z"}, ...]}``. Only
+    toggled workers are sent, and a batch can be retried safely after a
+    dropped connection.
+    """
+    try:
+        marks = json.loads(request.body)["marks"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Expected a JSON object with a list of marks.")
+
+    if not isinstance(marks, list):
+        raise ValueError("Expected a JSON object with a list of marks.")
+    if len(marks) > MAX_SYNC_MARKS:
+        raise ValueError(f"At most {MAX_SYNC_MARKS} marks per request.")
+
+    return JsonResponse(apply_marks(marks))
+
+
+# ================= REPORT JOBS =================
+def job_response(job, status=200):
+    payload = {
+        "id": job.pk,
+        "status": job.status,
+        "params": job.params,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "error": job.error or None,
+        "status_url": reverse("api_report_job", args=[job.pk]),
+        "download_url": reverse("api_report_job_download", args=[job.pk]) if job.status == ReportJob.DONE else None,
+    }
+    return JsonResponse(payload, status=status, encoder=DjangoJSONEncoder)
+
+
+@api_view(methods=("POST",))
+def report_jobs(request):
+    """
+    Queue an attendance report (same fields as download_attendance) for
+    run_report_worker. Answers at once with the job to poll; an identical
+    request over unchanged data returns the existing job or its file.
+    """
+    filters = parse_report_filters(request.POST)
+    require_live(filters["start"], filters["end"])
+    job, _ = enqueue_report(filters, request.user)
+    return job_response(job, status=200 if job.status == ReportJob.DONE else 202)
+
+
+def _job(job_id):
+    return ReportJob.objects.filter(pk=job_id).first()
+
+
+@api_view
+def report_job(request, job_id):
+    job = _job(job_id)
+    if job is None:
+        return JsonResponse({"error": "No such report."}, status=404)
+    return job_response(job)
+
+
+@api_view
+def report_job_download(request, job_id):
+    job = _job(job_id)
+    if job is None:
+        return JsonResponse({"error": "No such report."}, status=404)
+    if job.status != ReportJob.DONE or not job.file:
+        return JsonResponse({"error": f"Report is {job.status}."}, status=409)
+
+    return FileResponse(
+        job.file.open("rb"),
+        as_attachment=True,
+        filename=posixpath.basename(job.file.name),
+        content_type=CONTENT_TYPES[job.params["format"]],
+    )
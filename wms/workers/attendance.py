@@ -0,0 +1,195 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+
+from .models import Attendance, Slot, Worker
+from .summaries import apply_slot_changes, drop_empty_daily, lock_daily, presence_only
+
+
+# Rows per INSERT statement. Keeps each statement well under the
+# Postgres parameter limit while still writing a large roster in a
+# handful of round trips.
+BATCH_SIZE = 1000
+
+# Queued marks may reach the server this many days after they were made
+# (a phone that stayed offline overnight); older ones are refused.
+SYNC_GRACE_DAYS = 1
+
+# Device clocks drift; a mark made this close outside its slot's window
+# still counts.
+MARK_CLOCK_SKEW = timedelta(minutes=5)
+
+# Largest batch the offline client may send in one request.
+MAX_SYNC_MARKS = 2000
+
+
+def save_slot_attendance(slot, marks, day=None):
+    """
+    Record a slot's marks, writing only the workers whose state changed.
+
+    ``marks`` maps worker id -> present (bool). The rows already stored
+    for those workers are read once and compared; unchanged workers are
+    not written at all, changed ones are upserted through the unique
+    (worker, date, slot) key. With ATTENDANCE_PRESENCE_ONLY an absent
+    worker gets no row, but a stored mark is never deleted: un-marking
+    someone flips their row to absent, so the change feed sees it.
+
+    Returns counts of inserted, updated and unchanged rows, and
+    ``changed``: worker id -> new state (True, False or None for no row).
+    ``deleted`` is always 0 and kept for the sync API's response.
+    """
+    day = day or date.today()
+    result = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0, "changed": {}}
+
+    if not marks:
+        return result
+
+    absent = None if presence_only() else False
+
+    with transaction.atomic():
+        # Held until commit: a concurrent save of this slot waits here and
+        # then reads this one's rows, instead of counting the same change.
+        created = lock_daily([(day, slot)])
+
+        existing = dict(
+            Attendance.objects.filter(
+                date=day,
+                slot=slot,
+                worker_id__in=list(marks),
+            ).values_list("worker_id", "present")
+        )
+
+        changes = {}
+        for worker_id, present in marks.items():
+            old = existing.get(worker_id)
+            if present:
+                new = True
+            else:
+                # An existing row stays as a tombstone, even presence-only.
+                new = absent if old is None else False
+            if old != new:
+                changes[worker_id] = (old, new)
+
+        rows = [
+            Attendance(worker_id=worker_id, date=day, slot=slot, present=new)
+            for worker_id, (old, new) in changes.items()
+        ]
+
+        Attendance.objects.bulk_create(
+            rows,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["worker", "date", "slot"],
+            # updated_at is refreshed on conflict too so the change feed sees it.
+            update_fields=["present", "updated_at"],
+        )
+
+        apply_slot_changes(day, slot, changes)
+
+        if created and not changes:
+            drop_empty_daily(created)
+
+    for worker_id, (old, new) in changes.items():
+        if old is None:
+            result["inserted"] += 1
+        else:
+            result["updated"] += 1
+
+    result["unchanged"] = len(marks) - len(changes)
+    result["changed"] = {worker_id: new for worker_id, (old, new) in changes.items()}
+    return result
+
+
+def _parse_mark(mark):
+    present = mark["present"]
+    if not isinstance(present, bool):
+        raise ValueError("present must be true or false")
+    at = datetime.fromisoformat(mark["at"])
+    if at.tzinfo is not None:
+        # Slot times are server wall-clock times, as in get_current_slot.
+        at = at.astimezone().replace(tzinfo=None)
+    return int(mark["worker"]), int(mark["slot"]), date.fromisoformat(mark["date"]), present, at
+
+
+def slot_windows(slot, day):
+    """
+    The runs of ``slot`` that fall on ``day``, as (start, end) datetimes
+    with an inclusive end. A slot crossing midnight has two: the one
+    that started the evening before and the one starting that evening.
+    """
+    if slot.end_time >= slot.start_time:
+        return [(datetime.combine(day, slot.start_time), datetime.combine(day, slot.end_time))]
+    return [
+        (datetime.combine(start_day, slot.start_time), datetime.combine(start_day + timedelta(days=1), slot.end_time))
+        for start_day in (day - timedelta(days=1), day)
+    ]
+
+
+def in_slot_window(slot, day, at):
+    return any(
+        start - MARK_CLOCK_SKEW <= at <= end + MARK_CLOCK_SKEW
+        for start, end in slot_windows(slot, day)
+    )
+
+
+def apply_marks(marks, now=None):
+    """
+    Apply a batch of queued marks from the offline client.
+
+    Each mark is ``{"worker", "slot", "date", "present", "at"}``, ``at``
+    being the ISO time the mark was made on the device. Like a form
+    submitted from the home page, a mark only counts if it was made
+    while its slot was running on that date; it may then arrive up to
+    SYNC_GRACE_DAYS later. A later mark for the same (worker, date, slot)
+    replaces an earlier one. Marks are written through
+    save_slot_attendance, so sending the same batch twice leaves the
+    same rows behind. Returns the row counts and the marks that were
+    refused, with a reason for each.
+    """
+    now = now or datetime.now()
+    today = now.date()
+    earliest = today - timedelta(days=SYNC_GRACE_DAYS)
+
+    rejected = []
+    parsed = []
+
+    for mark in marks:
+        try:
+            parsed.append((mark, *_parse_mark(mark)))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append({"mark": mark, "reason": "malformed"})
+
+    slots = Slot.objects.filter(is_active=True).in_bulk({slot for _, _, slot, _, _, _ in parsed})
+    known_workers = set(
+        Worker.objects.filter(id__in={worker_id for _, worker_id, _, _, _, _ in parsed}).values_list("id", flat=True)
+    )
+
+    grouped = defaultdict(dict)
+
+    for mark, worker_id, slot, day, present, at in parsed:
+        if not earliest <= day <= today or not now - timedelta(days=SYNC_GRACE_DAYS) <= at <= now + MARK_CLOCK_SKEW:
+            rejected.append({"mark": mark, "reason": "date out of range"})
+        elif slot not in slots:
+            rejected.append({"mark": mark, "reason": "unknown or inactive slot"})
+        elif not in_slot_window(slots[slot], day, at):
+            rejected.append({"mark": mark, "reason": "outside slot time"})
+        elif worker_id not in known_workers:
+            rejected.append({"mark": mark, "reason": "unknown worker"})
+        else:
+            grouped[(day, slot)][worker_id] = present
+
+    totals = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    with transaction.atomic():
+        # Every slot of the batch up front, in order, so a refresh can't
+        # take one of them between two saves.
+        created = lock_daily(grouped)
+        for (day, slot), slot_marks in sorted(grouped.items()):
+            result = save_slot_attendance(slot, slot_marks, day=day)
+            for key in totals:
+                totals[key] += result[key]
+        if created:
+            drop_empty_daily(created)
+
+    return dict(totals, rejected=rejected)
@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+
+from .cache import hashed, user_key, users
+from .models import LoginFailure, UserProfile
+from .routers import primary
+
+
+# Failed logins allowed per window before further attempts are refused
+# without checking the password. The username limit is counted per
+# client address, so guessing from one machine can't lock the account
+# out everywhere else. Offices share one address, so the IP limit is
+# much higher.
+LOGIN_WINDOW = 15 * 60
+LOGIN_FAILURES_PER_USERNAME = 5
+LOGIN_FAILURES_PER_IP = 50
+
+# What the users region keeps of a User: every column but the password
+# hash, in model order (as from_db expects them). Sessions are checked
+# against hashes derived from it, computed when the entry is cached.
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != "password"]
+PROFILE_FIELDS = [field.attname for field in UserProfile._meta.concrete_fields]
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose per-request user lookup is served from the
+    "users" cache region, with the profile loaded alongside so the
+    navbar and profile page don't query for it.
+
+    Entries are dropped whenever the User or its UserProfile is saved,
+    which covers password changes and deactivation. The region only
+    caches with a shared cache (CACHE_SHARED), so the drop reaches every
+    process; otherwise each request loads the user as ModelBackend does.
+
+    The cache holds USER_FIELDS and the session auth hashes rather than
+    the row, so the password hash never leaves the database. The User
+    handed out has its password deferred. Code that saves a user should
+    still load it fresh rather than save this copy.
+    """
+
+    def get_user(self, user_id):
+        entry = users.get_or_set(user_key(user_id), lambda: self._load_user(user_id))
+        user = _restore(entry) if entry is not None else None
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # ModelBackend.aget_user queries directly rather than calling get_user.
+        return await sync_to_async(self.get_user)(user_id)
+
+    @primary
+    def _load_user(self, user_id):
+        user = User.objects.select_related("userprofile").filter(pk=user_id).first()
+        return _snapshot(user) if user is not None else None
+
+
+def _values(obj, fields):
+    # Files are kept by name: a FieldFile would pickle its instance too.
+    values = [getattr(obj, field) for field in fields]
+    return [value.name if isinstance(value, FieldFile) else value for value in values]
+
+
+def _snapshot(user):
+    try:
+        profile = user.userprofile
+    except UserProfile.DoesNotExist:
+        profile = None
+
+    return {
+        "user": _values(user, USER_FIELDS),
+        "profile": _values(profile, PROFILE_FIELDS) if profile else None,
+        "session_hash": user.get_session_auth_hash(),
+        "fallback_hashes": list(user.get_session_auth_fallback_hash()),
+    }
+
+
+def _restore(entry):
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, entry["user"])
+    # The two checks django.contrib.auth.get_user makes of a session.
+    user.get_session_auth_hash = lambda: entry["session_hash"]
+    user.get_session_auth_fallback_hash = lambda: iter(entry["fallback_hashes"])
+
+    if entry["profile"] is None:
+        User.userprofile.related.set_cached_value(user, None)
+    else:
+        user.userprofile = UserProfile.from_db(DEFAULT_DB_ALIAS, PROFILE_FIELDS, entry["profile"])
+    return user
+
+
+# ================= LOGIN THROTTLING =================
+def client_ip(request):
+    """
+    The client address as seen by the outermost trusted proxy. Each of
+    the TRUSTED_PROXIES in front of the app appends the address it saw
+    to X-Forwarded-For; entries left of those are client-supplied.
+    """
+    proxies = getattr(settings, "TRUSTED_PROXIES", 0)
+    forwarded = [ip.strip() for ip in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if ip.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _keys(request, username):
+    ip = client_ip(request)
+    return (
+        (f"login:user:{hashed((username or '').lower(), ip)}", LOGIN_FAILURES_PER_USERNAME),
+        (f"login:ip:{hashed(ip)}", LOGIN_FAILURES_PER_IP),
+    )
+
+
+def _window_start():
+    return timezone.now() - timedelta(seconds=LOGIN_WINDOW)
+
+
+def login_allowed(request, username):
+    """False once the username (from this address) or the address has failed too often."""
+    limits = dict(_keys(request, username))
+    counts = dict(
+        LoginFailure.objects.filter(key__in=limits, created_at__gte=_window_start())
+        .values("key")
+        .annotate(count=Count("id"))
+        .values_list("key", "count")
+    )
+    return all(counts.get(key, 0) < limit for key, limit in limits.items())
+
+
+def login_failed(request, username):
+    LoginFailure.objects.bulk_create([LoginFailure(key=key) for key, _ in _keys(request, username)])
+    # Only the current window is ever counted.
+    LoginFailure.objects.filter(created_at__lt=_window_start()).delete()
+
+
+def login_succeeded(request, username):
+    LoginFailure.objects.filter(key=_keys(request, username)[0][0]).delete()
@@ -0,0 +1,168 @@
+import statistics
+import time
+from datetime import date, timedelta
+from functools import partial
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import slots as slot_schedule
+from .cache import REGIONS
+from .exports import parse_report_filters, render_report_file
+from .models import Slot, UserProfile, Worker
+from .synthetic import seed
+
+
+# Allowed slowdown against the baseline before a scenario is reported.
+TOLERANCE = 0.25
+
+# Smaller slowdowns than this are timer noise and never reported.
+MIN_DELTA_MS = 5
+
+
+class Rollback(Exception):
+    pass
+
+
+def _consume(response):
+    # Streaming exports do their work while the body is iterated.
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _render(params):
+    # What run_report_worker does for a queued job, minus saving the file.
+    with render_report_file(parse_report_filters(params)):
+        return "file"
+
+
+def _scenarios(today):
+    """
+    name -> (client, method, url, data). The "worker" scenarios call the
+    report renderer directly instead of going through a view, since PDF
+    and Excel files are built by run_report_worker, not the request.
+    """
+    start = (today - timedelta(days=29)).isoformat()
+    return {
+        "home_post": ("staff", "post", reverse("home"), "roster"),
+        "display": ("staff", "get", reverse("display"), {"date": today.isoformat()}),
+        "user_dashboard": ("user", "get", reverse("user_dashboard"), {}),
+        "download_csv": ("staff", "get", reverse("download_attendance"),
+                         {"start": start, "end": today.isoformat(), "format": "csv"}),
+        "queue_pdf": ("staff", "get", reverse("download_attendance"),
+                      {"start": today.isoformat(), "format": "pdf"}),
+        "render_pdf": ("worker", "render", None,
+                       {"start": start, "end": today.isoformat(), "format": "pdf"}),
+        "add_worker": ("staff", "get", reverse("add_worker"), {}),
+    }
+
+
+def _clients():
+    staff = User.objects.create_user("bench-staff", password="x", is_staff=True)
+    worker = Worker.objects.order_by("id").first()
+    user = User.objects.create_user("bench-user", email=worker.email, password="x")
+    UserProfile.objects.create(user=user, worker=worker, mobile=worker.phone, dob=worker.dob)
+
+    clients = {"staff": Client(), "user": Client()}
+    clients["staff"].force_login(staff)
+    clients["user"].force_login(user)
+    return clients
+
+
+def _roster_post():
+    ids = list(Worker.objects.order_by("id").values_list("id", flat=True)[:50])
+    data = {"worker_ids": [str(i) for i in ids]}
+    data.update({f"present_{i}": "on" for i in ids[::2]})
+    return data
+
+
+def _request(client, method, url, data):
+    return _consume(getattr(client, method)(url, data)).status_code
+
+
+def _measure(run, repeat):
+    timings = []
+    queries = []
+    status = None
+
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            status = run()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+
+    warm = timings[1:] or timings
+    return {
+        "status": status,
+        "cold_ms": round(timings[0], 2),
+        "warm_ms": round(statistics.median(warm), 2),
+        "queries": queries[0],
+        "warm_queries": max(queries[1:] or queries),
+    }
+
+
+def _reset_caches():
+    for region in REGIONS.values():
+        region.invalidate()
+    slot_schedule.invalidate_schedule()
+
+
+def run_size(workers, days, repeat=5, only=None):
+    """
+    Seed ``workers`` workers with ``days`` days of attendance, time each
+    scenario through the test client, then roll everything back.
+    """
+    today = date.today()
+    results = {}
+
+    try:
+        with transaction.atomic():
+            seed(workers=workers, days=days, end_day=today)
+            clients = _clients()
+            slot = Slot.objects.filter(is_active=True).order_by("id").first()
+            _reset_caches()
+
+            # Marking is only allowed inside a slot; pin one as current.
+            with mock.patch("workers.views.get_current_slot", return_value=slot):
+                for name, (who, method, url, data) in _scenarios(today).items():
+                    if only and name not in only:
+                        continue
+                    if data == "roster":
+                        data = _roster_post()
+                    if method == "render":
+                        run = partial(_render, data)
+                    else:
+                        run = partial(_request, clients[who], method, url, data)
+                    results[name] = _measure(run, repeat)
+
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        _reset_caches()
+
+    return results
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """Return human-readable regressions of ``current`` against ``baseline``."""
+    problems = []
+    for size, scenarios in current["sizes"].items():
+        for name, result in scenarios.items():
+            before = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            label = f"{name} @ {size} workers"
+            if result["queries"] > before["queries"]:
+                problems.append(f"{label}: {before['queries']} -> {result['queries']} queries")
+            slower = result["warm_ms"] - before["warm_ms"]
+            if slower > MIN_DELTA_MS and result["warm_ms"] > before["warm_ms"] * (1 + tolerance):
+                problems.append(f"{label}: {before['warm_ms']} -> {result['warm_ms']} ms")
+    return problems
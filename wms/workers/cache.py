@@ -0,0 +1,248 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def shared():
+    """
+    Whether every process sees the same cache (settings.CACHE_SHARED).
+    Anything kept fresh by invalidation is only cached when it is.
+    """
+    return getattr(settings, "CACHE_SHARED", False)
+
+
+class ChangeClock:
+    """
+    When things last changed, as UNIX timestamps kept in the project
+    cache under ``clock:<name>:<key>``.
+
+    Pages use the readings as ETag / Last-Modified validators and as
+    ``{% cache %}`` fragment keys. A key never touched (or evicted)
+    reads as the moment it is first read, so a lost reading only costs
+    a re-render. A touch is only seen by other processes through a
+    shared cache, so pages only rely on the clock when ``shared()``.
+    """
+
+    def __init__(self, name, alias="default"):
+        self.name = name
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_key(self, key):
+        return f"clock:{self.name}:{key}"
+
+    def touch(self, *keys):
+        now = time.time()
+        self.backend.set_many({self.make_key(key): now for key in keys}, None)
+
+    def read(self, *keys):
+        full_keys = [self.make_key(key) for key in keys]
+        found = self.backend.get_many(full_keys)
+        missing = [key for key in full_keys if key not in found]
+        now = time.time()
+        if missing:
+            for key in missing:
+                self.backend.add(key, now, None)
+            # Re-read: another process may have started the clock first.
+            found.update(self.backend.get_many(missing))
+        return [found.get(key, now) for key in full_keys]
+
+    async def aread(self, *keys):
+        full_keys = [self.make_key(key) for key in keys]
+        found = await self.backend.aget_many(full_keys)
+        missing = [key for key in full_keys if key not in found]
+        now = time.time()
+        if missing:
+            for key in missing:
+                await self.backend.aadd(key, now, None)
+            found.update(await self.backend.aget_many(missing))
+        return [found.get(key, now) for key in full_keys]
+
+
+changes = ChangeClock("changes")
+
+
+class CacheRegion:
+    """
+    A named slice of the project cache with its own timeout and counters.
+
+    Keys are stored as ``<region>:<generation>:<key>``. ``invalidate()``
+    bumps the region's generation, which orphans every key in it at once
+    without having to know them; stale entries simply age out of the
+    backend. Single keys can still be dropped with ``delete()``.
+    Invalidating also touches the region's name on the ``changes`` clock.
+
+    Without a shared cache every read is a miss and nothing is stored,
+    so one process can never serve what another has invalidated.
+    """
+
+    def __init__(self, name, timeout, alias="default"):
+        self.name = name
+        self.timeout = timeout
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def generation_key(self):
+        return f"region:{self.name}:generation"
+
+    def generation(self):
+        generation = self.backend.get(self.generation_key)
+        if generation is None:
+            generation = 1
+            self.backend.add(self.generation_key, generation, None)
+        return generation
+
+    def make_key(self, key, generation=None):
+        return f"{self.name}:{generation or self.generation()}:{key}"
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        if not shared():
+            self.record(False)
+            return default
+        value = self.backend.get(self.make_key(key), _MISSING)
+        self.record(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, timeout=None):
+        if not shared():
+            return
+        self.backend.set(self.make_key(key), value, timeout or self.timeout)
+
+    def get_or_set(self, key, compute, timeout=None):
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        if not shared():
+            self.record(False)
+            return compute()
+        full_key = self.make_key(key)
+        value = self.backend.get(full_key, _MISSING)
+        self.record(value is not _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.backend.set(full_key, value, timeout or self.timeout)
+        return value
+
+    async def ageneration(self):
+        generation = await self.backend.aget(self.generation_key)
+        if generation is None:
+            generation = 1
+            await self.backend.aadd(self.generation_key, generation, None)
+        return generation
+
+    async def aget_or_set(self, key, compute, timeout=None):
+        """get_or_set for async views; ``compute`` is a coroutine function."""
+        if not shared():
+            self.record(False)
+            return await compute()
+        full_key = self.make_key(key, await self.ageneration())
+        value = await self.backend.aget(full_key, _MISSING)
+        self.record(value is not _MISSING)
+        if value is _MISSING:
+            value = await compute()
+            await self.backend.aset(full_key, value, timeout or self.timeout)
+        return value
+
+    def delete(self, *keys):
+        generation = self.generation()
+        self.backend.delete_many([self.make_key(key, generation) for key in keys])
+
+    def invalidate(self):
+        try:
+            self.backend.incr(self.generation_key)
+        except ValueError:
+            self.backend.add(self.generation_key, 2, None)
+        changes.touch(self.name)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "timeout": self.timeout,
+            "enabled": shared(),
+        }
+
+
+_MISSING = object()
+
+
+rosters = CacheRegion("rosters", timeout=5 * 60)
+slots = CacheRegion("slots", timeout=60 * 60)
+records = CacheRegion("records", timeout=5 * 60)
+dashboards = CacheRegion("dashboards", timeout=60 * 60)
+users = CacheRegion("users", timeout=5 * 60)
+# Months moved out of the attendance table; invalidated by partitions.py.
+archives = CacheRegion("archives", timeout=60 * 60)
+
+REGIONS = {region.name: region for region in (rosters, slots, records, dashboards, users, archives)}
+
+
+def stats():
+    return {name: region.stats() for name, region in REGIONS.items()}
+
+
+def hashed(*parts):
+    """Cache-key-safe token for arbitrary user input such as search terms."""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def display_key(day):
+    return f"display:{day}"
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def worker_key(worker_id):
+    return f"worker:{worker_id}"
+
+
+def after_commit(func, *args):
+    """Run ``func`` once the current transaction commits (or now, outside one)."""
+    transaction.on_commit(lambda: func(*args))
+
+
+# ================= SIGNAL RECEIVERS =================
+def worker_changed(sender, **kwargs):
+    after_commit(rosters.invalidate)
+    after_commit(records.invalidate)
+
+
+def slot_changed(sender, **kwargs):
+    after_commit(slots.invalidate)
+    after_commit(records.invalidate)
+
+
+def attendance_changed(days):
+    keys = [display_key(day) for day in days]
+    after_commit(records.delete, *keys)
+    after_commit(changes.touch, *keys)
+
+
+def user_changed(sender, instance, **kwargs):
+    # Sent for both User and UserProfile rows.
+    user_id = getattr(instance, "user_id", instance.pk)
+    after_commit(users.delete, user_key(user_id))
+    after_commit(changes.touch, user_key(user_id))
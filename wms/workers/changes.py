@@ -0,0 +1,69 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Attendance
+
+
+# Rows touched this recently are held back until the next poll. A row's
+# updated_at is set when it is written, not when its transaction commits,
+# so a slow transaction can commit a row older than one already handed
+# out; the lag gives it time to land before the watermark moves past it.
+SAFETY_LAG = timedelta(seconds=5)
+
+CHANGE_FIELDS = ("id", "worker_id", "date", "slot", "present", "created_at", "updated_at")
+
+
+def encode_watermark(updated_at, pk):
+    raw = f"{updated_at.isoformat()}|{pk}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_watermark(value):
+    """
+    Return (updated_at, id) from a watermark token, or from a plain ISO
+    datetime for a first sync. Raises ValueError on anything else.
+    """
+    if not value:
+        return None
+
+    stamp, pk = value, 0
+    try:
+        raw = urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        if "|" in raw:
+            stamp, pk = raw.rsplit("|", 1)
+            pk = int(pk)
+    except ValueError:
+        pass
+
+    try:
+        updated_at = parse_datetime(stamp)
+    except ValueError:
+        updated_at = None
+    if updated_at is None:
+        raise ValueError(f"Invalid watermark: {value}")
+
+    if timezone.is_naive(updated_at):
+        updated_at = timezone.make_aware(updated_at)
+    return updated_at, pk
+
+
+def changes_since(watermark=None, now=None):
+    """
+    Attendance rows changed after ``watermark`` as ``values()`` dicts,
+    oldest first, ordered by (updated_at, id) so ties on the timestamp
+    page cleanly through the attendance_updated_idx index.
+    """
+    now = now or timezone.now()
+    records = Attendance.objects.filter(updated_at__lte=now - SAFETY_LAG)
+
+    if watermark is not None:
+        updated_at, pk = watermark
+        records = records.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk)
+        )
+
+    return records.order_by("updated_at", "id").values(*CHANGE_FIELDS)
@@ -0,0 +1,293 @@
+import csv
+import tempfile
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from .models import Attendance, Slot
+from .routers import pin
+
+
+# Rows fetched per round trip while streaming a report.
+CHUNK_SIZE = 2000
+
+# Longest range a single request may export.
+MAX_RANGE_DAYS = 366
+
+# Exports are written here and only spill to disk past this size.
+SPOOL_SIZE = 1024 * 1024
+
+FORMATS = ("pdf", "csv", "xlsx")
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+HEADER = ("Date", "Worker", "Slot")
+
+
+# ================= FILTERS =================
+def parse_date(value, default):
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+
+def parse_id(value, label):
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {label}: {value}")
+
+
+def parse_report_filters(params):
+    """
+    Read start/end/slot/worker/format from a QueryDict (or plain dict).
+
+    Both dates default to today. Raises ValueError with a message fit
+    for the user when a value is malformed.
+    """
+    today = date.today()
+
+    start = parse_date(params.get("start"), today)
+    end = parse_date(params.get("end"), start)
+
+    if end < start:
+        raise ValueError("End date is before start date.")
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise ValueError(f"Date range is limited to {MAX_RANGE_DAYS} days.")
+
+    fmt = (params.get("format") or "pdf").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    return {
+        "start": start,
+        "end": end,
+        "slot": parse_id(params.get("slot"), "slot"),
+        "worker": parse_id(params.get("worker"), "worker"),
+        "format": fmt,
+    }
+
+
+def report_filename(filters):
+    if filters["start"] == filters["end"]:
+        stem = f"attendance_{filters['start']}"
+    else:
+        stem = f"attendance_{filters['start']}_{filters['end']}"
+    return f"{stem}.{filters['format']}"
+
+
+# ================= ROWS =================
+def slot_names():
+    names = dict(Attendance.SLOT_CHOICES)
+    names.update(Slot.objects.values_list("id", "name"))
+    return names
+
+
+def report_records(filters):
+    """Attendance rows, present or not, in the range and filters of a report."""
+    records = Attendance.objects.filter(date__range=(filters["start"], filters["end"]))
+    if filters["slot"] is not None:
+        records = records.filter(slot=filters["slot"])
+    if filters["worker"] is not None:
+        records = records.filter(worker_id=filters["worker"])
+    return records
+
+
+def report_queryset(filters):
+    """The present rows of a report, as the exports read them."""
+    return report_records(filters).filter(present=True).order_by("date", "slot", "worker__name").values_list(
+        "date", "worker__name", "slot"
+    )
+
+
+def iter_report_rows(filters):
+    """
+    Yield (date, worker name, slot name) for present records, streamed
+    from the database in CHUNK_SIZE batches.
+    """
+    names = slot_names()
+    rows = pin(report_queryset(filters)).iterator(chunk_size=CHUNK_SIZE)
+    return (
+        (day, name, names.get(slot, f"Slot {slot}"))
+        for day, name, slot in rows
+    )
+
+
+def aiter_report_rows(filters):
+    """iter_report_rows for async views."""
+    # values() rather than values_list(): Django runs the first query of
+    # a values_list().aiterator() on the event loop and refuses it.
+    rows = pin(report_queryset(filters)).values("date", "worker__name", "slot")
+    return _anamed_rows(rows)
+
+
+async def _anamed_rows(rows):
+    names = await sync_to_async(slot_names)()
+    async for row in rows.aiterator(chunk_size=CHUNK_SIZE):
+        yield row["date"], row["worker__name"], names.get(row["slot"], f"Slot {row['slot']}")
+
+
+# ================= CSV =================
+# Worker names come from self-registration. A spreadsheet opening the
+# export runs any cell starting with one of these as a formula, so such
+# cells get a leading apostrophe (importers.clean_row strips it again).
+# A lone character can't be a formula, and "-" marks an empty matrix cell.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def escape_cell(value):
+    if isinstance(value, str) and len(value) > 1 and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _escaped(row):
+    return [escape_cell(value) for value in row]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, header=HEADER):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(_escaped(header))
+    for row in rows:
+        yield writer.writerow(_escaped(row))
+
+
+async def astream_csv(rows, header=HEADER):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(_escaped(header))
+    async for row in rows:
+        yield writer.writerow(_escaped(row))
+
+
+def write_csv(rows, fh):
+    for line in stream_csv(rows):
+        fh.write(line.encode())
+
+
+# ================= XLSX =================
+def _text_cell(sheet, value):
+    # openpyxl stores any string starting with "=" as a formula.
+    cell = WriteOnlyCell(sheet, value)
+    if isinstance(value, str):
+        cell.data_type = "s"
+    return cell
+
+
+def write_xlsx(rows, fh):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Attendance")
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append([_text_cell(sheet, value) for value in row])
+    workbook.save(fh)
+
+
+# ================= PDF =================
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 50
+ROW_HEIGHT = 20
+COLUMNS = (MARGIN, MARGIN + 100, MARGIN + 380, PAGE_WIDTH - MARGIN)
+
+
+def _pdf_page_header(p, title, page_no):
+    p.setFont("Helvetica-Bold", 14)
+    p.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - MARGIN, title)
+
+    p.setFont("Helvetica", 9)
+    p.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f"Page {page_no}")
+
+    y = PAGE_HEIGHT - MARGIN - 40
+    p.setFillColor(colors.HexColor("#1e40af"))
+    p.rect(COLUMNS[0], y - 6, COLUMNS[-1] - COLUMNS[0], ROW_HEIGHT, stroke=0, fill=1)
+    p.setFillColor(colors.white)
+    p.setFont("Helvetica-Bold", 11)
+    for x, label in zip(COLUMNS, HEADER):
+        p.drawString(x + 6, y, label)
+
+    p.setFillColor(colors.black)
+    p.setFont("Helvetica", 10)
+    return y - ROW_HEIGHT
+
+
+def _pdf_row(p, y, values):
+    p.setStrokeColor(colors.lightgrey)
+    p.line(COLUMNS[0], y - 6, COLUMNS[-1], y - 6)
+    for x, value in zip(COLUMNS, values):
+        p.drawString(x + 6, y, str(value))
+
+
+def write_pdf(rows, fh, title):
+    """
+    Draw rows as a table, one page at a time.
+
+    Each page is closed with showPage() as soon as it fills up. A PDF
+    ends with a cross-reference table of every object, so the finished
+    document is written to ``fh`` at the end.
+    """
+    p = canvas.Canvas(fh, pagesize=A4, pageCompression=1)
+    p.setTitle(title)
+
+    page_no = 1
+    y = _pdf_page_header(p, title, page_no)
+    empty = True
+
+    for row in rows:
+        empty = False
+        if y < MARGIN:
+            p.showPage()
+            page_no += 1
+            y = _pdf_page_header(p, title, page_no)
+
+        _pdf_row(p, y, row)
+        y -= ROW_HEIGHT
+
+    if empty:
+        p.drawString(COLUMNS[0] + 6, y, "No attendance marked for this selection.")
+
+    p.showPage()
+    p.save()
+
+
+def report_title(filters):
+    if filters["start"] == filters["end"]:
+        return f"Attendance Report - {filters['start']}"
+    return f"Attendance Report - {filters['start']} to {filters['end']}"
+
+
+def render_report_file(filters):
+    """
+    Render a report into a spooled temporary file, rewound and ready to
+    stream. Small reports stay in memory; large ones spill to disk
+    instead of growing the worker's heap.
+    """
+    fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    rows = iter_report_rows(filters)
+
+    if filters["format"] == "csv":
+        write_csv(rows, fh)
+    elif filters["format"] == "xlsx":
+        write_xlsx(rows, fh)
+    else:
+        write_pdf(rows, fh, report_title(filters))
+
+    fh.seek(0)
+    return fh
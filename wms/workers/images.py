@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import user_changed, worker_changed
+from .models import processed_photo_name
+
+logger = logging.getLogger(__name__)
+
+
+# Longest side of the re-encoded photo kept as ``photo``.
+MAX_SIZE = (1024, 1024)
+
+# Square thumbnails used by roster tables, the navbar and profile pages.
+THUMB_SIZE = (160, 160)
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+PHOTO_MODELS = ("workers.Worker", "workers.UserProfile")
+
+# The photo is swapped with update(), which sends no post_save; these are
+# the receivers it would have reached.
+CACHE_RECEIVERS = {
+    "workers.Worker": worker_changed,
+    "workers.UserProfile": user_changed,
+}
+
+
+def _encode(image, fmt, quality):
+    buffer = BytesIO()
+    # A freshly converted image carries no EXIF, so nothing from the
+    # camera (GPS position, device serials) is written back out.
+    image.save(buffer, fmt, quality=quality, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def _store(name, content):
+    if default_storage.exists(name):
+        return
+    saved = default_storage.save(name, content)
+    if saved != name:
+        # Another worker stored the same content first; keep theirs.
+        default_storage.delete(saved)
+
+
+def store_variants(data):
+    """
+    Re-encode uploaded image bytes and write the photo, a JPEG thumbnail
+    and a WebP thumbnail under a name derived from the content hash.
+    Identical uploads map to the same files and are only encoded once.
+    Returns the hash.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+
+    if default_storage.exists(processed_photo_name(digest, "_thumb.webp")):
+        return digest
+
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail(MAX_SIZE)
+
+    thumb = ImageOps.fit(image, THUMB_SIZE)
+
+    _store(processed_photo_name(digest), _encode(image, "JPEG", JPEG_QUALITY))
+    _store(processed_photo_name(digest, "_thumb.jpg"), _encode(thumb, "JPEG", JPEG_QUALITY))
+    # Written last: its presence marks the set as complete (see above).
+    _store(processed_photo_name(digest, "_thumb.webp"), _encode(thumb, "WEBP", WEBP_QUALITY))
+
+    return digest
+
+
+def _referenced(name):
+    return any(
+        apps.get_model(label).objects.filter(photo=name).exists()
+        for label in PHOTO_MODELS
+    )
+
+
+def process_photo(model_label, pk):
+    """Replace one row's raw upload with its processed, deduplicated version."""
+    model = apps.get_model(model_label)
+    obj = model.objects.filter(pk=pk).first()
+
+    if obj is None or not obj.photo or obj.photo_processed:
+        return
+
+    original = obj.photo.name
+
+    try:
+        with obj.photo.open("rb") as fh:
+            digest = store_variants(fh.read())
+    except Exception:
+        logger.exception("Could not process photo %s for %s %s", original, model_label, pk)
+        return
+
+    updated = model.objects.filter(pk=pk, photo=original).update(
+        photo=processed_photo_name(digest),
+        photo_hash=digest,
+    )
+
+    if not updated:
+        return
+
+    if not _referenced(original):
+        default_storage.delete(original)
+
+    CACHE_RECEIVERS[model_label](model, instance=obj)
+
+
+# ================= QUEUE =================
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _executor_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PHOTO_WORKERS", 2),
+                thread_name_prefix="photos",
+            )
+    return _executor
+
+
+def _run(model_label, pk):
+    close_old_connections()
+    try:
+        process_photo(model_label, pk)
+    finally:
+        close_old_connections()
+
+
+def enqueue_photo(instance):
+    """Process ``instance.photo`` off the request thread once the row is committed."""
+    label = instance._meta.label
+    pk = instance.pk
+
+    if getattr(settings, "PHOTO_PROCESSING", "thread") == "sync":
+        transaction.on_commit(lambda: process_photo(label, pk))
+    else:
+        transaction.on_commit(lambda: _executor_pool().submit(_run, label, pk))
+
+
+def photo_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.photo or instance.photo_processed:
+        return
+    if update_fields is not None and "photo" not in update_fields:
+        return
+    enqueue_photo(instance)
@@ -0,0 +1,213 @@
+import csv
+import io
+from datetime import date, datetime
+from itertools import islice
+from zipfile import BadZipFile
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from .cache import after_commit, rosters
+from .exports import FORMULA_PREFIXES
+from .models import Worker
+
+
+# Rows validated and inserted per round trip.
+BATCH_SIZE = 500
+
+# Stop collecting error messages after this many; the count keeps going.
+MAX_ERRORS = 100
+
+COLUMNS = ("name", "dob", "phone", "email")
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+
+# Raised while reading a file that is not a UTF-8 CSV or an .xlsx
+# workbook. Rows are read inside the import's transaction, so nothing
+# is kept.
+UNREADABLE_FILE_ERRORS = (UnicodeDecodeError, csv.Error, BadZipFile, InvalidFileException)
+
+
+class ImportAborted(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.rejected = 0
+        self.errors = []
+        self.committed = False
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def __str__(self):
+        state = "imported" if self.committed else "not imported"
+        return f"{self.created} worker(s) {state}, {self.rejected} row(s) rejected"
+
+
+# ================= READERS =================
+def _clean_header(header):
+    return [str(h or "").strip().lower() for h in header]
+
+
+def iter_csv_rows(fh):
+    """Yield (line number, row dict) from a binary CSV file, one line at a time."""
+    text = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = _clean_header(next(reader, []))
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield reader.line_num, dict(zip(header, row))
+
+
+def iter_xlsx_rows(fh):
+    """Yield (row number, row dict) from the first sheet without loading it whole."""
+    workbook = load_workbook(fh, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = _clean_header(next(rows, []))
+        for number, row in enumerate(rows, start=2):
+            if any(cell not in (None, "") for cell in row):
+                yield number, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def iter_rows(fh, filename):
+    if filename.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(fh)
+    return iter_csv_rows(fh)
+
+
+# ================= VALIDATION =================
+def _text(value):
+    if value is None:
+        return ""
+    value = str(value).strip()
+    # Undo exports.escape_cell, so an exported roster imports unchanged.
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        value = value[1:]
+    return value
+
+
+def _parse_dob(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date of birth {value!r}")
+
+
+def clean_row(row):
+    """Return an unsaved Worker for one import row, or raise ValueError."""
+    name = _text(row.get("name"))
+    phone = _text(row.get("phone") or row.get("mobile"))
+    email = _text(row.get("email")).lower() or None
+
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > 100:
+        raise ValueError("name is longer than 100 characters")
+    if not phone:
+        raise ValueError("phone is required")
+    if len(phone) > 15:
+        raise ValueError("phone is longer than 15 characters")
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError(f"invalid email {email!r}")
+
+    return Worker(name=name, dob=_parse_dob(row.get("dob")), phone=phone, email=email)
+
+
+def _validate_batch(batch, result):
+    workers = []
+    for line, row in batch:
+        try:
+            workers.append((line, clean_row(row)))
+        except ValueError as e:
+            result.reject(line, str(e))
+
+    # Earlier batches are already inserted in this transaction, so one
+    # lookup per batch catches duplicates against the table and the file.
+    taken_phones = set(
+        Worker.objects.filter(phone__in=[w.phone for _, w in workers]).values_list("phone", flat=True)
+    )
+    # Imported emails are lowercased; stored ones may not be.
+    taken_emails = set(
+        Worker.objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=[w.email for _, w in workers if w.email])
+        .values_list("email_lower", flat=True)
+    )
+
+    valid = []
+    for line, worker in workers:
+        if worker.phone in taken_phones:
+            result.reject(line, f"duplicate phone {worker.phone}")
+            continue
+        if worker.email and worker.email in taken_emails:
+            result.reject(line, f"duplicate email {worker.email}")
+            continue
+        taken_phones.add(worker.phone)
+        if worker.email:
+            taken_emails.add(worker.email)
+        valid.append(worker)
+
+    return valid
+
+
+# ================= IMPORT =================
+def import_workers(rows, skip_invalid=False, dry_run=False):
+    """
+    Validate and insert workers from (line, row dict) pairs in batches,
+    all inside one transaction.
+
+    Any rejected row rolls the whole import back unless ``skip_invalid``
+    is set, in which case only the valid rows are kept.
+    """
+    result = ImportResult()
+    rows = iter(rows)
+
+    try:
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+
+                valid = _validate_batch(batch, result)
+                Worker.objects.bulk_create(valid, batch_size=BATCH_SIZE)
+                result.created += len(valid)
+
+            if dry_run or (result.rejected and not skip_invalid):
+                raise ImportAborted
+    except ImportAborted:
+        return result
+
+    result.committed = True
+    # bulk_create sends no post_save, so the roster cache is dropped here.
+    after_commit(rosters.invalidate)
+    return result
+
+
+# ================= EXPORT =================
+EXPORT_HEADER = ("id", "name", "dob", "phone", "email")
+
+
+def iter_worker_rows(chunk_size=2000):
+    return Worker.objects.order_by("id").values_list(*EXPORT_HEADER).iterator(chunk_size=chunk_size)
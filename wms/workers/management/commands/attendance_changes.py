@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from workers.changes import changes_since, decode_watermark, encode_watermark
+
+
+class Command(BaseCommand):
+    help = (
+        "Write attendance rows changed since a watermark as JSON lines. "
+        "The new watermark is printed on stderr for the next run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", default="",
+                            help="Watermark from the previous run, or an ISO datetime.")
+        parser.add_argument("--output", help="Write to this file instead of stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            since = decode_watermark(options["since"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        out = open(options["output"], "w") if options["output"] else self.stdout
+        last = None
+        count = 0
+
+        try:
+            for row in changes_since(since).iterator(chunk_size=options["chunk_size"]):
+                out.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+                last = row
+                count += 1
+        finally:
+            if out is not self.stdout:
+                out.close()
+
+        watermark = encode_watermark(last["updated_at"], last["id"]) if last else options["since"]
+        self.stderr.write(f"{count} change(s); watermark: {watermark or '-'}")
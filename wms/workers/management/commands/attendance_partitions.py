@@ -0,0 +1,112 @@
+import csv
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workers.partitions import (
+    ARCHIVE_FIELDS, MONTHS_AHEAD, archive_month, archive_storage, archived_months, closed_months,
+    detach_partition, ensure_partitions, is_partitioned, iter_archived, partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain monthly attendance partitions: create the coming months, "
+        "detach closed ones (or archive them to ATTENDANCE_ARCHIVE_STORAGE), "
+        "and query the archives."
+    )
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest="action", required=True)
+
+        maintain = actions.add_parser(
+            "maintain", help="Create future partitions and detach months past retention. Run daily."
+        )
+        maintain.add_argument("--ahead", type=int, default=MONTHS_AHEAD,
+                              help="Months of partitions to keep ready after the current one.")
+        maintain.add_argument("--retain", type=int,
+                              help="Months kept live, the current one included (ATTENDANCE_RETAIN_MONTHS).")
+        maintain.add_argument("--archive", action="store_true",
+                              help="Archive closed months to ATTENDANCE_ARCHIVE_STORAGE and delete them, "
+                                   "instead of detaching them into plain tables.")
+        maintain.add_argument("--dry-run", action="store_true")
+
+        actions.add_parser("status", help="List live, detached and archived months.")
+
+        query = actions.add_parser("query", help="Print archived marks as CSV.")
+        query.add_argument("--start", required=True)
+        query.add_argument("--end")
+        query.add_argument("--worker", type=int)
+        query.add_argument("--slot", type=int)
+
+    def handle(self, *args, **options):
+        getattr(self, options["action"])(options)
+
+    def maintain(self, options):
+        if options["retain"] is not None and options["retain"] < 1:
+            raise CommandError("--retain must be at least 1")
+
+        if options["archive"]:
+            try:
+                archive_storage()
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        # Archiving also picks up months an earlier run detached.
+        months = closed_months(options["retain"], detached=options["archive"])
+        if options["dry_run"]:
+            action = "archive" if options["archive"] else "detach"
+            self.stdout.write(f"Would {action}: {', '.join(f'{m:%Y-%m}' for m in months) or '-'}")
+            return
+
+        for name in ensure_partitions(options["ahead"]):
+            self.stdout.write(f"Created {name}")
+
+        if months and not options["archive"] and not is_partitioned():
+            self.stdout.write(
+                f"Kept {len(months)} closed month(s): the attendance table is not partitioned, "
+                f"so they can only be archived (--archive)."
+            )
+            months = []
+
+        # One month failing (a storage outage, a short file) is reported
+        # and left for the next run; the other months still go.
+        failed = []
+        for month in months:
+            try:
+                if not options["archive"]:
+                    self.stdout.write(f"Detached {detach_partition(month)}")
+                    continue
+                name, count = archive_month(month)
+            except Exception as e:
+                failed.append(month)
+                self.stderr.write(f"Failed {month:%Y-%m}: {e}")
+                continue
+            self.stdout.write(f"Archived {month:%Y-%m}: {count} rows to {name}")
+
+        if failed:
+            raise CommandError(f"{len(failed)} month(s) failed: {', '.join(f'{m:%Y-%m}' for m in failed)}")
+
+        self.stdout.write(self.style.SUCCESS("Attendance partitions up to date."))
+
+    def status(self, options):
+        if is_partitioned():
+            for month, attached in partitions().items():
+                self.stdout.write(f"{month:%Y-%m}  {'live' if attached else 'detached'}")
+        else:
+            self.stdout.write("Attendance table is not partitioned.")
+
+        for month in archived_months():
+            self.stdout.write(f"{month:%Y-%m}  archived")
+
+    def query(self, options):
+        try:
+            start = date.fromisoformat(options["start"])
+            end = date.fromisoformat(options["end"]) if options["end"] else start
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        writer = csv.writer(self.stdout)
+        writer.writerow(ARCHIVE_FIELDS)
+        for row in iter_archived(start, end, worker=options["worker"], slot=options["slot"]):
+            writer.writerow([row[field] for field in ARCHIVE_FIELDS])
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from workers.exports import report_queryset
+from workers.models import UserProfile, Worker
+from workers.pagination import PAGE_SIZE
+from workers.summaries import month_start
+from workers.synthetic import seed
+from workers.views import month_records, present_names, roster_workers, user_profile, worker_months
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Print the query plan of each view's hot query, optionally against seeded data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-workers", type=int, default=0,
+                            help="Seed this many synthetic workers first (rolled back afterwards).")
+        parser.add_argument("--seed-days", type=int, default=30,
+                            help="Days of attendance to seed per worker.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["seed_workers"]:
+                    seed(workers=options["seed_workers"], days=options["seed_days"])
+                    self.stdout.write("Seeded synthetic data (will be rolled back).")
+                    if connection.vendor == "postgresql":
+                        with connection.cursor() as cursor:
+                            cursor.execute("ANALYZE")
+
+                self.explain_all()
+                raise Rollback
+        except Rollback:
+            pass
+
+    def explain_all(self):
+        # The views' own querysets, so the plans can't drift from what runs.
+        today = date.today()
+        profile = UserProfile.objects.exclude(worker=None).order_by("id").first()
+        user = profile.user_id if profile else 0
+        worker = profile.worker_id if profile else Worker.objects.values_list("id", flat=True).first() or 0
+
+        queries = {
+            "display": present_names(today),
+            "download_attendance": report_queryset({
+                "start": today - timedelta(days=30), "end": today, "slot": None, "worker": None,
+            }),
+            "user_dashboard (worker lookup)": user_profile(user),
+            "user_dashboard (history)": month_records(worker, month_start(today)),
+            "user_dashboard (months)": worker_months(worker),
+            "home (roster page)": roster_workers().order_by("pk")[:PAGE_SIZE + 1],
+        }
+
+        analyze = connection.vendor == "postgresql"
+
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name} =="))
+            self.stdout.write(str(queryset.query))
+            plan = queryset.explain(analyze=True) if analyze else queryset.explain()
+            self.stdout.write(plan)
+            self.stdout.write("")
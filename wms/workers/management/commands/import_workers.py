@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from workers.importers import UNREADABLE_FILE_ERRORS, import_workers, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk-create workers from a CSV or XLSX file (columns: name, dob, phone, email)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--skip-invalid", action="store_true",
+                            help="Import the valid rows even if some are rejected.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Validate everything, then roll back.")
+
+    def handle(self, *args, **options):
+        try:
+            fh = open(options["path"], "rb")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with fh:
+            try:
+                result = import_workers(
+                    iter_rows(fh, options["path"]),
+                    skip_invalid=options["skip_invalid"],
+                    dry_run=options["dry_run"],
+                )
+            except UNREADABLE_FILE_ERRORS as e:
+                raise CommandError(f"{options['path']} is not a UTF-8 CSV or an .xlsx file: {e}")
+
+        for line, error in result.errors:
+            self.stderr.write(f"line {line}: {error}")
+
+        style = self.style.SUCCESS if result.committed else self.style.WARNING
+        self.stdout.write(style(str(result)))
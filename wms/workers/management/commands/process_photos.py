@@ -0,0 +1,20 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from workers.images import PHOTO_MODELS, process_photo
+
+
+class Command(BaseCommand):
+    help = "Re-encode, thumbnail and deduplicate photos uploaded before the pipeline existed."
+
+    def handle(self, *args, **options):
+        for label in PHOTO_MODELS:
+            model = apps.get_model(label)
+            done = 0
+
+            for obj in model.objects.exclude(photo="").exclude(photo=None).only("photo", "photo_hash").iterator():
+                if not obj.photo_processed:
+                    process_photo(label, obj.pk)
+                    done += 1
+
+            self.stdout.write(f"{label}: processed {done} photo(s)")
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from workers.models import Attendance
+from workers.summaries import month_end, month_start, next_month, refresh_daily, refresh_monthly
+
+
+class Command(BaseCommand):
+    help = "Recompute DailySlotSummary and WorkerMonthlySummary from raw attendance."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="Only rebuild this month (YYYY-MM).")
+
+    def handle(self, *args, **options):
+        if options["month"]:
+            try:
+                first = date.fromisoformat(f"{options['month']}-01")
+            except ValueError:
+                raise CommandError("--month must look like YYYY-MM")
+            last = first
+        else:
+            bounds = Attendance.objects.aggregate(first=Min("date"), last=Max("date"))
+            if bounds["first"] is None:
+                self.stdout.write("No attendance recorded; nothing to rebuild.")
+                return
+            first, last = month_start(bounds["first"]), month_start(bounds["last"])
+
+        month = first
+        while month <= last:
+            # One transaction per month keeps locks short on a large history.
+            with transaction.atomic():
+                days = refresh_daily(month, month_end(month))
+                workers = refresh_monthly(month)
+
+            self.stdout.write(f"{month:%Y-%m}: {days} slot-days, {workers} worker summaries")
+            month = next_month(month)
+
+        self.stdout.write(self.style.SUCCESS("Summaries rebuilt."))
+
@@ -0,0 +1,81 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from workers.benchmarks import TOLERANCE, compare, run_size
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main views against synthetic data of several sizes. "
+        "Everything seeded is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000",
+                            help="Comma-separated worker counts.")
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Requests per scenario; the first is reported as cold.")
+        parser.add_argument("--only", default="",
+                            help="Comma-separated scenario names to run.")
+        parser.add_argument("--output", help="Write the results here as a JSON baseline.")
+        parser.add_argument("--compare", help="Fail if results regress against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                            help="Allowed warm latency slowdown, as a fraction.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers.")
+        only = {name for name in options["only"].split(",") if name}
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline: {e}")
+
+        results = {
+            "database": connection.vendor,
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "days": options["days"],
+            "sizes": {},
+        }
+
+        # Lets the test client through ALLOWED_HOSTS and uses the
+        # in-memory email backend.
+        setup_test_environment()
+        try:
+            for size in sizes:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"== {size} workers =="))
+                scenarios = run_size(size, options["days"], options["repeat"], only)
+                results["sizes"][str(size)] = scenarios
+                for name, result in scenarios.items():
+                    self.stdout.write(
+                        f"{name:16} {result['status']}  cold {result['cold_ms']:8.1f} ms  "
+                        f"warm {result['warm_ms']:8.1f} ms  {result['queries']:3} queries"
+                    )
+        finally:
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Baseline written to {options['output']}")
+
+        if baseline is not None:
+            problems = compare(results, baseline, options["tolerance"])
+            for problem in problems:
+                self.stderr.write(self.style.ERROR(problem))
+            if problems:
+                raise CommandError(f"{len(problems)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,123 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+
+# Housekeeping (stale and expired jobs) runs this often, in seconds.
+HOUSEKEEPING_EVERY = 15 * 60
+
+
+# Spawned processes import this module to find _init_process before
+# Django is set up, so nothing here may import models at module level.
+def _init_process():
+    django.setup()
+
+
+def _run_job(job_id):
+    from workers.reports import run_job
+
+    # Like a request: drop connections that broke or aged out meanwhile.
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Render queued attendance reports (ReportJob) on a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=getattr(settings, "REPORT_JOB_PROCESSES", 2),
+                            help="Reports rendered at once (REPORT_JOB_PROCESSES).")
+        parser.add_argument("--poll", type=float, default=2.0,
+                            help="Seconds between queue checks when idle.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty instead of waiting for more jobs.")
+
+    def handle(self, *args, **options):
+        from workers.reports import HEARTBEAT_EVERY, claim_job, heartbeat, release_job
+
+        processes = max(1, options["processes"])
+
+        connections.close_all()
+        pool = self.pool(processes)
+        running = {}
+        housekeeping_at = 0
+        heartbeat_at = 0
+
+        self.stdout.write(f"Report worker started with {processes} process(es).")
+
+        try:
+            while True:
+                if time.monotonic() >= housekeeping_at:
+                    self.housekeeping()
+                    housekeeping_at = time.monotonic() + HOUSEKEEPING_EVERY
+
+                # This process sees its pool's processes die, so while it
+                # is alive their jobs are too.
+                if running and time.monotonic() >= heartbeat_at:
+                    heartbeat(running.values())
+                    heartbeat_at = time.monotonic() + HEARTBEAT_EVERY.total_seconds()
+
+                while len(running) < processes:
+                    job_id = claim_job()
+                    if job_id is None:
+                        break
+                    running[pool.submit(_run_job, job_id)] = job_id
+                    self.stdout.write(f"Job {job_id} started")
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll"])
+                    continue
+
+                done, _ = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    error = future.exception()
+                    # run_job records its own failures; this only fires if
+                    # the process itself died (killed, out of memory).
+                    if error is not None:
+                        self.stderr.write(f"Job {job_id} lost: {error!r}")
+                        release_job(job_id, f"Worker process died: {error!r}")
+                        broken = broken or isinstance(error, BrokenProcessPool)
+                    else:
+                        self.stdout.write(f"Job {job_id} finished")
+
+                if broken:
+                    # A dead process breaks the whole pool; start a new one.
+                    for future, job_id in running.items():
+                        release_job(job_id, "Worker process died.")
+                    running.clear()
+                    pool.shutdown(wait=False)
+                    pool = self.pool(processes)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; jobs in progress will finish first.")
+        finally:
+            pool.shutdown(wait=True)
+
+    def pool(self, processes):
+        # Spawned rather than forked, so no process inherits this one's
+        # database connection.
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+        )
+
+    def housekeeping(self):
+        from workers.reports import purge_jobs, requeue_stale
+
+        requeued, failed = requeue_stale()
+        purged = purge_jobs()
+        if requeued or failed or purged:
+            self.stdout.write(f"Requeued {requeued}, failed {failed}, purged {purged} job(s)")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from workers.synthetic import seed
+
+
+class Command(BaseCommand):
+    help = "Create synthetic workers, slots and attendance for local testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=100)
+        parser.add_argument("--days", type=int, default=30,
+                            help="Days of attendance per active slot, ending today.")
+        parser.add_argument("--present-rate", type=float, default=0.85)
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Random seed, so runs are reproducible.")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["present_rate"] <= 1:
+            raise CommandError("--present-rate must be between 0 and 1.")
+
+        with transaction.atomic():
+            written = seed(
+                workers=options["workers"],
+                days=options["days"],
+                present_rate=options["present_rate"],
+                random_seed=options["seed"],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {written['workers']} workers and {written['attendance']} attendance rows."
+        ))
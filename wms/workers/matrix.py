@@ -0,0 +1,314 @@
+import tempfile
+from array import array
+from datetime import date, timedelta
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+from django.db.models.functions import TruncDate
+from django.utils.safestring import mark_safe
+
+from .exports import CHUNK_SIZE, SPOOL_SIZE, parse_date, parse_id
+from .models import Attendance, Slot, Worker
+from .routers import pin
+from .summaries import month_end, month_start, presence_only
+
+
+# Longest range one matrix may cover.
+MAX_DAYS = 62
+
+FORMATS = ("html", "csv", "pdf")
+
+PRESENT, ABSENT, UNMARKED = "P", "A", "-"
+
+# Byte b of a bit array as eight 0/1 bytes, lowest bit first.
+_SPREAD = [bytes((b >> i) & 1 for i in range(8)) for b in range(256)]
+
+# marked + present of a cell: 0 no record, 1 absent, 2 present.
+_STATES = bytes.maketrans(b"\x00\x01\x02", (UNMARKED + ABSENT + PRESENT).encode())
+
+
+class AttendanceMatrix:
+    """
+    Marks of every worker for every day and slot of a date range.
+
+    Each (worker, day, slot) cell is one bit in two bytearrays: ``marked``
+    (a row exists) and ``present``. Cells are laid out worker by worker,
+    then day by day, then slot by slot, so a worker's month is one
+    contiguous run of bits. 1,000 workers x 31 days x 3 slots fit in
+    about 23 KB, against hundreds of thousands of Python objects for a
+    nested dict of the same grid.
+    """
+
+    def __init__(self, start, end, workers, slots):
+        self.start = start
+        self.end = end
+        self.days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        self.workers = workers
+        self.slots = slots
+
+        self.worker_index = {worker_id: i for i, (worker_id, _) in enumerate(workers)}
+        self.slot_index = {slot_id: i for i, (slot_id, _) in enumerate(slots)}
+
+        size = len(workers) * len(self.days) * len(slots)
+        self.marked = bytearray((size + 7) // 8)
+        self.present = bytearray((size + 7) // 8)
+
+        self.worker_totals = array("I", bytes(4 * len(workers)))
+        self.day_totals = array("I", bytes(4 * len(self.days) * len(slots)))
+
+        self._grid = None
+
+    def _bit(self, w, d, s):
+        return (w * len(self.days) + d) * len(self.slots) + s
+
+    def mark_absent(self, w, first, last):
+        """
+        Count days ``first`` to ``last`` of worker ``w`` as absent where
+        nothing says otherwise; for presence-only data, where an absence
+        is the lack of a row. Call before adding the rows.
+        """
+        for bit in range(self._bit(w, first, 0), self._bit(w, last + 1, 0)):
+            self.marked[bit >> 3] |= 1 << (bit & 7)
+        self._grid = None
+
+    def add(self, worker_id, day, slot, present):
+        self.add_rows([(worker_id, day, slot, present)])
+
+    def add_rows(self, rows):
+        """
+        Set the cells of (worker_id, date, slot, present) rows. One loop
+        with everything it touches held in locals: a month of a large
+        roster is 100,000 rows, and a method call or attribute lookup
+        per row shows up in the page time.
+        """
+        worker_index = self.worker_index
+        slot_index = self.slot_index
+        day_index = {day: d for d, day in enumerate(self.days)}
+        marked, present_bits = self.marked, self.present
+        worker_totals, day_totals = self.worker_totals, self.day_totals
+        n_days, n_slots = len(self.days), len(self.slots)
+
+        for worker_id, day, slot, present in rows:
+            w = worker_index.get(worker_id)
+            s = slot_index.get(slot)
+            if w is None or s is None:
+                continue
+
+            d = day_index[day]
+            bit = (w * n_days + d) * n_slots + s
+            mask = 1 << (bit & 7)
+
+            marked[bit >> 3] |= mask
+            if present:
+                present_bits[bit >> 3] |= mask
+                worker_totals[w] += 1
+                day_totals[d * n_slots + s] += 1
+        self._grid = None
+
+    def state(self, w, d, s):
+        bit = self._bit(w, d, s)
+        mask = 1 << (bit & 7)
+        if not self.marked[bit >> 3] & mask:
+            return UNMARKED
+        return PRESENT if self.present[bit >> 3] & mask else ABSENT
+
+    def grid(self):
+        """
+        Every cell's letter in bit order, as one string. Both bit arrays
+        are spread to a byte per cell and added as two big integers, so
+        the whole grid is decoded without a Python step per cell.
+        """
+        if self._grid is None:
+            size = len(self.marked) * 8
+            marked = int.from_bytes(b"".join(_SPREAD[b] for b in self.marked), "big")
+            present = int.from_bytes(b"".join(_SPREAD[b] for b in self.present), "big")
+            self._grid = (marked + present).to_bytes(size, "big").translate(_STATES).decode()
+        return self._grid
+
+    def day_cells(self, w):
+        """One string per day, one letter per slot (e.g. "PA-")."""
+        n = len(self.slots)
+        row = self.grid()[self._bit(w, 0, 0):self._bit(w + 1, 0, 0)]
+        return [row[i:i + n] for i in range(0, len(row), n)]
+
+    def rows(self):
+        """(worker name, per-day cells, present total) for every worker."""
+        for w, (_, name) in enumerate(self.workers):
+            yield name, self.day_cells(w), self.worker_totals[w]
+
+    def totals_by_day(self):
+        n = len(self.slots)
+        return [sum(self.day_totals[d * n:(d + 1) * n]) for d in range(len(self.days))]
+
+
+# ================= BUILD =================
+def parse_matrix_filters(params):
+    """
+    start/end (default: the current month), slot and format from a
+    QueryDict. Raises ValueError with a message fit for the user.
+    """
+    start = parse_date(params.get("start"), month_start(date.today()))
+    end = parse_date(params.get("end"), month_end(start))
+
+    if end < start:
+        raise ValueError("End date is before start date.")
+    if (end - start).days >= MAX_DAYS:
+        raise ValueError(f"The matrix is limited to {MAX_DAYS} days.")
+
+    fmt = (params.get("format") or "html").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    return {
+        "kind": "matrix",
+        "start": start,
+        "end": end,
+        "slot": parse_id(params.get("slot"), "slot"),
+        # Every worker; keeps the filters usable as report job params.
+        "worker": None,
+        "format": fmt,
+    }
+
+
+def build_matrix(filters):
+    """
+    Fill a matrix from a single query over (worker_id, date, slot,
+    present) for the whole range, streamed in chunks.
+    """
+    # The configured slots; the legacy fixed choices only when none are.
+    slots = list(Slot.objects.order_by("start_time", "id").values_list("id", "name"))
+    slots = slots or list(Attendance.SLOT_CHOICES)
+    if filters["slot"] is not None:
+        slots = [(slot_id, name) for slot_id, name in slots if slot_id == filters["slot"]]
+
+    workers = Worker.objects.order_by("name", "id")
+    if not presence_only():
+        matrix = AttendanceMatrix(filters["start"], filters["end"], list(workers.values_list("id", "name")), slots)
+    else:
+        # Only present marks are stored: every day from a worker's first
+        # on the roster up to today is an absence unless a mark says not.
+        rows = list(workers.values_list("id", "name", TruncDate("created_at")))
+        matrix = AttendanceMatrix(filters["start"], filters["end"], [row[:2] for row in rows], slots)
+        last = min((date.today() - matrix.start).days, len(matrix.days) - 1)
+        for w, (_, _, joined) in enumerate(rows):
+            matrix.mark_absent(w, max((joined - matrix.start).days, 0), last)
+
+    marks = Attendance.objects.filter(date__range=(filters["start"], filters["end"]))
+    if filters["slot"] is not None:
+        marks = marks.filter(slot=filters["slot"])
+
+    rows = pin(marks.order_by()).values_list("worker_id", "date", "slot", "present")
+    matrix.add_rows(rows.iterator(chunk_size=CHUNK_SIZE))
+
+    return matrix
+
+
+def matrix_filename(filters):
+    return f"attendance_matrix_{filters['start']}_{filters['end']}.{filters['format']}"
+
+
+# ================= CSV =================
+def matrix_csv_header(matrix):
+    return ["Worker"] + [
+        f"{day} {name}" for day in matrix.days for _, name in matrix.slots
+    ] + ["Present"]
+
+
+def iter_matrix_csv_rows(matrix):
+    for name, cells, total in matrix.rows():
+        yield [name] + [mark for cell in cells for mark in cell] + [total]
+
+
+# ================= HTML =================
+def iter_matrix_html_rows(matrix):
+    """
+    (worker name, day cells as <td>s, present total). The cells are
+    joined here rather than looped over in the template: they are only
+    ever P, A and -, and 30,000 template iterations are most of a
+    month's page time.
+    """
+    for name, cells, total in matrix.rows():
+        yield name, mark_safe("<td>" + "</td><td>".join(cells) + "</td>"), total
+
+
+def matrix_legend():
+    absent = f"{ABSENT} absent (no mark)" if presence_only() else f"{ABSENT} absent"
+    unmarked = "not yet on the roster or still to come" if presence_only() else "no record"
+    return f"{PRESENT} present, {absent}, {UNMARKED} {unmarked}"
+
+
+# ================= PDF =================
+PAGE_WIDTH, PAGE_HEIGHT = landscape(A4)
+MARGIN = 30
+NAME_WIDTH = 120
+TOTAL_WIDTH = 36
+ROW_HEIGHT = 11
+
+
+def _pdf_header(p, matrix, title, page_no, day_width):
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(MARGIN, PAGE_HEIGHT - MARGIN, title)
+
+    p.setFont("Helvetica", 7)
+    legend = f"{matrix_legend()}.   Slots per day: {', '.join(name for _, name in matrix.slots)}"
+    p.drawString(MARGIN, PAGE_HEIGHT - MARGIN - 12, legend)
+    p.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f"Page {page_no}")
+
+    y = PAGE_HEIGHT - MARGIN - 32
+    p.setFillColor(colors.HexColor("#1e40af"))
+    p.rect(MARGIN, y - 3, PAGE_WIDTH - 2 * MARGIN, ROW_HEIGHT, stroke=0, fill=1)
+    p.setFillColor(colors.white)
+    p.setFont("Helvetica-Bold", 6)
+    p.drawString(MARGIN + 2, y, "Worker")
+    x = MARGIN + NAME_WIDTH
+    for day in matrix.days:
+        p.drawCentredString(x + day_width / 2, y, day.strftime("%d"))
+        x += day_width
+    p.drawRightString(PAGE_WIDTH - MARGIN - 2, y, "Total")
+
+    p.setFillColor(colors.black)
+    p.setFont("Courier", 6)
+    return y - ROW_HEIGHT
+
+
+def write_matrix_pdf(matrix, fh, title):
+    p = canvas.Canvas(fh, pagesize=(PAGE_WIDTH, PAGE_HEIGHT), pageCompression=1)
+    p.setTitle(title)
+
+    day_width = (PAGE_WIDTH - 2 * MARGIN - NAME_WIDTH - TOTAL_WIDTH) / max(len(matrix.days), 1)
+
+    page_no = 1
+    y = _pdf_header(p, matrix, title, page_no, day_width)
+
+    for name, cells, total in matrix.rows():
+        if y < MARGIN:
+            p.showPage()
+            page_no += 1
+            y = _pdf_header(p, matrix, title, page_no, day_width)
+
+        p.setFont("Helvetica", 6)
+        p.drawString(MARGIN + 2, y, name[:32])
+        p.setFont("Courier", 6)
+        x = MARGIN + NAME_WIDTH
+        for cell in cells:
+            p.drawCentredString(x + day_width / 2, y, cell)
+            x += day_width
+        p.drawRightString(PAGE_WIDTH - MARGIN - 2, y, str(total))
+        y -= ROW_HEIGHT
+
+    p.showPage()
+    p.save()
+
+
+def matrix_title(filters):
+    return f"Attendance Matrix - {filters['start']} to {filters['end']}"
+
+
+def render_matrix_pdf(matrix, filters):
+    """The matrix as a PDF in a spooled temporary file, rewound."""
+    fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    write_matrix_pdf(matrix, fh, matrix_title(filters))
+    fh.seek(0)
+    return fh
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:22
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0005_slot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
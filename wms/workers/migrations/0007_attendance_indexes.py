@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0006_attendance_date_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='worker',
+            name='email',
+            field=models.EmailField(blank=True, db_index=True, max_length=254, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('present', True)), fields=['date', 'slot'], name='attendance_present_day_idx'),
+        ),
+    ]
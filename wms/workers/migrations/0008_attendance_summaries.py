@@ -0,0 +1,79 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def backfill(apps, schema_editor):
+    Attendance = apps.get_model('workers', 'Attendance')
+    DailySlotSummary = apps.get_model('workers', 'DailySlotSummary')
+    WorkerMonthlySummary = apps.get_model('workers', 'WorkerMonthlySummary')
+
+    present = Count('id', filter=Q(present=True))
+    absent = Count('id', filter=Q(present=False))
+
+    daily = Attendance.objects.values('date', 'slot').annotate(p=present, a=absent).order_by()
+    DailySlotSummary.objects.bulk_create(
+        (
+            DailySlotSummary(date=row['date'], slot=row['slot'], present_count=row['p'], absent_count=row['a'])
+            for row in daily.iterator()
+        ),
+        batch_size=1000,
+    )
+
+    monthly = (
+        Attendance.objects.annotate(month=TruncMonth('date'))
+        .values('worker_id', 'month')
+        .annotate(p=present, a=absent, d=Count('date', filter=Q(present=True), distinct=True))
+        .order_by()
+    )
+    WorkerMonthlySummary.objects.bulk_create(
+        (
+            WorkerMonthlySummary(
+                worker_id=row['worker_id'], month=row['month'],
+                present_count=row['p'], absent_count=row['a'], days_present=row['d'],
+            )
+            for row in monthly.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0007_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySlotSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('slot', models.IntegerField()),
+                ('present_count', models.IntegerField(default=0)),
+                ('absent_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('date', 'slot')},
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkerMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('present_count', models.IntegerField(default=0)),
+                ('absent_count', models.IntegerField(default=0)),
+                ('days_present', models.IntegerField(default=0)),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workers.worker')),
+            ],
+            options={
+                'unique_together': {('worker', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
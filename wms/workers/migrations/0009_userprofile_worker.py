@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_by_email(apps, schema_editor):
+    # Link each profile to the one worker sharing its user's email. Emails
+    # that match several workers are left for an admin to resolve.
+    UserProfile = apps.get_model('workers', 'UserProfile')
+    Worker = apps.get_model('workers', 'Worker')
+
+    linked = set()
+    for profile in UserProfile.objects.select_related('user').filter(worker=None):
+        email = profile.user.email or profile.email
+        if not email:
+            continue
+        matches = list(Worker.objects.filter(email__iexact=email).values_list('id', flat=True)[:2])
+        if len(matches) == 1 and matches[0] not in linked:
+            linked.add(matches[0])
+            profile.worker_id = matches[0]
+            profile.save(update_fields=['worker'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0008_attendance_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='worker',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='workers.worker'),
+        ),
+        migrations.RunPython(link_by_email, migrations.RunPython.noop),
+    ]
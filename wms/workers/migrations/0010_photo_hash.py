@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0009_userprofile_worker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='photo_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='photo_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
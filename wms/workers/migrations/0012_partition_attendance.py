@@ -0,0 +1,145 @@
+from datetime import date
+
+from django.db import migrations
+
+
+TABLE = 'workers_attendance'
+PARTITIONED = f'{TABLE}_partitioned'
+PLAIN = f'{TABLE}_plain'
+SEQUENCE = f'{TABLE}_id_seq'
+
+# Partitions created ahead of the current month.
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _definitions(cursor, table):
+    """
+    Constraints and indexes of ``table`` as (name, kind, definition), so
+    they can be replayed by name on the table that replaces it.
+    """
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')
+        ORDER BY contype DESC, conname
+        """,
+        [table],
+    )
+    constraints = cursor.fetchall()
+
+    cursor.execute(
+        """
+        SELECT c.relname, 'i', pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)
+        ORDER BY c.relname
+        """,
+        [table],
+    )
+    return constraints + cursor.fetchall()
+
+
+def _replay(cursor, definitions, primary_key):
+    for name, kind, definition in definitions:
+        if kind == 'p':
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} PRIMARY KEY ({primary_key})')
+        elif kind == 'i':
+            cursor.execute(definition)
+        else:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+def partition(apps, schema_editor):
+    """
+    Swap workers_attendance for a table partitioned by month on date.
+
+    The rows are copied into one partition per month they cover, plus a
+    few months ahead and a DEFAULT partition for dates outside any of
+    them. Constraints and indexes keep their names; the primary key
+    becomes (id, date) because a partitioned table's unique constraints
+    must include the partition key. Other databases keep the plain table.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        definitions = _definitions(cursor, TABLE)
+
+        cursor.execute(f'SELECT min(date), max(date), max(id) FROM {TABLE}')
+        first, last, max_id = cursor.fetchone()
+
+        today = date.today().replace(day=1)
+        month = min(first.replace(day=1), today) if first else today
+        last = max(last.replace(day=1), _add_months(today, MONTHS_AHEAD)) if last else _add_months(today, MONTHS_AHEAD)
+
+        cursor.execute(f'CREATE TABLE {PARTITIONED} (LIKE {TABLE}) PARTITION BY RANGE (date)')
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {PARTITIONED} DEFAULT')
+        while month <= last:
+            upper = _add_months(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_{month:%Y_%m} PARTITION OF {PARTITIONED} "
+                f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+            )
+            month = upper
+
+        cursor.execute(f'INSERT INTO {PARTITIONED} SELECT * FROM {TABLE}')
+        cursor.execute(f'DROP TABLE {TABLE}')
+        cursor.execute(f'ALTER TABLE {PARTITIONED} RENAME TO {TABLE}')
+
+        # Identity columns on partitioned tables need PostgreSQL 17, so ids
+        # come from a sequence owned by the column instead.
+        cursor.execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        if max_id:
+            cursor.execute('SELECT setval(%s, %s)', [SEQUENCE, max_id])
+
+        _replay(cursor, definitions, 'id, date')
+
+
+def unpartition(apps, schema_editor):
+    """
+    Back to one plain table. Months already detached or archived are not
+    brought back.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass', [TABLE])
+        if cursor.fetchone()[0] != 'p':
+            return
+
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        definitions = _definitions(cursor, TABLE)
+
+        cursor.execute(f'CREATE TABLE {PLAIN} (LIKE {TABLE})')
+        cursor.execute(f'INSERT INTO {PLAIN} SELECT * FROM {TABLE}')
+        cursor.execute(f'DROP TABLE {TABLE}')
+        cursor.execute(f'ALTER TABLE {PLAIN} RENAME TO {TABLE}')
+
+        cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+        )
+
+        _replay(cursor, definitions, 'id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0011_attendance_timestamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
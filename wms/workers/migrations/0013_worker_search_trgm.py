@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+FIELDS = ('name', 'phone', 'email')
+
+
+def create_indexes(apps, schema_editor):
+    """
+    Trigram GIN indexes on name, phone and email for workers.search.
+    Other databases, and servers without the pg_trgm extension, search an
+    in-process n-gram index instead.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # One index per column: the planner costs a multicolumn GIN index
+    # above a sequential scan and ignores it. On UPPER() because that is
+    # how Django spells icontains; trigram matching ignores case anyway.
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS worker_{field}_trgm_idx ON workers_worker '
+            f'USING gin (UPPER({field}) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS worker_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0012_partition_attendance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,41 @@
+from datetime import datetime, time
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def backfill_created_at(apps, schema_editor):
+    """
+    Existing workers get the day of their first attendance mark, so
+    rosters of past days still include them. Workers without any marks
+    keep the migration time.
+    """
+    Attendance = apps.get_model("workers", "Attendance")
+    Worker = apps.get_model("workers", "Worker")
+
+    workers = []
+    first_marks = Attendance.objects.values("worker_id").annotate(first=Min("date")).order_by()
+    for row in first_marks.iterator():
+        joined = timezone.make_aware(datetime.combine(row["first"], time.min))
+        workers.append(Worker(pk=row["worker_id"], created_at=joined))
+
+    Worker.objects.bulk_update(workers, ["created_at"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0015_loginfailure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+    ]
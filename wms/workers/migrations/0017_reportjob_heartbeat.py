@@ -0,0 +1,47 @@
+# Generated by Django 5.2.11 on 2026-10-18 08:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def prepare_active_jobs(apps, schema_editor):
+    """
+    Running jobs get their start time as first heartbeat, and duplicate
+    queued jobs are failed so the constraint can be added; the oldest
+    of each set is kept.
+    """
+    ReportJob = apps.get_model("workers", "ReportJob")
+
+    active = ReportJob.objects.filter(status__in=("pending", "running"))
+    active.filter(status="running").update(heartbeat_at=F("started_at"))
+
+    seen = set()
+    duplicates = []
+    for job_id, key in active.order_by("created_at", "id").values_list("id", "params_hash"):
+        if key in seen:
+            duplicates.append(job_id)
+        seen.add(key)
+
+    ReportJob.objects.filter(pk__in=duplicates).update(status="failed", error="Duplicate of an earlier job.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0016_worker_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(prepare_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('pending', 'running'))), fields=('params_hash',), name='reportjob_active_uniq'),
+        ),
+    ]
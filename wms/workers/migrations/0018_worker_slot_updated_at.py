@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0017_reportjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,16 +1,60 @@
+from datetime import date
+
+from django.core.files.storage import default_storage
 from django.db import models
 
-class Worker(models.Model):
+
+def processed_photo_name(digest, suffix=".jpg"):
+    """Where workers.images stores a photo (and its variants) by content hash."""
+    return f"photos/{digest[:2]}/{digest}{suffix}"
+
+
+class ProcessedPhoto:
+    """
+    Thumbnail URLs for models with ``photo`` and ``photo_hash`` fields.
+
+    Until the background pipeline has handled an upload the original is
+    served, so templates can always use these.
+    """
+
+    @property
+    def photo_processed(self):
+        return bool(self.photo_hash) and self.photo.name == processed_photo_name(self.photo_hash)
+
+    @property
+    def photo_thumbnail_url(self):
+        if not self.photo:
+            return None
+        if self.photo_processed:
+            return default_storage.url(processed_photo_name(self.photo_hash, "_thumb.jpg"))
+        return self.photo.url
+
+    @property
+    def photo_webp_url(self):
+        if self.photo and self.photo_processed:
+            return default_storage.url(processed_photo_name(self.photo_hash, "_thumb.webp"))
+        return None
+
+
+class Worker(ProcessedPhoto, models.Model):
     name = models.CharField(max_length=100)
     dob = models.DateField()
     phone = models.CharField(max_length=15)
-    email = models.EmailField(blank=True, null=True)
+    email = models.EmailField(blank=True, null=True, db_index=True)
     photo = models.ImageField(upload_to="worker_photos/", blank=True, null=True)
+    photo_hash = models.CharField(max_length=64, blank=True, default="")
+    # When the worker joined the roster; days before it don't count them
+    # as absent (presence-only rosters). Backfilled by migration 0016.
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Names are printed in reports: a rename must change their data version.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
 
+# On PostgreSQL this table is partitioned by month of date (migration 0012,
+# workers.partitions), so its primary key is (id, date) in the database.
 class Attendance(models.Model):
     SLOT_CHOICES = (
         (1, "Slot 1 (9-10)"),
@@ -19,20 +63,36 @@ class Attendance(models.Model):
     )
 
     worker = models.ForeignKey(Worker, on_delete=models.CASCADE)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=date.today)
     slot = models.IntegerField(choices=SLOT_CHOICES)
     present = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("worker", "date", "slot")  # no duplicate
+        indexes = [
+            # display / download_attendance: present rows of a day (or range) per slot.
+            # user_dashboard's (worker, -date) history is already served by a
+            # backward scan of the unique (worker, date, slot) index.
+            models.Index(
+                fields=["date", "slot"],
+                condition=models.Q(present=True),
+                name="attendance_present_day_idx",
+            ),
+            # Change feed: rows modified after a (updated_at, id) watermark.
+            models.Index(fields=["updated_at", "id"], name="attendance_updated_idx"),
+        ]
 from django.contrib.auth.models import User
 
-class UserProfile(models.Model):
+class UserProfile(ProcessedPhoto, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    worker = models.OneToOneField(Worker, on_delete=models.SET_NULL, blank=True, null=True)
     mobile = models.CharField(max_length=15)
     dob = models.DateField()
     email = models.EmailField(blank=True, null=True)
     photo = models.ImageField(upload_to="profile_photos/", blank=True, null=True)
+    photo_hash = models.CharField(max_length=64, blank=True, default="")
 
     def __str__(self):
         return self.user.username
@@ -41,6 +101,101 @@ class Slot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} ({self.start_time} - {self.end_time})"
+
+
+class DailySlotSummary(models.Model):
+    date = models.DateField()
+    slot = models.IntegerField()
+    present_count = models.IntegerField(default=0)
+    absent_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("date", "slot")
+
+    def __str__(self):
+        return f"{self.date} slot {self.slot}: {self.present_count} present"
+
+
+class WorkerMonthlySummary(models.Model):
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE)
+    month = models.DateField()  # first day of the month
+    present_count = models.IntegerField(default=0)  # present slot marks
+    absent_count = models.IntegerField(default=0)
+    days_present = models.IntegerField(default=0)  # days with at least one present slot
+
+    class Meta:
+        unique_together = ("worker", "month")
+
+    def __str__(self):
+        return f"{self.worker} {self.month:%Y-%m}: {self.days_present} days"
+
+
+def report_upload_to(instance, filename):
+    return f"reports/{instance.params_hash[:16]}/{filename}"
+
+
+class ReportJob(models.Model):
+    """An attendance export rendered by `manage.py run_report_worker`."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    # Filters plus the state of the data they cover (workers.reports);
+    # identical requests over unchanged data share one job and one file.
+    params_hash = models.CharField(max_length=64, db_index=True)
+    params = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    file = models.FileField(upload_to=report_upload_to, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Refreshed by run_report_worker while the job runs.
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # run_report_worker: oldest pending job first.
+            models.Index(fields=["status", "created_at"], name="reportjob_queue_idx"),
+        ]
+        constraints = [
+            # At most one queued or running job per request (enqueue_report).
+            models.UniqueConstraint(
+                fields=["params_hash"],
+                condition=models.Q(status__in=("pending", "running")),
+                name="reportjob_active_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Report {self.pk} ({self.status})"
+
+
+class LoginFailure(models.Model):
+    """
+    One failed login, recorded under both its (username, client address)
+    key and its client address key (workers.auth). Kept in the database
+    so every process counts the same attempts.
+    """
+
+    key = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["key", "created_at"], name="loginfailure_key_idx"),
+        ]
@@ -0,0 +1,103 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def parse_cursor(value):
+    """Return a positive integer cursor from a query param, or None."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def parse_limit(value, default=PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    limit = parse_cursor(value) or default
+    return min(limit, maximum)
+
+
+def encode_cursor(pk):
+    """Opaque cursor for API clients; they pass it back verbatim."""
+    if pk is None:
+        return None
+    return urlsafe_b64encode(str(pk).encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        raw = urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    cursor = parse_cursor(raw)
+    if cursor is None:
+        raise ValueError("Invalid cursor")
+    return cursor
+
+
+def search_workers(queryset, q):
+    """Server-side roster search by name, phone or email."""
+    q = (q or "").strip()
+    if not q:
+        return queryset
+    return queryset.filter(Q(name__icontains=q) | Q(phone__contains=q) | Q(email__icontains=q))
+
+
+class KeysetPage:
+    """
+    One window of a queryset ordered by primary key.
+
+    Pages are addressed by the id of the last row seen (``after``) or
+    the first row of the following page (``before``), so the database
+    seeks straight to the window through the pk index instead of
+    counting and skipping OFFSET rows.
+    """
+
+    def __init__(self, object_list, has_next, has_prev):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_prev = has_prev
+
+    @property
+    def next_after(self):
+        if self.has_next and self.object_list:
+            return _pk(self.object_list[-1])
+        return None
+
+    @property
+    def prev_before(self):
+        if self.has_prev and self.object_list:
+            return _pk(self.object_list[0])
+        return None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _pk(obj):
+    return obj["id"] if isinstance(obj, dict) else obj.pk
+
+
+def keyset_page(queryset, after=None, before=None, limit=PAGE_SIZE):
+    if before is not None:
+        rows = list(queryset.filter(pk__lt=before).order_by("-pk")[:limit + 1])
+        has_prev = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_prev=has_prev)
+
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+
+    rows = list(queryset.order_by("pk")[:limit + 1])
+    has_next = len(rows) > limit
+    return KeysetPage(rows[:limit], has_next=has_next, has_prev=after is not None)
@@ -0,0 +1,394 @@
+import csv
+import gzip
+import io
+import re
+import tempfile
+from datetime import date
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import InvalidStorageError, storages
+from django.db import connections, transaction
+
+from .cache import archives
+from .exports import SPOOL_SIZE
+from .models import Attendance
+from .summaries import month_start, next_month, summaries_handled
+
+
+# On PostgreSQL, migration 0012 turns the attendance table into one
+# partition per month of ``date`` plus a DEFAULT partition for dates no
+# monthly partition covers. Queries filtered on date only scan the
+# partitions of their range, and vacuum and index maintenance work one
+# month at a time. Closed months are detached into plain tables, or,
+# with a durable ATTENDANCE_ARCHIVE_STORAGE, archived to gzipped CSV
+# there and dropped once the file reads back complete.
+#
+# Other databases keep one plain table; archiving there moves a month's
+# rows to the same CSV files.
+
+PARENT = Attendance._meta.db_table
+DEFAULT_PARTITION = f"{PARENT}_default"
+
+# Monthly partitions kept ready ahead of the current month.
+MONTHS_AHEAD = 3
+
+ARCHIVE_DIR = "attendance_archive"
+ARCHIVE_FIELDS = ("id", "worker_id", "date", "slot", "present", "created_at", "updated_at")
+
+_MONTH_SUFFIX = re.compile(r"_(\d{4})_(\d{2})$")
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def archive_name(month):
+    return f"{ARCHIVE_DIR}/{month:%Y-%m}.csv.gz"
+
+
+def archive_storage():
+    """
+    The storage named by ATTENDANCE_ARCHIVE_STORAGE (a STORAGES alias).
+    Archiving deletes the live rows, so there is no fallback: MEDIA_ROOT
+    on an app instance is often wiped on the next deploy.
+    """
+    alias = getattr(settings, "ATTENDANCE_ARCHIVE_STORAGE", "")
+    if not alias:
+        raise ValueError("ATTENDANCE_ARCHIVE_STORAGE is not set; closed months can only be detached")
+    try:
+        return storages[alias]
+    except InvalidStorageError:
+        raise ValueError(f"ATTENDANCE_ARCHIVE_STORAGE names an unknown storage: {alias}")
+
+
+def archiving_enabled():
+    return bool(getattr(settings, "ATTENDANCE_ARCHIVE_STORAGE", ""))
+
+
+def retain_months():
+    """Months kept live (the current one included) before archiving."""
+    return getattr(settings, "ATTENDANCE_RETAIN_MONTHS", 12)
+
+
+# ================= INSPECTION =================
+def is_partitioned(using="default"):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [PARENT])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _month_of(name):
+    match = _MONTH_SUFFIX.search(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def partitions(using="default"):
+    """
+    {month: attached} for every monthly partition table, attached or
+    detached. Detached months are plain tables named like partitions.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, i.inhparent IS NOT NULL
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            WHERE c.relkind = 'r' AND c.relname LIKE %s
+              AND c.relnamespace = to_regnamespace(current_schema())
+            """,
+            [f"{PARENT}\\_____\\___"],
+        )
+        rows = cursor.fetchall()
+
+    found = {}
+    for name, attached in rows:
+        month = _month_of(name)
+        if month is not None:
+            found[month] = attached
+    return dict(sorted(found.items()))
+
+
+def archived_months():
+    if not archiving_enabled():
+        return []
+    try:
+        _, files = archive_storage().listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    months = []
+    for name in files:
+        try:
+            months.append(date.fromisoformat(name.removesuffix(".csv.gz") + "-01"))
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def closed_months(retain=None, today=None, detached=False, using="default"):
+    """
+    Live months older than the retention window, oldest first; with
+    ``detached``, also months detached but not yet archived.
+    """
+    retain = retain_months() if retain is None else retain
+    cutoff = add_months(month_start(today or date.today()), 1 - retain)
+
+    if is_partitioned(using):
+        months = {
+            month for month, attached in partitions(using).items()
+            if month < cutoff and (attached or detached)
+        }
+        # Backfilled marks older than any partition sit in DEFAULT.
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', date)::date FROM {DEFAULT_PARTITION} WHERE date < %s",
+                [cutoff],
+            )
+            months.update(month for month, in cursor.fetchall())
+        return sorted(months)
+
+    live = Attendance.objects.using(using).filter(date__lt=cutoff).dates("date", "month")
+    return list(live)
+
+
+def offline_months(start, end, using="default"):
+    """
+    Months from start to end (either may be None for an open range)
+    whose marks are no longer in the attendance table: detached, or
+    archived and deleted. Queries over them would silently miss marks.
+    """
+    first = month_start(start) if start else None
+    # Nothing is taken offline before its month is over.
+    if first is not None and first >= month_start(date.today()):
+        return []
+
+    months = archives.get_or_set("months", lambda: _offline_months(using))
+    return [month for month in months if (first is None or month >= first) and (end is None or month <= end)]
+
+
+def _offline_months(using):
+    months = set(archived_months())
+    if is_partitioned(using):
+        months.update(month for month, attached in partitions(using).items() if not attached)
+    return sorted(months)
+
+
+def require_live(start, end, using="default"):
+    """Raise ValueError, with a message fit for the user, if a range reaches offline months."""
+    months = offline_months(start, end, using)
+    if months:
+        raise ValueError(
+            f"Attendance for {', '.join(f'{month:%Y-%m}' for month in months)} has been archived "
+            f"and is not in reports. Choose a later start date."
+        )
+
+
+# ================= PARTITIONS =================
+def ensure_partitions(months_ahead=MONTHS_AHEAD, today=None, using="default"):
+    """
+    Create the monthly partitions from the current month to
+    ``months_ahead`` months later. Rows that landed in the DEFAULT
+    partition for a new month are moved into it. Returns the new tables.
+    """
+    if not is_partitioned(using):
+        return []
+
+    existing = partitions(using)
+    month = month_start(today or date.today())
+    created = []
+
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            _create_partition(month, using)
+            created.append(partition_name(month))
+        month = next_month(month)
+
+    return created
+
+
+def _create_partition(month, using):
+    name, upper = partition_name(month), next_month(month)
+
+    # Built detached and then attached, because PostgreSQL refuses a new
+    # partition while the DEFAULT partition holds rows in its range.
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [month, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [month, upper],
+        )
+
+
+def detach_partition(month, using="default"):
+    """
+    Take a month out of the attendance table. It stays in the database
+    as a plain table, queryable by name but no longer scanned or
+    maintained with the live months.
+    """
+    name = partition_name(month)
+    existing = partitions(using)
+    if month not in existing:
+        # Only in DEFAULT so far: give the month its own table first.
+        _create_partition(month, using)
+    if existing.get(month, True):
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+            # A detached month is a snapshot; its foreign keys would only
+            # block deleting workers that appear in it.
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [name],
+            )
+            for constraint, in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
+        archives.invalidate()
+    return name
+
+
+# ================= ARCHIVES =================
+def archive_month(month, using="default"):
+    """
+    Write a month of attendance to a gzipped CSV in the archive storage
+    and remove it from the database. The rows are only removed once the
+    saved file reads back with all of them. Daily and monthly summaries
+    are kept. Returns (storage name, rows written).
+    """
+    storage = archive_storage()
+    name = archive_name(month)
+
+    partitioned = is_partitioned(using)
+    if storage.exists(name) and not _holds_month(month, partitioned, using):
+        raise ValueError(f"{name} already exists and the month is no longer in the database")
+    if partitioned:
+        # Detached first, so nothing is written to the month while it is
+        # copied. If saving or checking the file fails, the month is left
+        # detached.
+        table = detach_partition(month, using)
+
+    fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    with gzip.GzipFile(fileobj=fh, mode="wb") as gz:
+        if partitioned:
+            count = _copy_table(table, gz, using)
+        else:
+            count = _copy_rows(month, gz, using)
+
+    # Left by a run that failed before the rows were removed, so the
+    # rows still here are the complete copy.
+    if storage.exists(name):
+        storage.delete(name)
+
+    fh.seek(0)
+    name = storage.save(name, File(fh))
+    fh.close()
+
+    stored = _count_archived(storage, name)
+    if stored != count:
+        raise ValueError(f"{name} holds {stored} of {count} rows; the month was not removed")
+
+    if partitioned:
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DROP TABLE {table}")
+    else:
+        with transaction.atomic(using=using), summaries_handled():
+            _month_rows(month, using).delete()
+    archives.invalidate()
+
+    return name, count
+
+
+def _holds_month(month, partitioned, using):
+    if not partitioned:
+        return _month_rows(month, using).exists()
+    if month in partitions(using):
+        return True
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s)",
+            [month, next_month(month)],
+        )
+        return cursor.fetchone()[0]
+
+
+def _copy_table(table, gz, using):
+    columns = ", ".join(ARCHIVE_FIELDS)
+    with connections[using].cursor() as cursor:
+        with cursor.copy(
+            f"COPY (SELECT {columns} FROM {table} ORDER BY date, slot, worker_id) "
+            f"TO STDOUT WITH (FORMAT csv, HEADER)"
+        ) as copy:
+            for chunk in copy:
+                gz.write(chunk)
+        cursor.execute(f"SELECT count(*) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def _count_archived(storage, name):
+    with storage.open(name, "rb") as fh, gzip.open(fh, "rt", encoding="utf-8", newline="") as text:
+        return sum(1 for _ in csv.DictReader(text))
+
+
+def _month_rows(month, using):
+    return Attendance.objects.using(using).filter(date__gte=month, date__lt=next_month(month))
+
+
+def _copy_rows(month, gz, using):
+    out = io.TextIOWrapper(gz, encoding="utf-8", newline="")
+    writer = csv.writer(out)
+    writer.writerow(ARCHIVE_FIELDS)
+
+    count = 0
+    rows = _month_rows(month, using).order_by("date", "slot", "worker_id").values_list(*ARCHIVE_FIELDS)
+    for row in rows.iterator(chunk_size=2000):
+        # Same spelling as PostgreSQL's COPY, so every archive reads alike.
+        writer.writerow(["t" if v is True else "f" if v is False else v for v in row])
+        count += 1
+
+    out.flush()
+    out.detach()
+    return count
+
+
+def iter_archived(start, end, worker=None, slot=None):
+    """
+    Yield archived marks between start and end (inclusive) as dicts with
+    ARCHIVE_FIELDS keys, oldest first. Months without an archive are
+    skipped.
+    """
+    if not archiving_enabled():
+        return
+    storage = archive_storage()
+    month = month_start(start)
+    while month <= end:
+        name = archive_name(month)
+        if storage.exists(name):
+            yield from _read_archive(storage, name, start, end, worker, slot)
+        month = next_month(month)
+
+
+def _read_archive(storage, name, start, end, worker, slot):
+    with storage.open(name, "rb") as fh, gzip.open(fh, "rt", encoding="utf-8", newline="") as text:
+        for row in csv.DictReader(text):
+            day = date.fromisoformat(row["date"])
+            if not start <= day <= end:
+                continue
+            if worker is not None and int(row["worker_id"]) != worker:
+                continue
+            if slot is not None and int(row["slot"]) != slot:
+                continue
+            row["date"] = day
+            row["present"] = row["present"] == "t"
+            yield row
@@ -0,0 +1,188 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+# Samples kept per URL name for the percentile report.
+WINDOW = getattr(settings, "PERF_WINDOW", 1000)
+
+# The same SQL run this many times in one request is reported as a
+# likely N+1 (a query inside a loop that should be a JOIN or __in).
+REPEAT_THRESHOLD = getattr(settings, "PERF_REPEAT_THRESHOLD", 5)
+
+PERCENTILES = (50, 95, 99)
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` hook counting queries and their time.
+
+    SQL is counted as sent to the driver, with placeholders rather than
+    values, so a loop running one query per row shows up as a single
+    statement repeated many times.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        # Only reads: a batched bulk_create repeats its INSERT on purpose.
+        return [
+            (sql, n) for sql, n in self.statements.most_common()
+            if n >= threshold and sql.lstrip().upper().startswith("SELECT")
+        ]
+
+
+# ================= HISTOGRAM =================
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+
+
+def record(name, wall, queries, db, size):
+    with _lock:
+        _samples[name].append((wall, queries, db, size))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = round(pct / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def _summary(values):
+    values = sorted(values)
+    return {f"p{pct}": _percentile(values, pct) for pct in PERCENTILES}
+
+
+def stats():
+    """Percentiles over the last WINDOW requests of every URL name."""
+    with _lock:
+        snapshot = {name: list(samples) for name, samples in _samples.items()}
+
+    report = {}
+    for name, samples in sorted(snapshot.items()):
+        walls, queries, dbs, sizes = zip(*samples)
+        report[name] = {
+            "requests": len(samples),
+            "wall_ms": _summary(walls),
+            "queries": _summary(queries),
+            "db_ms": _summary(dbs),
+            "bytes": _summary([s for s in sizes if s is not None]),
+        }
+    return report
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+# ================= MIDDLEWARE =================
+def _url_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+class PerformanceMiddleware:
+    """
+    Time every request and the queries it runs on each database.
+
+    Adds a ``Server-Timing`` header (visible in the browser's network
+    tab), logs one JSON line per request on ``workers.perf``, feeds the
+    rolling histogram behind the perf-stats page and warns about SQL
+    repeated within a single request.
+
+    Streaming responses are timed up to the first byte; queries run
+    while the body is generated afterwards, or on the report thread
+    pool, are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorders, stack, start = self._start()
+        with stack:
+            response = self.get_response(request)
+        return self._finish(request, response, recorders, start)
+
+    async def __acall__(self, request):
+        # Database connections belong to the thread that sync_to_async
+        # runs this request's ORM calls on, so hook them from there.
+        recorders, stack, start = await sync_to_async(self._start)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, recorders, start)
+
+    def _start(self):
+        recorders = {alias: QueryRecorder() for alias in connections}
+        stack = ExitStack()
+        for alias, recorder in recorders.items():
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return recorders, stack, time.perf_counter()
+
+    def _finish(self, request, response, recorders, start):
+        wall = (time.perf_counter() - start) * 1000
+        queries = sum(r.count for r in recorders.values())
+        db = sum(r.duration for r in recorders.values()) * 1000
+        size = None if response.streaming else len(response.content)
+        name = _url_name(request)
+
+        response["Server-Timing"] = ", ".join((
+            f'db;dur={db:.1f};desc="{queries} queries"',
+            f"app;dur={wall - db:.1f}",
+            f"total;dur={wall:.1f}",
+        ))
+
+        record(name, wall, queries, db, size)
+
+        repeated = [(sql, n) for r in recorders.values() for sql, n in r.repeated()]
+        for sql, n in repeated:
+            logger.warning("Possible N+1 in %s: query ran %d times: %s", name, n, sql)
+
+        logger.info(json.dumps({
+            "view": name,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "wall_ms": round(wall, 1),
+            "queries": queries,
+            "db_ms": round(db, 1),
+            "bytes": size,
+            "repeated_queries": len(repeated),
+        }))
+
+        return response
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+from datetime import date, timedelta
+
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .exports import render_report_file, report_filename, report_records
+from .matrix import build_matrix, matrix_filename, render_matrix_pdf
+from .models import ReportJob, Slot, Worker
+from .routers import primary
+from .summaries import presence_only
+
+logger = logging.getLogger(__name__)
+
+
+# run_report_worker refreshes the heartbeat of its running jobs this
+# often; a job whose heartbeat is older than STALE_AFTER is assumed lost
+# with its worker, however long it has been running.
+HEARTBEAT_EVERY = timedelta(minutes=1)
+STALE_AFTER = timedelta(minutes=5)
+
+# Runs per job before it is left failed.
+MAX_ATTEMPTS = 3
+
+# Finished jobs and their files are deleted after this long.
+KEEP_FOR = timedelta(days=7)
+
+
+# ================= REQUESTS =================
+def job_params(filters):
+    return {
+        # "report" (exports.parse_report_filters) or "matrix" (matrix.parse_matrix_filters).
+        "kind": filters.get("kind", "report"),
+        "start": filters["start"].isoformat(),
+        "end": filters["end"].isoformat(),
+        "slot": filters["slot"],
+        "worker": filters["worker"],
+        "format": filters["format"],
+    }
+
+
+def job_filters(params):
+    return dict(params, start=date.fromisoformat(params["start"]), end=date.fromisoformat(params["end"]))
+
+
+def data_version(filters):
+    """
+    Latest change and present count of the rows a report covers, plus
+    the same for the workers and slots whose names it prints. Any write
+    moves one or the other: an insert or update moves the timestamp,
+    deleting a row lowers the count.
+    """
+    state = report_records(filters).aggregate(
+        changed=Max("updated_at"),
+        present=Count("id", filter=Q(present=True)),
+    )
+    version = [_isoformat(state["changed"]), state["present"]]
+    for model in (Worker, Slot):
+        state = model.objects.aggregate(changed=Max("updated_at"), count=Count("id"))
+        version += [_isoformat(state["changed"]), state["count"]]
+    if filters.get("kind") == "matrix" and presence_only():
+        # Unmarked days turn into absences as they pass.
+        version.append(min(date.today(), filters["end"]).isoformat())
+    return version
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def params_hash(params, version):
+    return hashlib.sha256(json.dumps([params, version], sort_keys=True).encode()).hexdigest()
+
+
+def _existing_job(key):
+    job = (
+        ReportJob.objects.filter(params_hash=key)
+        .exclude(status=ReportJob.FAILED)
+        .order_by("-created_at")
+        .first()
+    )
+    if job is not None and (job.status != ReportJob.DONE or job.file.storage.exists(job.file.name)):
+        return job
+    return None
+
+
+# The version must match the data run_job renders, and a job just queued
+# by another request must be found.
+@primary
+def enqueue_report(filters, user=None):
+    """
+    Return (job, created). A request matching a pending, running or
+    finished job over the same, unchanged data gets that job back.
+    """
+    params = job_params(filters)
+    key = params_hash(params, data_version(filters))
+
+    job = _existing_job(key)
+    if job is not None:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            return ReportJob.objects.create(params_hash=key, params=params, requested_by=user), True
+    except IntegrityError:
+        # An identical request queued it first (reportjob_active_uniq).
+        return _existing_job(key), False
+
+
+# ================= WORKER =================
+def render_job(filters):
+    """The report a job's filters describe, in a rewound file."""
+    if filters.get("kind") == "matrix":
+        return render_matrix_pdf(build_matrix(filters), filters)
+    return render_report_file(filters)
+
+
+def job_filename(filters):
+    if filters.get("kind") == "matrix":
+        return matrix_filename(filters)
+    return report_filename(filters)
+
+
+def claim_job():
+    """
+    Mark the oldest pending job running and return its id, or None. The
+    conditional UPDATE makes a job go to exactly one of several workers
+    on any database, without row locks.
+    """
+    pending = ReportJob.objects.filter(status=ReportJob.PENDING).order_by("created_at")
+    for job_id in pending.values_list("id", flat=True)[:10]:
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def heartbeat(job_ids):
+    """Record that the worker running these jobs is still alive."""
+    ReportJob.objects.filter(pk__in=list(job_ids), status=ReportJob.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def run_job(job_id):
+    """
+    Render one claimed job into MEDIA_ROOT. The result is only recorded
+    while this run still holds the job: one that outlived STALE_AFTER
+    may have been requeued and claimed again, and the newer run owns it.
+    """
+    job = ReportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return
+    # attempts is bumped by every claim, so it names this run.
+    lease = ReportJob.objects.filter(pk=job_id, status=ReportJob.RUNNING, attempts=job.attempts)
+
+    try:
+        filters = job_filters(job.params)
+        fh = render_job(filters)
+        try:
+            job.file.save(job_filename(filters), File(fh), save=False)
+        finally:
+            fh.close()
+
+        finished = lease.update(
+            file=job.file.name,
+            status=ReportJob.DONE,
+            error="",
+            finished_at=timezone.now(),
+        )
+        if not finished:
+            logger.warning("Report job %s was taken over before it finished; dropping its file", job_id)
+            job.file.delete(save=False)
+    except Exception as e:
+        logger.exception("Report job %s failed", job_id)
+        lease.update(
+            status=ReportJob.FAILED,
+            error=str(e) or e.__class__.__name__,
+            finished_at=timezone.now(),
+        )
+
+
+def release_job(job_id, error):
+    """A job whose process died: back to the queue, or failed once out of attempts."""
+    running = ReportJob.objects.filter(pk=job_id, status=ReportJob.RUNNING)
+    if not running.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJob.FAILED, error=error, finished_at=timezone.now()
+    ):
+        running.update(status=ReportJob.PENDING)
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """
+    Put jobs whose worker died (no heartbeat for ``stale_after``) back in
+    the queue, or fail them once they have used up their attempts.
+    Returns (requeued, failed).
+    """
+    stale = ReportJob.objects.filter(
+        status=ReportJob.RUNNING,
+        heartbeat_at__lt=timezone.now() - stale_after,
+    )
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJob.FAILED,
+        error="Worker stopped before finishing.",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=ReportJob.PENDING)
+    return requeued, failed
+
+
+def purge_jobs(keep_for=KEEP_FOR):
+    """Delete finished and failed jobs older than ``keep_for``, files included."""
+    old = ReportJob.objects.filter(
+        status__in=(ReportJob.DONE, ReportJob.FAILED),
+        finished_at__lt=timezone.now() - keep_for,
+    )
+    count = 0
+    for job in old.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
@@ -0,0 +1,83 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+
+REPLICA = "replica"
+
+_reporting = ContextVar("reporting", default=False)
+
+
+class ReplicaRouter:
+    """
+    Send reads made inside a ``@reporting`` view to the read replica,
+    when one is configured. Everything else, and every write, stays on
+    the primary.
+
+    The flag is a context variable, so it follows the request into
+    sync_to_async threads but never leaks into other requests.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _reporting.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica follows the primary; it is never migrated directly.
+        return False if db == REPLICA else None
+
+
+def _routed(view, flag):
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            token = _reporting.set(flag)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _reporting.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = _reporting.set(flag)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                _reporting.reset(token)
+
+    return wrapper
+
+
+def reporting(view):
+    """
+    Mark a read-only reporting view. Its reads may lag the primary by
+    the replica's replication delay.
+    """
+    return _routed(view, True)
+
+
+def primary(func):
+    """
+    Read from the primary even inside a ``@reporting`` view. For values
+    stored in an invalidation-driven cache: a lagging replica would put
+    data from before the invalidating write back into it.
+    """
+    return _routed(func, False)
+
+
+def pin(queryset):
+    """
+    Fix the database of a queryset that will only be read after the view
+    returns (streamed response bodies), while the routing flag is still set.
+    """
+    return queryset.using(queryset.db)
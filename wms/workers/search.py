@@ -0,0 +1,203 @@
+import heapq
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from .cache import changes, shared
+from .models import Worker
+
+
+# Typeahead results per request.
+TOP_K = 10
+MAX_TOP_K = 50
+
+# Shorter queries match too much to be worth ranking.
+MIN_QUERY_LENGTH = 2
+
+# Fraction of the query's trigrams a field must share to be a match.
+MIN_SIMILARITY = 0.3
+
+# Without a shared cache, roster writes made by other processes don't
+# reach this one's changes clock, so the index is also rebuilt at least
+# this often (in seconds).
+INDEX_TTL = 60
+
+FIELDS = ("name", "phone", "email")
+
+
+def normalize(value):
+    return " ".join((value or "").lower().split())
+
+
+def trigrams(value):
+    """
+    Trigrams of each word, padded like pg_trgm ("ann" -> "  a", " an",
+    "ann", "nn "), so both backends rank the same way.
+    """
+    grams = set()
+    for word in normalize(value).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def search(q, limit=TOP_K, using="default"):
+    """
+    Workers whose name, phone or email look like ``q``, best first, as
+    dicts with id, name, phone, email and a 0..1 score.
+
+    PostgreSQL answers from the pg_trgm GIN indexes of migration 0013.
+    Other databases (or PostgreSQL without pg_trgm) use an n-gram index
+    held in process memory.
+    """
+    q = normalize(q)
+    if len(q) < MIN_QUERY_LENGTH:
+        return []
+    limit = max(1, min(limit, MAX_TOP_K))
+
+    if trigram_enabled(using):
+        return _search_trigram(q, limit, using)
+    return worker_index().search(q, limit)
+
+
+# ================= POSTGRESQL =================
+_trigram = {}
+
+
+def trigram_enabled(using="default"):
+    """Whether ``using`` is PostgreSQL with pg_trgm installed (checked once)."""
+    if using not in _trigram:
+        connection = connections[using]
+        enabled = False
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                enabled = cursor.fetchone() is not None
+        _trigram[using] = enabled
+    return _trigram[using]
+
+
+def _search_trigram(q, limit, using):
+    # Both conditions compare UPPER(field), which is what the indexes cover.
+    upper = {f"{field}_upper": Upper(field) for field in FIELDS}
+    matches = Q()
+    contains = Q()
+    for field in FIELDS:
+        matches |= Q(**{f"{field}_upper__trigram_word_similar": q})
+        contains |= Q(**{f"{field}__icontains": q})
+
+    # Scored like NgramIndex: a field containing the whole query scores 1.
+    similarity = Greatest(
+        *(TrigramWordSimilarity(q, field) for field in FIELDS),
+        Case(When(contains, then=Value(1.0)), default=Value(0.0), output_field=FloatField()),
+    )
+
+    rows = (
+        Worker.objects.using(using)
+        .alias(**upper)
+        .filter(matches | contains)
+        .annotate(score=similarity)
+        .filter(score__gte=MIN_SIMILARITY)
+        .order_by("-score", "name", "id")
+        .values("id", "name", "phone", "email", "score")[:limit]
+    )
+
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            # The index operator's own cut-off (0.6 by default) would drop
+            # matches that MIN_SIMILARITY accepts.
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(MIN_SIMILARITY)]
+            )
+        return [dict(row, score=round(row["score"] or 0, 3)) for row in rows]
+
+
+# ================= IN-PROCESS N-GRAM INDEX =================
+class NgramIndex:
+    """
+    Trigram postings over every worker's name, phone and email.
+
+    A worker scores the share of the query's trigrams found in its best
+    field (pg_trgm's word similarity, roughly); a field containing the
+    whole query scores 1. Postings are arrays of worker positions, so
+    10,000 workers index in a few MB and a lookup touches only the
+    workers sharing a trigram with the query.
+    """
+
+    def __init__(self, rows):
+        self.rows = []
+        self.fields = []
+        self.postings = defaultdict(lambda: array("I"))
+
+        for position, (worker_id, name, phone, email) in enumerate(rows):
+            self.rows.append({"id": worker_id, "name": name, "phone": phone, "email": email})
+            fields = [(text, frozenset(trigrams(text))) for text in map(normalize, (name, phone, email))]
+            self.fields.append(fields)
+            for gram in frozenset().union(*(grams for _, grams in fields)):
+                self.postings[gram].append(position)
+
+    @classmethod
+    def build(cls, using="default"):
+        return cls(Worker.objects.using(using).order_by("id").values_list("id", *FIELDS).iterator())
+
+    def score(self, q, grams, position):
+        return max(
+            1.0 if q in text else len(grams & field_grams) / len(grams)
+            for text, field_grams in self.fields[position]
+        )
+
+    def search(self, q, limit=TOP_K):
+        grams = trigrams(q)
+
+        candidates = set()
+        for gram in grams:
+            candidates.update(self.postings.get(gram, ()))
+        if len(q) < 3:
+            # Two letters inside a word share no padded trigram with it.
+            candidates.update(
+                position for position, fields in enumerate(self.fields)
+                if any(q in text for text, _ in fields)
+            )
+
+        scored = []
+        for position in candidates:
+            score = self.score(q, grams, position)
+            if score >= MIN_SIMILARITY:
+                scored.append((score, position))
+
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], self.rows[item[1]]["name"]))
+        return [dict(self.rows[position], score=round(score, 3)) for score, position in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def roster_version():
+    """
+    What the index was built from: when the rosters region was last
+    invalidated, which every worker write does. A cache read, so typing
+    costs no query; a flushed cache reads as a new time, never as an
+    old version.
+    """
+    return changes.read("rosters")[0]
+
+
+def worker_index():
+    """The process's n-gram index, rebuilt once the roster has changed."""
+    global _index
+    version = roster_version()
+    with _index_lock:
+        if (
+            _index is None
+            or _index[0] != version
+            or (not shared() and time.monotonic() - _index[1] >= INDEX_TTL)
+        ):
+            _index = (version, time.monotonic(), NgramIndex.build())
+        return _index[2]
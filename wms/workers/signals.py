@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .cache import slot_changed, user_changed, worker_changed
+from .images import photo_saved
+from .models import Attendance, Slot, UserProfile, Worker
+from .slots import invalidate_schedule
+from .summaries import attendance_deleted, attendance_saved, remember_old_key
+
+
+post_save.connect(invalidate_schedule, sender=Slot, dispatch_uid="slot_schedule_save")
+post_delete.connect(invalidate_schedule, sender=Slot, dispatch_uid="slot_schedule_delete")
+post_save.connect(slot_changed, sender=Slot, dispatch_uid="slot_cache_save")
+post_delete.connect(slot_changed, sender=Slot, dispatch_uid="slot_cache_delete")
+
+post_save.connect(worker_changed, sender=Worker, dispatch_uid="worker_cache_save")
+post_delete.connect(worker_changed, sender=Worker, dispatch_uid="worker_cache_delete")
+
+post_save.connect(user_changed, sender=User, dispatch_uid="user_cache_save")
+post_delete.connect(user_changed, sender=User, dispatch_uid="user_cache_delete")
+post_save.connect(user_changed, sender=UserProfile, dispatch_uid="profile_cache_save")
+post_delete.connect(user_changed, sender=UserProfile, dispatch_uid="profile_cache_delete")
+
+post_save.connect(photo_saved, sender=Worker, dispatch_uid="worker_photo")
+post_save.connect(photo_saved, sender=UserProfile, dispatch_uid="profile_photo")
+
+pre_save.connect(remember_old_key, sender=Attendance, dispatch_uid="summary_old_key")
+post_save.connect(attendance_saved, sender=Attendance, dispatch_uid="summary_save")
+post_delete.connect(attendance_deleted, sender=Attendance, dispatch_uid="summary_delete")
@@ -0,0 +1,145 @@
+import bisect
+import logging
+import threading
+import time
+
+from .cache import slots as slot_cache
+from .models import Slot
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on how long a process keeps a schedule without checking
+# the shared "slots" cache region. With a shared cache backend other
+# processes notice a slot change on their next lookup; with the default
+# per-process cache they notice within this many seconds.
+SCHEDULE_TTL = 60
+
+DAY_US = 24 * 60 * 60 * 1_000_000
+
+
+def _micros(t):
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond
+
+
+class SlotSchedule:
+    """
+    Sorted, non-overlapping view of the active slots for one day.
+
+    Every slot is turned into one or two half-open intervals in
+    microseconds since midnight (slots ending before they start cross
+    midnight and are split in two). The day is then cut into disjoint
+    segments at every interval boundary and each segment remembers the
+    slot that owns it, so ``active_at`` is a single bisect.
+
+    Where slots overlap, the segment goes to the slot that started most
+    recently; the clashing pairs are kept in ``overlaps`` so they can be
+    shown to whoever manages the slots.
+    """
+
+    def __init__(self, slots):
+        self.slots = list(slots)
+
+        intervals = []
+        for slot in self.slots:
+            start = _micros(slot.start_time)
+            # End times are inclusive, matching the old start <= now <= end check.
+            end = _micros(slot.end_time) + 1
+
+            if start < end:
+                intervals.append((start, end, slot))
+            else:
+                intervals.append((start, DAY_US, slot))
+                intervals.append((0, end, slot))
+
+        intervals.sort(key=lambda i: (i[0], i[1], i[2].pk))
+
+        self.overlaps = self._find_overlaps(intervals)
+
+        bounds = sorted({b for start, end, _ in intervals for b in (start, end)})
+
+        self.starts = []
+        self.ends = []
+        self.owners = []
+
+        for seg_start, seg_end in zip(bounds, bounds[1:]):
+            owner = None
+            for start, end, slot in intervals:
+                if start > seg_start:
+                    break
+                if end > seg_start:
+                    owner = slot
+
+            if owner is None:
+                continue
+
+            if self.owners and self.owners[-1] is owner and self.ends[-1] == seg_start:
+                self.ends[-1] = seg_end
+                continue
+
+            self.starts.append(seg_start)
+            self.ends.append(seg_end)
+            self.owners.append(owner)
+
+    @staticmethod
+    def _find_overlaps(intervals):
+        overlaps = []
+        for i, (start, end, slot) in enumerate(intervals):
+            for other_start, other_end, other in intervals[i + 1:]:
+                if other_start >= end:
+                    break
+                pair = (slot, other)
+                if other.pk != slot.pk and pair not in overlaps:
+                    overlaps.append(pair)
+        return overlaps
+
+    def active_at(self, t):
+        """Return the slot active at ``t`` (a ``datetime.time``), or None."""
+        t = _micros(t)
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.ends[i]:
+            return self.owners[i]
+        return None
+
+
+_lock = threading.Lock()
+_schedule = None
+_built_at = 0.0
+_generation = None
+
+
+def get_schedule():
+    global _schedule, _built_at, _generation
+
+    generation = slot_cache.generation()
+
+    def usable(schedule):
+        return (
+            schedule is not None
+            and generation == _generation
+            and time.monotonic() - _built_at < SCHEDULE_TTL
+        )
+
+    schedule = _schedule
+    if usable(schedule):
+        slot_cache.record(hit=True)
+        return schedule
+
+    with _lock:
+        schedule = _schedule
+        if usable(schedule):
+            return schedule
+
+        slot_cache.record(hit=False)
+        schedule = SlotSchedule(Slot.objects.filter(is_active=True).order_by("id"))
+        _schedule, _built_at, _generation = schedule, time.monotonic(), generation
+
+        for first, second in schedule.overlaps:
+            logger.warning("Active slots overlap: %s and %s", first, second)
+
+        return schedule
+
+
+def invalidate_schedule(**kwargs):
+    global _schedule
+    _schedule = None
@@ -0,0 +1,449 @@
+import threading
+from calendar import monthrange
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+
+from .cache import after_commit, attendance_changed, changes, dashboards, worker_key
+from .models import Attendance, DailySlotSummary, Slot, Worker, WorkerMonthlySummary
+from .slots import get_schedule
+
+
+BATCH_SIZE = 1000
+
+
+def presence_only():
+    """True when only present marks are stored and absence is implicit."""
+    return getattr(settings, "ATTENDANCE_PRESENCE_ONLY", False)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(month):
+    return month.replace(day=monthrange(month.year, month.month)[1])
+
+
+def next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1, day=1)
+    return month.replace(month=month.month + 1, day=1)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ================= INCREMENTAL (ATTENDANCE WRITER) =================
+def apply_slot_changes(day, slot, changes):
+    """
+    Fold a slot save into the summary tables without rescanning history.
+
+    ``changes`` maps worker id -> (old, new) where each side is True,
+    False or None (no row). Counters are moved by the difference, with
+    one UPDATE per distinct delta rather than one per worker. Must run
+    in the same transaction as the attendance write, after lock_daily
+    has locked the (day, slot) row.
+    """
+    if not changes:
+        return
+
+    invalidate_worker_summaries(changes)
+    attendance_changed([day])
+
+    def flag(value, wanted):
+        return 1 if value == wanted else 0
+
+    month = month_start(day)
+
+    WorkerMonthlySummary.objects.bulk_create(
+        [WorkerMonthlySummary(worker_id=worker_id, month=month) for worker_id in changes],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    # The workers' monthly rows serialise this with a save of another slot
+    # of the same day, and with a refresh: whoever comes second waits here
+    # and then sees the first one's marks.
+    lock_monthly(month, changes)
+
+    # Days present only change if the worker has no other present slot that day.
+    present_elsewhere = set(
+        Attendance.objects.filter(date=day, present=True, worker_id__in=list(changes))
+        .exclude(slot=slot)
+        .values_list("worker_id", flat=True)
+    )
+
+    daily_present = daily_absent = 0
+    groups = defaultdict(list)
+
+    for worker_id, (old, new) in changes.items():
+        present = flag(new, True) - flag(old, True)
+        absent = flag(new, False) - flag(old, False)
+
+        days = 0
+        if worker_id not in present_elsewhere:
+            days = present
+
+        daily_present += present
+        daily_absent += absent
+
+        if present or absent or days:
+            groups[(present, absent, days)].append(worker_id)
+
+    DailySlotSummary.objects.filter(date=day, slot=slot).update(
+        present_count=F("present_count") + daily_present,
+        absent_count=F("absent_count") + daily_absent,
+    )
+
+    for (present, absent, days), worker_ids in groups.items():
+        for batch in _chunks(worker_ids):
+            WorkerMonthlySummary.objects.filter(month=month, worker_id__in=batch).update(
+                present_count=F("present_count") + present,
+                absent_count=F("absent_count") + absent,
+                days_present=F("days_present") + days,
+            )
+
+
+# ================= PER-WORKER SUMMARY (USER DASHBOARD) =================
+def worker_summary_key(worker_id, today=None):
+    # Keyed by day so the streak rolls over at midnight on its own.
+    return f"worker:{worker_id}:{today or date.today()}"
+
+
+def invalidate_worker_summaries(worker_ids):
+    keys = [worker_summary_key(worker_id) for worker_id in worker_ids]
+    # After commit, so a concurrent reader can't re-cache the old totals.
+    after_commit(dashboards.delete, *keys)
+    after_commit(changes.touch, *[worker_key(worker_id) for worker_id in worker_ids])
+
+
+def current_streak(worker_id, today=None):
+    """
+    Consecutive days with at least one present slot, ending today (or
+    yesterday, when today's slots haven't been marked yet). Only reads
+    as many days as the streak is long.
+    """
+    today = today or date.today()
+    days = (
+        Attendance.objects.filter(worker_id=worker_id, present=True, date__lte=today)
+        .order_by("-date")
+        .values_list("date", flat=True)
+        .distinct()
+    )
+
+    streak = 0
+    expected = None
+    for day in days.iterator(chunk_size=64):
+        if expected is None:
+            if day < today - timedelta(days=1):
+                break
+            expected = day
+        if day != expected:
+            break
+        streak += 1
+        expected -= timedelta(days=1)
+    return streak
+
+
+def worker_summary(worker_id):
+    """Present percentage, this month's days and current streak, cached per worker."""
+    today = date.today()
+    return dashboards.get_or_set(
+        worker_summary_key(worker_id, today),
+        lambda: _compute_worker_summary(worker_id, today),
+    )
+
+
+def _compute_worker_summary(worker_id, today):
+    months = WorkerMonthlySummary.objects.filter(worker_id=worker_id)
+    totals = months.aggregate(present=Sum("present_count"), absent=Sum("absent_count"))
+    present, absent = totals["present"] or 0, totals["absent"] or 0
+
+    this_month = months.filter(month=month_start(today)).values_list("days_present", flat=True).first()
+
+    if presence_only():
+        # No absent rows: measure against every slot held since the
+        # worker joined (or was first marked) instead.
+        joined = Worker.objects.filter(pk=worker_id).values_list("created_at", flat=True).first()
+        first = Attendance.objects.filter(worker_id=worker_id).aggregate(first=Min("date"))["first"]
+        known = [day for day in (joined and joined.date(), first) if day]
+        absent = max(slot_days_held(min(known), today) - present, 0) if known else 0
+
+    return {
+        "present_pct": round(100 * present / (present + absent), 1) if present + absent else None,
+        "days_this_month": this_month or 0,
+        "streak": current_streak(worker_id, today),
+    }
+
+
+def slot_days_held(start, today, now=None):
+    """
+    Slot-days from ``start`` to ``today`` by the active schedule, counting
+    today's slots once they have begun. Days nobody was marked on count
+    too, unlike the summary rows.
+    """
+    now = now or datetime.now().time()
+    slots = get_schedule().slots
+    started_today = sum(1 for slot in slots if slot.start_time <= now)
+    return (today - start).days * len(slots) + started_today
+
+
+# ================= RECOMPUTE (SIGNALS / BACKFILL) =================
+# A refresh creates and locks the rows it rewrites before counting, then
+# updates them in place. An apply_slot_changes in flight therefore either
+# commits first and is counted, or waits and adds its delta to the new
+# totals. Daily rows are locked before monthly ones, in (date, slot) and
+# worker order, as save_slot_attendance does, so the two can't deadlock.
+def lock_daily(keys):
+    """
+    Lock the DailySlotSummary rows of the (date, slot) ``keys``, creating
+    the missing ones, and return the keys that had to be created.
+
+    save_slot_attendance takes this lock before reading the stored marks,
+    so two saves of the same slot can't both count the same change.
+    """
+    keys = sorted(set(keys))
+    created = set()
+    while True:
+        locked = set()
+        for batch in _chunks(keys):
+            match = Q()
+            for day, slot in batch:
+                match |= Q(date=day, slot=slot)
+            locked.update(
+                DailySlotSummary.objects.select_for_update()
+                .filter(match)
+                .order_by("date", "slot")
+                .values_list("date", "slot")
+            )
+
+        # Also picks up a row deleted by the save we were waiting for.
+        missing = [key for key in keys if key not in locked]
+        if not missing:
+            return created
+        DailySlotSummary.objects.bulk_create(
+            [DailySlotSummary(date=day, slot=slot) for day, slot in missing],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        created.update(missing)
+
+
+def drop_empty_daily(keys):
+    """Delete the rows of ``keys`` that count nothing, as a refresh would."""
+    match = Q()
+    for day, slot in keys:
+        match |= Q(date=day, slot=slot)
+    DailySlotSummary.objects.filter(match, present_count=0, absent_count=0).delete()
+
+
+def lock_monthly(month, worker_ids):
+    for batch in _chunks(sorted(worker_ids)):
+        list(
+            WorkerMonthlySummary.objects.select_for_update()
+            .filter(month=month, worker_id__in=batch)
+            .order_by("worker_id")
+            .values_list("pk", flat=True)
+        )
+
+
+def _replace(model, locked, rows, unique_fields, update_fields):
+    """Upsert ``rows`` over the ``locked`` {key: pk} rows and delete the rest."""
+    model.objects.bulk_create(
+        rows,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+    kept = {tuple(getattr(row, field) for field in unique_fields) for row in rows}
+    stale = [pk for key, pk in locked.items() if key not in kept]
+    for batch in _chunks(stale):
+        model.objects.filter(pk__in=batch).delete()
+
+
+def refresh_daily(start, end=None):
+    """Recompute DailySlotSummary rows for every day in [start, end]."""
+    end = end or start
+
+    with transaction.atomic():
+        slot_ids = list(Slot.objects.values_list("id", flat=True))
+        DailySlotSummary.objects.bulk_create(
+            [
+                DailySlotSummary(date=start + timedelta(days=offset), slot=slot)
+                for offset in range((end - start).days + 1)
+                for slot in slot_ids
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        locked = {
+            (day, slot): pk
+            for day, slot, pk in DailySlotSummary.objects.select_for_update()
+            .filter(date__range=(start, end))
+            .order_by("date", "slot")
+            .values_list("date", "slot", "pk")
+        }
+
+        totals = (
+            Attendance.objects.filter(date__range=(start, end))
+            .values("date", "slot")
+            .annotate(
+                present_total=Count("id", filter=Q(present=True)),
+                absent_total=Count("id", filter=Q(present=False)),
+            )
+            .order_by()
+        )
+
+        rows = [
+            DailySlotSummary(
+                date=row["date"],
+                slot=row["slot"],
+                present_count=row["present_total"],
+                absent_count=row["absent_total"],
+            )
+            for row in totals
+        ]
+
+        _replace(DailySlotSummary, locked, rows, ["date", "slot"], ["present_count", "absent_count"])
+    return len(rows)
+
+
+def refresh_monthly(month, worker_ids=None):
+    """
+    Recompute WorkerMonthlySummary rows for one month (optionally some
+    workers). Without ``worker_ids`` only existing rows are locked, so
+    a full rebuild is best run while nobody is marking attendance.
+    """
+    month = month_start(month)
+
+    records = Attendance.objects.filter(date__range=(month, month_end(month)))
+    summaries = WorkerMonthlySummary.objects.filter(month=month)
+    if worker_ids is not None:
+        records = records.filter(worker_id__in=worker_ids)
+        summaries = summaries.filter(worker_id__in=worker_ids)
+
+    with transaction.atomic():
+        if worker_ids is not None:
+            WorkerMonthlySummary.objects.bulk_create(
+                [WorkerMonthlySummary(worker_id=worker_id, month=month) for worker_id in worker_ids],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            lock_monthly(month, worker_ids)
+        locked = {
+            (worker_id, month): pk
+            for worker_id, pk in summaries.select_for_update().order_by("worker_id").values_list("worker_id", "pk")
+        }
+
+        totals = (
+            records.values("worker_id")
+            .annotate(
+                present_total=Count("id", filter=Q(present=True)),
+                absent_total=Count("id", filter=Q(present=False)),
+                days_total=Count("date", filter=Q(present=True), distinct=True),
+            )
+            .order_by()
+        )
+
+        rows = [
+            WorkerMonthlySummary(
+                worker_id=row["worker_id"],
+                month=month,
+                present_count=row["present_total"],
+                absent_count=row["absent_total"],
+                days_present=row["days_total"],
+            )
+            for row in totals.iterator()
+        ]
+
+        _replace(
+            WorkerMonthlySummary, locked, rows,
+            ["worker_id", "month"], ["present_count", "absent_count", "days_present"],
+        )
+    return len(rows)
+
+
+# ================= SIGNAL RECEIVERS =================
+# Single-row writes (admin edits, deletes, cascades from Worker) don't go
+# through the bulk writer. The keys they touch are collected per thread
+# and recomputed once after the transaction commits, so deleting a worker
+# with a year of history costs one refresh per day rather than per row.
+_pending = threading.local()
+
+
+@contextmanager
+def summaries_handled():
+    """
+    Attendance deletes inside this block are already counted by the
+    caller (apply_slot_changes), so the delete receiver ignores them.
+    """
+    _pending.handled = True
+    try:
+        yield
+    finally:
+        _pending.handled = False
+
+
+def _mark_dirty(day, worker_id):
+    keys = getattr(_pending, "keys", None)
+    if keys is None:
+        keys = _pending.keys = set()
+    keys.add((_as_date(day), worker_id))
+    transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    keys = getattr(_pending, "keys", None)
+    if not keys:
+        return
+    _pending.keys = set()
+
+    months = defaultdict(set)
+    for day, worker_id in keys:
+        months[month_start(day)].add(worker_id)
+
+    # Daily before monthly, the order save_slot_attendance locks them in.
+    with transaction.atomic():
+        for day in sorted({day for day, _ in keys}):
+            refresh_daily(day)
+        for month, worker_ids in sorted(months.items()):
+            refresh_monthly(month, worker_ids)
+
+    invalidate_worker_summaries({worker_id for _, worker_id in keys})
+    attendance_changed({day for day, _ in keys})
+
+
+def remember_old_key(sender, instance, raw=False, **kwargs):
+    instance._summary_old_key = None
+    if instance.pk and not raw:
+        instance._summary_old_key = (
+            Attendance.objects.filter(pk=instance.pk).values_list("date", "worker_id").first()
+        )
+
+
+def attendance_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, "_summary_old_key", None)
+    if old:
+        _mark_dirty(*old)
+    _mark_dirty(instance.date, instance.worker_id)
+
+
+def attendance_deleted(sender, instance, **kwargs):
+    if getattr(_pending, "handled", False):
+        return
+    _mark_dirty(instance.date, instance.worker_id)
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
@@ -0,0 +1,59 @@
+import random
+from datetime import date, time, timedelta
+
+from .attendance import save_slot_attendance
+from .models import Slot, Worker
+
+
+DEFAULT_SLOTS = (
+    ("Slot 1", time(9, 0), time(10, 0)),
+    ("Slot 2", time(13, 0), time(14, 0)),
+    ("Slot 3", time(16, 0), time(17, 0)),
+)
+
+
+def seed(workers=100, days=30, present_rate=0.85, end_day=None, random_seed=0):
+    """
+    Generate a synthetic workforce with ``days`` days of attendance for
+    every active slot, ending on ``end_day`` (today by default).
+
+    Slots are created only when none exist. Attendance is only written
+    for the workers created here, never over real workers' marks.
+    Returns the number of workers and attendance rows written.
+    """
+    rng = random.Random(random_seed)
+    end_day = end_day or date.today()
+
+    if not Slot.objects.exists():
+        Slot.objects.bulk_create(
+            Slot(name=name, start_time=start, end_time=end)
+            for name, start, end in DEFAULT_SLOTS
+        )
+
+    offset = Worker.objects.count()
+    created = Worker.objects.bulk_create(
+        (
+            Worker(
+                name=f"Synthetic Worker {offset + i}",
+                dob=date(1980, 1, 1) + timedelta(days=rng.randrange(9000)),
+                phone=f"9{offset + i:09d}",
+                email=f"worker{offset + i}@example.com",
+            )
+            for i in range(workers)
+        ),
+        batch_size=1000,
+    )
+
+    # PostgreSQL and SQLite return the new primary keys from bulk_create.
+    worker_ids = [worker.pk for worker in created]
+    slot_ids = list(Slot.objects.filter(is_active=True).values_list("id", flat=True))
+
+    rows = 0
+    for back in range(days):
+        day = end_day - timedelta(days=back)
+        for slot_id in slot_ids:
+            marks = {worker_id: rng.random() < present_rate for worker_id in worker_ids}
+            result = save_slot_attendance(slot_id, marks, day=day)
+            rows += result["inserted"]
+
+    return {"workers": workers, "attendance": rows}
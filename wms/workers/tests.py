@@ -1,3 +1,1389 @@
-from django.test import TestCase
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+
+from . import perf
+from .attendance import apply_marks, save_slot_attendance
+from .auth import LOGIN_FAILURES_PER_USERNAME
+from .cache import CacheRegion, changes, rosters, user_key, users
+from .changes import changes_since, decode_watermark, encode_watermark
+from .exports import iter_report_rows, parse_report_filters, render_report_file, report_filename, stream_csv
+from .images import process_photo
+from .importers import clean_row, import_workers
+from .matrix import build_matrix, matrix_filename, parse_matrix_filters
+from .models import (
+    Attendance, DailySlotSummary, ReportJob, Slot, UserProfile, Worker, WorkerMonthlySummary, processed_photo_name,
+)
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .partitions import (
+    archive_month, archive_name, archive_storage, closed_months, detach_partition, is_partitioned, iter_archived,
+    offline_months,
+)
+from .reports import MAX_ATTEMPTS, claim_job, enqueue_report, release_job, requeue_stale, run_job
+from .routers import REPLICA, ReplicaRouter, pin, primary, reporting
+from .search import search
+from .slots import SlotSchedule
+from .summaries import refresh_daily, refresh_monthly
+from .views import linked_worker
+
+
+def make_workers(count):
+    return [
+        Worker.objects.create(name=f"worker {i}", dob=date(1990, 1, 1), phone=str(i))
+        for i in range(count)
+    ]
+
+
+# ================= ATTENDANCE WRITES =================
+class SaveSlotAttendanceTests(TestCase):
+    day = date(2026, 1, 5)
+
+    def setUp(self):
+        self.workers = make_workers(4)
+        self.ids = [worker.id for worker in self.workers]
+
+    def counts(self, result):
+        return {key: result[key] for key in ("inserted", "updated", "deleted", "unchanged")}
+
+    def test_only_changed_workers_are_written(self):
+        first, second, third, fourth = self.ids
+        result = save_slot_attendance(1, {first: True, second: True, third: False}, day=self.day)
+        self.assertEqual(self.counts(result), {"inserted": 3, "updated": 0, "deleted": 0, "unchanged": 0})
+        self.assertEqual(result["changed"], {first: True, second: True, third: False})
+
+        result = save_slot_attendance(
+            1, {first: True, second: False, third: False, fourth: True}, day=self.day
+        )
+        self.assertEqual(self.counts(result), {"inserted": 1, "updated": 1, "deleted": 0, "unchanged": 2})
+        self.assertEqual(result["changed"], {second: False, fourth: True})
+        self.assertEqual(
+            dict(Attendance.objects.filter(date=self.day, slot=1).values_list("worker_id", "present")),
+            {first: True, second: False, third: False, fourth: True},
+        )
+
+    def test_nothing_to_save(self):
+        result = save_slot_attendance(1, {}, day=self.day)
+        self.assertEqual(self.counts(result), {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0})
+
+    @override_settings(ATTENDANCE_PRESENCE_ONLY=True)
+    def test_presence_only_keeps_unmarked_rows(self):
+        first, second = self.ids[:2]
+        result = save_slot_attendance(1, {first: True, second: False}, day=self.day)
+        self.assertEqual(self.counts(result), {"inserted": 1, "updated": 0, "deleted": 0, "unchanged": 1})
+
+        # Un-marking leaves an absent row behind for the change feed.
+        result = save_slot_attendance(1, {first: False}, day=self.day)
+        self.assertEqual(self.counts(result), {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 0})
+        self.assertEqual(
+            list(Attendance.objects.values_list("worker_id", "present")), [(first, False)]
+        )
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentSaveTests(TransactionTestCase):
+    day = date(2026, 1, 5)
+
+    def test_overlapping_saves_of_one_slot_count_once(self):
+        worker = make_workers(1)[0]
+        saved = threading.Event()
+        release = threading.Event()
+        results = {}
+
+        def save(name, hold):
+            try:
+                with transaction.atomic():
+                    results[name] = save_slot_attendance(1, {worker.id: True}, day=self.day)
+                    if hold:
+                        saved.set()
+                        release.wait(5)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=save, args=("first", True))
+        second = threading.Thread(target=save, args=("second", False))
+        first.start()
+        saved.wait(5)
+        second.start()
+        # The second save must wait for the first to commit.
+        second.join(0.5)
+        self.assertTrue(second.is_alive())
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(results["first"]["inserted"], 1)
+        self.assertEqual(results["second"]["unchanged"], 1)
+        self.assertEqual(DailySlotSummary.objects.get(date=self.day, slot=1).present_count, 1)
+        self.assertEqual(WorkerMonthlySummary.objects.get(worker=worker).present_count, 1)
+
+
+# ================= SUMMARIES =================
+class SummaryTests(TestCase):
+    day = date(2026, 1, 5)
+
+    def setUp(self):
+        self.workers = make_workers(3)
+        self.ids = [worker.id for worker in self.workers]
+
+    def daily(self):
+        return {
+            (row.date, row.slot): (row.present_count, row.absent_count)
+            for row in DailySlotSummary.objects.all()
+        }
+
+    def monthly(self):
+        return {
+            row.worker_id: (row.present_count, row.absent_count, row.days_present)
+            for row in WorkerMonthlySummary.objects.all()
+        }
+
+    def mark_month(self):
+        first, second, third = self.ids
+        save_slot_attendance(1, {first: True, second: True, third: False}, day=self.day)
+        save_slot_attendance(2, {first: True, second: False, third: False}, day=self.day)
+        save_slot_attendance(1, {first: True, second: False}, day=date(2026, 1, 6))
+        # Moving a mark between slots of a day keeps the day counted once.
+        save_slot_attendance(1, {second: False}, day=self.day)
+        save_slot_attendance(2, {second: True}, day=self.day)
+
+    def test_incremental_counts(self):
+        first, second, third = self.ids
+        self.mark_month()
+
+        self.assertEqual(self.daily(), {
+            (self.day, 1): (1, 2),
+            (self.day, 2): (2, 1),
+            (date(2026, 1, 6), 1): (1, 1),
+        })
+        self.assertEqual(self.monthly(), {
+            first: (3, 0, 2),
+            second: (1, 2, 1),
+            third: (0, 2, 0),
+        })
+
+    def test_refresh_matches_incremental_counts(self):
+        self.mark_month()
+        daily, monthly = self.daily(), self.monthly()
+
+        DailySlotSummary.objects.update(present_count=99)
+        DailySlotSummary.objects.create(date=date(2026, 1, 7), slot=1, present_count=5)
+        WorkerMonthlySummary.objects.update(days_present=99)
+
+        self.assertEqual(refresh_daily(date(2026, 1, 1), date(2026, 1, 31)), 3)
+        self.assertEqual(refresh_monthly(self.day), 3)
+        self.assertEqual(self.daily(), daily)
+        self.assertEqual(self.monthly(), monthly)
+
+    def test_refresh_some_workers(self):
+        first, second, _ = self.ids
+        self.mark_month()
+        monthly = self.monthly()
+
+        WorkerMonthlySummary.objects.update(present_count=0)
+        refresh_monthly(self.day, [first])
+        self.assertEqual(self.monthly()[first], monthly[first])
+        self.assertEqual(self.monthly()[second][0], 0)
+
+
+# ================= PAGINATION =================
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        self.ids = [worker.id for worker in make_workers(7)]
+        self.queryset = Worker.objects.all()
+
+    def page_ids(self, page):
+        return [worker.id for worker in page]
+
+    def test_forward_and_back(self):
+        first = keyset_page(self.queryset, limit=3)
+        self.assertEqual(self.page_ids(first), self.ids[:3])
+        self.assertEqual((first.has_prev, first.has_next), (False, True))
+        self.assertIsNone(first.prev_before)
+
+        second = keyset_page(self.queryset, after=first.next_after, limit=3)
+        self.assertEqual(self.page_ids(second), self.ids[3:6])
+
+        last = keyset_page(self.queryset, after=second.next_after, limit=3)
+        self.assertEqual(self.page_ids(last), self.ids[6:])
+        self.assertEqual((last.has_prev, last.has_next), (True, False))
+        self.assertIsNone(last.next_after)
+
+        back = keyset_page(self.queryset, before=last.prev_before, limit=3)
+        self.assertEqual(self.page_ids(back), self.ids[3:6])
+        self.assertEqual((back.has_prev, back.has_next), (True, True))
+
+        back = keyset_page(self.queryset, before=back.prev_before, limit=3)
+        self.assertEqual(self.page_ids(back), self.ids[:3])
+        self.assertFalse(back.has_prev)
+
+    def test_values_rows(self):
+        page = keyset_page(self.queryset.values("id", "name"), limit=2)
+        self.assertEqual(page.next_after, self.ids[1])
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(12345)), 12345)
+        self.assertIsNone(decode_cursor(""))
+        for bad in ("!!", encode_cursor("abc"), encode_cursor(-1)):
+            with self.assertRaises(ValueError):
+                decode_cursor(bad)
+
+
+# ================= SLOTS =================
+class SlotScheduleTests(TestCase):
+    def slot(self, pk, start, end):
+        return Slot(pk=pk, name=f"slot {pk}", start_time=start, end_time=end)
+
+    def test_active_at(self):
+        morning = self.slot(1, time(8), time(12))
+        night = self.slot(2, time(22), time(6))
+        schedule = SlotSchedule([morning, night])
+
+        self.assertIs(schedule.active_at(time(8)), morning)
+        # End times are inclusive.
+        self.assertIs(schedule.active_at(time(12)), morning)
+        self.assertIsNone(schedule.active_at(time(12, 0, 1)))
+        self.assertIs(schedule.active_at(time(23, 30)), night)
+        self.assertIs(schedule.active_at(time(3)), night)
+        self.assertIsNone(schedule.active_at(time(7, 59)))
+        self.assertEqual(schedule.overlaps, [])
+
+    def test_overlapping_slots(self):
+        early = self.slot(1, time(9), time(11))
+        late = self.slot(2, time(10), time(12))
+        schedule = SlotSchedule([late, early])
+
+        self.assertIs(schedule.active_at(time(9, 30)), early)
+        # The slot that started most recently wins.
+        self.assertIs(schedule.active_at(time(10, 30)), late)
+        self.assertIs(schedule.active_at(time(11, 30)), late)
+        self.assertEqual(schedule.overlaps, [(early, late)])
+
+    def test_no_slots(self):
+        self.assertIsNone(SlotSchedule([]).active_at(time(9)))
+
+
+# ================= EXPORTS =================
+class ReportExportTests(TestCase):
+    def setUp(self):
+        self.morning = Slot.objects.create(name="Morning", start_time=time(8), end_time=time(12))
+        self.ann = Worker.objects.create(name="Ann", dob=date(1990, 1, 1), phone="1")
+        self.bob = Worker.objects.create(name="=HYPERLINK(\"x\")", dob=date(1990, 1, 1), phone="2")
+        save_slot_attendance(self.morning.id, {self.ann.id: True, self.bob.id: True}, day=date(2026, 1, 5))
+        save_slot_attendance(self.morning.id, {self.ann.id: True, self.bob.id: False}, day=date(2026, 1, 6))
+        save_slot_attendance(99, {self.ann.id: True}, day=date(2026, 1, 6))
+
+    def filters(self, **params):
+        return parse_report_filters({"start": "2026-01-01", "end": "2026-01-31", **params})
+
+    def test_parse_filters(self):
+        filters = parse_report_filters({})
+        self.assertEqual((filters["start"], filters["end"], filters["format"]), (date.today(), date.today(), "pdf"))
+        self.assertEqual(report_filename(self.filters(format="csv")), "attendance_2026-01-01_2026-01-31.csv")
+
+        for params in (
+            {"start": "yesterday"},
+            {"start": "2026-01-31", "end": "2026-01-01"},
+            {"start": "2024-01-01", "end": "2026-01-01"},
+            {"format": "docx"},
+            {"worker": "ann"},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                parse_report_filters(params)
+
+    def test_rows_are_present_marks_in_order(self):
+        self.assertEqual(list(iter_report_rows(self.filters())), [
+            (date(2026, 1, 5), "=HYPERLINK(\"x\")", "Morning"),
+            (date(2026, 1, 5), "Ann", "Morning"),
+            (date(2026, 1, 6), "Ann", "Morning"),
+            (date(2026, 1, 6), "Ann", "Slot 99"),
+        ])
+        self.assertEqual(len(list(iter_report_rows(self.filters(worker=str(self.bob.id))))), 1)
+        self.assertEqual(len(list(iter_report_rows(self.filters(slot="99")))), 1)
+
+    def test_csv_cells_are_never_formulas(self):
+        lines = list(stream_csv([("=1+1", "-2", "@x", "+", "-", 3, "plain")]))
+        self.assertEqual(lines[1], "'=1+1,'-2,'@x,+,-,3,plain\r\n")
+        # Importing an exported roster gets the original value back.
+        self.assertEqual(clean_row({"name": "'=1+1", "dob": "1990-01-01", "phone": "'+911"}).phone, "+911")
+
+    def test_rendered_files(self):
+        csv_file = render_report_file(self.filters(format="csv")).read().decode()
+        self.assertEqual(csv_file.splitlines()[:2], ["Date,Worker,Slot", "2026-01-05,\"'=HYPERLINK(\"\"x\"\")\",Morning"])
+
+        pdf = render_report_file(self.filters(format="pdf")).read()
+        self.assertTrue(pdf.startswith(b"%PDF"))
+
+        sheet = load_workbook(render_report_file(self.filters(format="xlsx"))).active
+        self.assertEqual(sheet.max_row, 5)
+        self.assertEqual(sheet["B2"].value, "=HYPERLINK(\"x\")")
+        self.assertEqual(sheet["B2"].data_type, "s")
+
+    def test_csv_download_streams(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        response = self.client.get("/download/", {"start": "2026-01-01", "end": "2026-01-31", "format": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("attendance_2026-01-01_2026-01-31.csv", response["Content-Disposition"])
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 5)
+        self.assertEqual(self.client.get("/download/", {"start": "nope"}).status_code, 400)
+
+
+# ================= ATTENDANCE SYNC =================
+class ApplyMarksTests(TestCase):
+    now = datetime(2026, 1, 31, 9, 30)
+
+    def setUp(self):
+        self.morning = Slot.objects.create(name="Morning", start_time=time(8), end_time=time(12))
+        self.night = Slot.objects.create(name="Night", start_time=time(22), end_time=time(6))
+        self.workers = make_workers(3)
+
+    def mark(self, worker, slot, at, present=True, day=None):
+        return {
+            "worker": worker.id,
+            "slot": slot.id,
+            "date": (day or at.date()).isoformat(),
+            "present": present,
+            "at": at.isoformat(),
+        }
+
+    def reasons(self, result):
+        return [rejected["reason"] for rejected in result["rejected"]]
+
+    def test_marks_must_be_made_during_their_slot(self):
+        first, second, third = self.workers
+        result = apply_marks([
+            self.mark(first, self.morning, datetime(2026, 1, 31, 8, 15)),
+            # Device clock a little fast: still counts.
+            self.mark(second, self.morning, datetime(2026, 1, 31, 7, 57)),
+            # Marked before the morning slot opened.
+            self.mark(third, self.morning, datetime(2026, 1, 31, 7, 0)),
+            # Marked in the evening for the morning slot.
+            self.mark(third, self.morning, datetime(2026, 1, 30, 20, 0)),
+        ], now=self.now)
+
+        self.assertEqual(result["inserted"], 2)
+        self.assertEqual(self.reasons(result), ["outside slot time", "outside slot time"])
+        self.assertEqual(
+            set(Attendance.objects.values_list("worker_id", flat=True)),
+            {first.id, second.id},
+        )
+
+    def test_queued_overnight_marks_arrive_within_the_grace_period(self):
+        first, second, _ = self.workers
+        result = apply_marks([
+            # Night shift that started yesterday evening, synced this morning.
+            self.mark(first, self.night, datetime(2026, 1, 30, 23, 0)),
+            self.mark(second, self.night, datetime(2026, 1, 31, 2, 0), day=date(2026, 1, 30)),
+            self.mark(second, self.night, datetime(2026, 1, 31, 5, 0)),
+        ], now=self.now)
+
+        self.assertEqual(result["inserted"], 3)
+        self.assertEqual(result["rejected"], [])
+
+        result = apply_marks([
+            self.mark(first, self.morning, datetime(2026, 1, 29, 9, 0)),
+            self.mark(first, self.morning, datetime(2026, 1, 31, 11, 0)),
+        ], now=self.now)
+        self.assertEqual(self.reasons(result), ["date out of range", "date out of range"])
+
+    def test_client_time_zone_is_respected(self):
+        at = datetime(2026, 1, 31, 8, 15).astimezone()
+        result = apply_marks([self.mark(self.workers[0], self.morning, at)], now=self.now)
+        self.assertEqual(result["inserted"], 1)
+
+    def test_unknown_and_malformed_marks_are_reported(self):
+        at = datetime(2026, 1, 31, 9, 0)
+        self.morning_off = Slot.objects.create(
+            name="Closed", start_time=time(8), end_time=time(12), is_active=False
+        )
+        marks = [
+            self.mark(self.workers[0], self.morning_off, at),
+            dict(self.mark(self.workers[0], self.morning, at), worker=999999),
+            dict(self.mark(self.workers[0], self.morning, at), present="yes"),
+            {key: value for key, value in self.mark(self.workers[0], self.morning, at).items() if key != "at"},
+        ]
+        result = apply_marks(marks, now=self.now)
+        self.assertEqual(
+            sorted(self.reasons(result)),
+            ["malformed", "malformed", "unknown or inactive slot", "unknown worker"],
+        )
+        self.assertFalse(Attendance.objects.exists())
+
+
+class AttendanceSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("supervisor", password="pw", is_staff=True)
+        self.client.force_login(self.user)
+        self.slot = Slot.objects.create(name="All day", start_time=time(0), end_time=time(23, 59, 59))
+        self.workers = make_workers(3)
+
+    def sync(self, marks):
+        return self.client.post(
+            "/api/v1/attendance/sync/", json.dumps({"marks": marks}), content_type="application/json"
+        )
+
+    def test_batch_is_idempotent(self):
+        now = datetime.now()
+        marks = [
+            {"worker": worker.id, "slot": self.slot.id, "date": now.date().isoformat(),
+             "present": True, "at": now.isoformat()}
+            for worker in self.workers
+        ]
+        marks.append(dict(marks[0], present=False))
+
+        response = self.sync(marks)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["inserted"], 3)
+
+        response = self.sync(marks)
+        self.assertEqual(response.json()["unchanged"], 3)
+        self.assertEqual(Attendance.objects.filter(present=True).count(), 2)
+        self.assertEqual(DailySlotSummary.objects.get(slot=self.slot.id).present_count, 2)
+
+    def test_bad_body(self):
+        response = self.client.post("/api/v1/attendance/sync/", "nope", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/attendance/sync/").status_code, 405)
+
+
+# ================= IMPORT =================
+class ImportWorkersTests(TestCase):
+    def rows(self, *rows):
+        header = ("name", "dob", "phone", "email")
+        return [(line, dict(zip(header, row))) for line, row in enumerate(rows, start=2)]
+
+    def test_valid_rows(self):
+        result = import_workers(self.rows(
+            ("Ann", "1990-01-31", "111", "Ann@Example.com"),
+            ("Bob", "31/01/1990", "222", ""),
+            ("Cy", date(1990, 1, 31), "333", None),
+        ))
+        self.assertTrue(result.committed)
+        self.assertEqual((result.created, result.rejected), (3, 0))
+        self.assertEqual(
+            list(Worker.objects.order_by("phone").values_list("name", "dob", "email")),
+            [
+                ("Ann", date(1990, 1, 31), "ann@example.com"),
+                ("Bob", date(1990, 1, 31), None),
+                ("Cy", date(1990, 1, 31), None),
+            ],
+        )
+
+    def test_any_rejected_row_cancels_the_import(self):
+        rows = self.rows(
+            ("Ann", "1990-01-31", "111", ""),
+            ("", "1990-01-31", "222", ""),
+            ("Cy", "not a date", "333", ""),
+            ("Dee", "1990-01-31", "111", ""),
+        )
+        result = import_workers(rows)
+        self.assertFalse(result.committed)
+        self.assertEqual(result.rejected, 3)
+        self.assertEqual(
+            result.errors,
+            [(3, "name is required"), (4, "invalid date of birth 'not a date'"), (5, "duplicate phone 111")],
+        )
+        self.assertFalse(Worker.objects.exists())
+
+        result = import_workers(rows, skip_invalid=True)
+        self.assertTrue(result.committed)
+        self.assertEqual(list(Worker.objects.values_list("name", flat=True)), ["Ann"])
+
+    def test_dry_run(self):
+        result = import_workers(self.rows(("Ann", "1990-01-31", "111", "")), dry_run=True)
+        self.assertEqual((result.created, result.committed), (1, False))
+        self.assertFalse(Worker.objects.exists())
+
+
+class ImportWorkersViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+
+    def upload(self, name, content, **data):
+        response = self.client.post("/add/import/", {"file": SimpleUploadedFile(name, content), **data})
+        self.assertRedirects(response, "/add/", fetch_redirect_response=False)
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_unreadable_files_are_reported(self):
+        for name, content in [
+            ("workers.csv", "name,dob,phone\nJosé,1990-01-01,1\n".encode("latin-1")),
+            ("workers.csv", b"name,dob,phone\n" + b"x" * 200_000 + b",1990-01-01,1\n"),
+            ("workers.xlsx", b"name,dob,phone\n"),
+        ]:
+            with self.subTest(content=content):
+                messages = self.upload(name, content)
+                self.assertIn("is not a UTF-8 CSV or an .xlsx file", messages[-1])
+        self.assertFalse(Worker.objects.exists())
+
+    def test_duplicate_email_ignores_case(self):
+        Worker.objects.create(name="Existing", dob=date(1990, 1, 1), phone="1", email="Ann@Example.com")
+        messages = self.upload(
+            "workers.csv",
+            b"name,dob,phone,email\nAnn,1990-01-01,2,ann@example.COM\nBob,1990-01-01,3,bob@example.com\n",
+            skip_invalid="1",
+        )
+        self.assertIn("Row 2: duplicate email ann@example.com", messages)
+        self.assertEqual(
+            sorted(Worker.objects.values_list("email", flat=True)),
+            ["Ann@Example.com", "bob@example.com"],
+        )
+
+
+# ================= USER DASHBOARD =================
+class UserDashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ravi", password="secret", email="Ravi@example.com")
+        self.profile = UserProfile.objects.create(user=self.user, mobile="1", dob=date(1990, 1, 1))
+        self.worker = make_workers(1)[0]
+
+    def test_linked_by_email_once(self):
+        Worker.objects.filter(pk=self.worker.pk).update(email="ravi@example.com")
+
+        self.assertEqual(linked_worker(self.user), self.worker)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.worker_id, self.worker.id)
+
+        # Linked now: the email no longer matters.
+        Worker.objects.filter(pk=self.worker.pk).update(email="other@example.com")
+        self.assertEqual(linked_worker(self.user), self.worker)
+
+    def test_ambiguous_email_is_not_linked(self):
+        Worker.objects.filter(pk=self.worker.pk).update(email="ravi@example.com")
+        Worker.objects.create(name="namesake", dob=date(1990, 1, 1), phone="9", email="RAVI@example.com")
+
+        self.assertIsNone(linked_worker(self.user))
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.worker_id)
+
+    def test_dashboard_shows_the_requested_month(self):
+        self.profile.worker = self.worker
+        self.profile.save()
+        save_slot_attendance(1, {self.worker.id: True}, day=date(2026, 1, 5))
+        save_slot_attendance(2, {self.worker.id: False}, day=date(2026, 1, 5))
+        save_slot_attendance(1, {self.worker.id: True}, day=date(2026, 2, 2))
+
+        self.client.force_login(self.user)
+        response = self.client.get("/user/", {"month": "2026-01"})
+
+        self.assertEqual(
+            [(row["date"], row["present"]) for row in response.context["records"]],
+            [(date(2026, 1, 5), True), (date(2026, 1, 5), False)],
+        )
+        self.assertEqual(response.context["months"], [(date(2026, 2, 1), False), (date(2026, 1, 1), False)])
+        self.assertEqual(response.context["summary"]["present_pct"], 66.7)
+
+    def test_unlinked_account_gets_an_error(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/user/")
+        self.assertEqual(response.context["records"], [])
+        self.assertIn("not linked", response.context["error"])
+
+
+# ================= CACHE =================
+@override_settings(CACHE_SHARED=True)
+class CacheRegionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.region = CacheRegion("test", timeout=60)
+
+    def test_get_or_set_computes_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual(self.region.get_or_set("key", compute), "value")
+        self.assertEqual(self.region.get_or_set("key", compute), "value")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((self.region.hits, self.region.misses), (1, 1))
+
+    def test_invalidate_drops_every_key(self):
+        self.region.set("a", 1)
+        self.region.set("b", 2)
+        before = changes.read("test")[0]
+
+        self.region.invalidate()
+
+        self.assertIsNone(self.region.get("a"))
+        self.assertIsNone(self.region.get("b"))
+        self.assertGreaterEqual(changes.read("test")[0], before)
+
+    def test_delete_drops_one_key(self):
+        self.region.set("a", 1)
+        self.region.set("b", 2)
+        self.region.delete("a")
+        self.assertIsNone(self.region.get("a"))
+        self.assertEqual(self.region.get("b"), 2)
+
+    def test_worker_save_invalidates_rosters_after_commit(self):
+        rosters.set("page", ["cached"])
+        with self.captureOnCommitCallbacks(execute=True):
+            make_workers(1)
+            self.assertEqual(rosters.get("page"), ["cached"])
+        self.assertIsNone(rosters.get("page"))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_nothing_is_stored_without_a_shared_cache(self):
+        self.region.set("a", 1)
+        self.assertEqual(self.region.get_or_set("a", lambda: 2), 2)
+        self.assertIsNone(self.region.get("a"))
+        self.assertFalse(self.region.stats()["enabled"])
+
+
+# ================= PHOTOS =================
+def jpeg_upload(name="upload.jpg", color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", (2000, 1000), color).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(PHOTO_PROCESSING="sync", CACHE_SHARED=True)
+class ProcessPhotoTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        cache.clear()
+
+    def upload_worker(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            worker = Worker.objects.create(
+                name="photo", dob=date(1990, 1, 1), phone="1", photo=jpeg_upload(**kwargs)
+            )
+        worker.refresh_from_db()
+        return worker
+
+    def test_upload_is_replaced_by_processed_variants(self):
+        worker = self.upload_worker()
+
+        self.assertTrue(worker.photo_processed)
+        self.assertEqual(worker.photo.name, processed_photo_name(worker.photo_hash))
+        self.assertFalse(default_storage.exists("worker_photos/upload.jpg"))
+        for suffix in (".jpg", "_thumb.jpg", "_thumb.webp"):
+            self.assertTrue(default_storage.exists(processed_photo_name(worker.photo_hash, suffix)))
+        with default_storage.open(worker.photo.name) as fh:
+            self.assertEqual(Image.open(fh).size, (1024, 512))
+
+    def test_identical_uploads_share_files(self):
+        first = self.upload_worker(name="a.jpg")
+        second = self.upload_worker(name="b.jpg")
+        self.assertEqual(first.photo.name, second.photo.name)
+
+    def test_worker_photo_invalidates_rosters(self):
+        # Saved without running its commit hooks: process_photo alone below.
+        worker = Worker.objects.create(name="photo", dob=date(1990, 1, 1), phone="1", photo=jpeg_upload())
+        rosters.set("page", ["cached"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_photo("workers.Worker", worker.pk)
+
+        worker.refresh_from_db()
+        self.assertTrue(worker.photo_processed)
+        self.assertIsNone(rosters.get("page"))
+
+    def test_profile_photo_invalidates_the_cached_user(self):
+        user = User.objects.create_user("ravi", password="secret")
+        profile = UserProfile.objects.create(user=user, mobile="1", dob=date(1990, 1, 1), photo=jpeg_upload())
+        users.set(user_key(user.pk), "cached")
+        changes.backend.set(changes.make_key(user_key(user.pk)), 0, None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_photo("workers.UserProfile", profile.pk)
+
+        profile.refresh_from_db()
+        self.assertTrue(profile.photo_processed)
+        self.assertIsNone(users.get(user_key(user.pk)))
+        self.assertGreater(changes.read(user_key(user.pk))[0], 0)
+
+
+# ================= API =================
+class ApiTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/v1/workers/").status_code, 401)
+
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        self.assertEqual(self.client.get("/api/v1/workers/").status_code, 403)
+
+    def test_read_only(self):
+        self.assertEqual(self.client.post("/api/v1/workers/").status_code, 405)
+
+    def test_workers_are_paged_by_cursor(self):
+        ids = [worker.id for worker in make_workers(5)]
+
+        first = self.client.get("/api/v1/workers/", {"limit": 3}).json()
+        self.assertEqual([row["id"] for row in first["results"]], ids[:3])
+
+        second = self.client.get("/api/v1/workers/", {"limit": 3, "cursor": first["next"]}).json()
+        self.assertEqual([row["id"] for row in second["results"]], ids[3:])
+        self.assertIsNone(second["next"])
+
+    def test_unchanged_page_is_not_sent_again(self):
+        make_workers(2)
+        response = self.client.get("/api/v1/workers/")
+        again = self.client.get("/api/v1/workers/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+
+    def test_attendance_filters(self):
+        first, second = [worker.id for worker in make_workers(2)]
+        save_slot_attendance(1, {first: True, second: False}, day=date(2026, 1, 5))
+        save_slot_attendance(1, {first: True}, day=date(2026, 1, 6))
+
+        response = self.client.get(
+            "/api/v1/attendance/", {"start": "2026-01-05", "end": "2026-01-05", "present": "true"}
+        )
+        self.assertEqual(
+            [(row["worker_id"], row["date"]) for row in response.json()["results"]],
+            [(first, "2026-01-05")],
+        )
+
+    def test_bad_filter_is_a_json_error(self):
+        response = self.client.get("/api/v1/attendance/", {"start": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        self.ids = [worker.id for worker in make_workers(3)]
+        save_slot_attendance(1, {worker_id: True for worker_id in self.ids}, day=date(2026, 1, 5))
+        # All written in the same instant, past the safety lag.
+        self.stamp = timezone.now() - timedelta(minutes=1)
+        Attendance.objects.update(updated_at=self.stamp)
+
+    def test_watermark_round_trip(self):
+        self.assertEqual(decode_watermark(encode_watermark(self.stamp, 7)), (self.stamp, 7))
+        self.assertEqual(decode_watermark("2026-01-05T00:00:00+00:00")[1], 0)
+        with self.assertRaises(ValueError):
+            decode_watermark("not a watermark")
+
+    def test_pages_through_rows_with_the_same_timestamp(self):
+        seen = []
+        since = None
+        while True:
+            response = self.client.get("/api/v1/attendance/changes/", {"limit": 2, "since": since or ""}).json()
+            seen += [row["worker_id"] for row in response["results"]]
+            since = response["watermark"]
+            if not response["more"]:
+                break
+        self.assertEqual(seen, self.ids)
+
+        # Nothing new: the same watermark comes back.
+        response = self.client.get("/api/v1/attendance/changes/", {"since": since}).json()
+        self.assertEqual((response["results"], response["watermark"]), ([], since))
+
+    def test_an_update_shows_up_again(self):
+        since = encode_watermark(self.stamp, max(Attendance.objects.values_list("id", flat=True)))
+        save_slot_attendance(1, {self.ids[1]: False}, day=date(2026, 1, 5))
+
+        later = timezone.now() + timedelta(minutes=1)
+        rows = list(changes_since(decode_watermark(since), now=later))
+        self.assertEqual([(row["worker_id"], row["present"]) for row in rows], [(self.ids[1], False)])
+
+    def test_fresh_rows_are_held_back(self):
+        Attendance.objects.update(updated_at=timezone.now())
+        self.assertEqual(list(changes_since()), [])
+
+
+# ================= PERFORMANCE =================
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        perf.reset()
+        self.addCleanup(perf.reset)
+
+    def view(self, request):
+        for _ in range(perf.REPEAT_THRESHOLD):
+            list(Worker.objects.filter(pk=1))
+        return HttpResponse("ok")
+
+    def test_queries_are_counted_and_repeats_reported(self):
+        middleware = perf.PerformanceMiddleware(self.view)
+
+        with self.assertLogs("workers.perf", "INFO") as logs:
+            response = middleware(RequestFactory().get("/somewhere/"))
+
+        self.assertIn(f'desc="{perf.REPEAT_THRESHOLD} queries"', response["Server-Timing"])
+        self.assertTrue(any("Possible N+1 in unresolved" in line for line in logs.output))
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["queries"], perf.REPEAT_THRESHOLD)
+        self.assertEqual(perf.stats()["unresolved"]["requests"], 1)
+
+    def test_async_requests_are_counted(self):
+        async def view(request):
+            return await sync_to_async(self.view)(request)
+
+        middleware = perf.PerformanceMiddleware(view)
+        with self.assertLogs("workers.perf", "INFO"):
+            response = async_to_sync(middleware)(RequestFactory().get("/somewhere/"))
+        self.assertIn(f'desc="{perf.REPEAT_THRESHOLD} queries"', response["Server-Timing"])
+
+    def test_writes_are_not_reported_as_repeats(self):
+        recorder = perf.QueryRecorder()
+        recorder.statements["INSERT INTO t VALUES (%s)"] = 10
+        recorder.statements["SELECT 1"] = 1
+        self.assertEqual(recorder.repeated(), [])
+
+    def test_requests_are_grouped_by_url_name(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        with self.assertLogs("workers.perf", "INFO"):
+            response = self.client.get("/api/v1/workers/")
+            self.client.get("/api/v1/workers/")
+
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertEqual(perf.stats()["api_workers"]["requests"], 2)
+
+
+# ================= HOME =================
+class HomeViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        self.slot = Slot.objects.create(name="all day", start_time=time(0, 0), end_time=time(23, 59, 59))
+        self.ids = [worker.id for worker in make_workers(3)]
+
+    def test_saves_only_the_submitted_page(self):
+        first, second, third = self.ids
+        response = self.client.post("/", {"worker_ids": [first, second], f"present_{first}": "on"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            dict(Attendance.objects.filter(slot=self.slot.id).values_list("worker_id", "present")),
+            {first: True, second: False},
+        )
+
+        response = self.client.get("/")
+        self.assertEqual(response.context["marked"], {first})
+        self.assertEqual([worker.id for worker in response.context["workers"]], self.ids)
+
+    def test_non_staff_go_to_their_dashboard(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        self.assertRedirects(self.client.get("/"), "/user/", fetch_redirect_response=False)
+
+    def test_add_worker(self):
+        response = self.client.post("/add/", {"name": "New", "dob": "1990-01-31", "phone": "5", "email": ""})
+        self.assertRedirects(response, "/add/", fetch_redirect_response=False)
+        self.assertTrue(Worker.objects.filter(name="New", dob=date(1990, 1, 31)).exists())
+        self.assertContains(self.client.get("/add/"), "New")
+
+
+# ================= LOGIN =================
+@override_settings(CACHE_SHARED=True)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("ravi", password="secret", is_staff=True)
+        UserProfile.objects.create(user=self.user, mobile="1", dob=date(1990, 1, 1))
+        self.client.force_login(self.user)
+
+    def test_cache_holds_no_password_hash(self):
+        self.assertEqual(self.client.get("/profile/").status_code, 200)
+
+        entry = users.get(user_key(self.user.pk))
+        self.assertIsNotNone(entry)
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(entry))
+
+    def test_cached_user_keeps_the_session(self):
+        self.client.get("/profile/")
+        response = self.client.get("/profile/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.wsgi_request.user.is_staff)
+        self.assertEqual(response.wsgi_request.user.userprofile.mobile, "1")
+
+    def test_password_change_ends_the_session(self):
+        self.client.get("/profile/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("changed")
+            self.user.save()
+        self.assertRedirects(self.client.get("/profile/"), "/login/?next=/profile/", fetch_redirect_response=False)
+
+
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("supervisor", password="right")
+
+    def attempt(self, password, ip):
+        return self.client.post("/login/", {"username": "supervisor", "password": password}, REMOTE_ADDR=ip)
+
+    def test_failures_lock_out_only_their_address(self):
+        for _ in range(LOGIN_FAILURES_PER_USERNAME):
+            self.assertEqual(self.attempt("wrong", "10.0.0.1").status_code, 200)
+
+        self.assertEqual(self.attempt("right", "10.0.0.1").status_code, 429)
+        self.assertEqual(self.attempt("right", "10.0.0.2").status_code, 302)
+
+    def test_success_clears_the_count(self):
+        for _ in range(LOGIN_FAILURES_PER_USERNAME - 1):
+            self.attempt("wrong", "10.0.0.1")
+        self.assertEqual(self.attempt("right", "10.0.0.1").status_code, 302)
+        self.client.logout()
+        self.assertEqual(self.attempt("wrong", "10.0.0.1").status_code, 200)
+        self.assertEqual(self.attempt("right", "10.0.0.1").status_code, 302)
+
+
+# ================= DATABASE ROUTING =================
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(settings.DATABASES, {REPLICA: {}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reporting_reads_go_to_the_replica(self):
+        @reporting
+        def view():
+            return Attendance.objects.all().db, router.db_for_write(Attendance)
+
+        self.assertEqual(view(), (REPLICA, "default"))
+        self.assertEqual(Attendance.objects.all().db, "default")
+
+    def test_async_reporting_view(self):
+        @reporting
+        async def view():
+            return await sync_to_async(lambda: Attendance.objects.all().db)()
+
+        self.assertEqual(async_to_sync(view)(), REPLICA)
+
+    def test_primary_inside_reporting(self):
+        @primary
+        def cached_read():
+            return Attendance.objects.all().db
+
+        @reporting
+        def view():
+            return cached_read(), Attendance.objects.all().db
+
+        self.assertEqual(view(), ("default", REPLICA))
+
+    def test_pinned_queryset_keeps_its_database(self):
+        @reporting
+        def view():
+            return pin(Attendance.objects.all())
+
+        self.assertEqual(view().db, REPLICA)
+
+    def test_without_a_replica_everything_stays_on_the_primary(self):
+        del settings.DATABASES[REPLICA]
+
+        @reporting
+        def view():
+            return Attendance.objects.all().db
+
+        self.assertEqual(view(), "default")
+
+    def test_replica_is_never_migrated(self):
+        self.assertFalse(ReplicaRouter().allow_migrate(REPLICA, "workers"))
+        self.assertIsNone(ReplicaRouter().allow_migrate("default", "workers"))
+
+
+# ================= ATTENDANCE MATRIX =================
+class AttendanceMatrixTests(TestCase):
+    def setUp(self):
+        self.morning = Slot.objects.create(name="Morning", start_time=time(8), end_time=time(12))
+        self.evening = Slot.objects.create(name="Evening", start_time=time(17), end_time=time(21))
+        self.ann, self.bob = make_workers(2)
+        save_slot_attendance(self.morning.id, {self.ann.id: True, self.bob.id: False}, day=date(2026, 1, 1))
+        save_slot_attendance(self.evening.id, {self.ann.id: True}, day=date(2026, 1, 2))
+
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+
+    def filters(self, **params):
+        return parse_matrix_filters({"start": "2026-01-01", "end": "2026-01-03", **params})
+
+    def test_parse_filters(self):
+        filters = parse_matrix_filters({"start": "2026-02-10"})
+        self.assertEqual((filters["end"], filters["format"]), (date(2026, 2, 28), "html"))
+        self.assertEqual(matrix_filename(self.filters(format="pdf")), "attendance_matrix_2026-01-01_2026-01-03.pdf")
+
+        for params in ({"start": "2026-01-31", "end": "2026-01-01"}, {"end": "2026-05-01"}, {"format": "docx"}):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                self.filters(**params)
+
+    def test_cells_and_totals(self):
+        with self.assertNumQueries(3):
+            matrix = build_matrix(self.filters())
+
+        self.assertEqual(list(matrix.rows()), [
+            ("worker 0", ["P-", "-P", "--"], 2),
+            ("worker 1", ["A-", "--", "--"], 0),
+        ])
+        self.assertEqual(matrix.totals_by_day(), [1, 1, 0])
+        self.assertEqual(list(build_matrix(self.filters(slot=str(self.evening.id))).rows())[0][1], ["-", "P", "-"])
+
+    @override_settings(ATTENDANCE_PRESENCE_ONLY=True)
+    def test_presence_only_days_without_a_mark_are_absences(self):
+        today = date.today()
+        Worker.objects.filter(pk=self.ann.pk).update(created_at=timezone.now() - timedelta(days=10))
+        Worker.objects.filter(pk=self.bob.pk).update(created_at=timezone.now() - timedelta(days=1))
+        save_slot_attendance(self.morning.id, {self.ann.id: True}, day=today)
+
+        matrix = build_matrix(parse_matrix_filters({
+            "start": (today - timedelta(days=2)).isoformat(),
+            "end": (today + timedelta(days=1)).isoformat(),
+        }))
+
+        # Nothing before a worker joined the roster, nor after today.
+        self.assertEqual([cells for _, cells, _ in matrix.rows()], [
+            ["AA", "AA", "PA", "--"],
+            ["--", "AA", "AA", "--"],
+        ])
+
+    def test_html_and_csv(self):
+        params = {"start": "2026-01-01", "end": "2026-01-03"}
+        response = self.client.get("/display/matrix/", params)
+        self.assertContains(response, "<tr><th>worker 1</th><td>A-</td><td>--</td><td>--</td><td>0</td></tr>", html=True)
+
+        response = self.client.get("/display/matrix/", dict(params, format="csv"))
+        self.assertEqual(response.content.decode().splitlines(), [
+            "Worker,2026-01-01 Morning,2026-01-01 Evening,2026-01-02 Morning,2026-01-02 Evening,"
+            "2026-01-03 Morning,2026-01-03 Evening,Present",
+            "worker 0,P,-,-,P,-,-,2",
+            "worker 1,A,-,-,-,-,-,0",
+        ])
+
+    def test_pdf_is_rendered_by_the_report_worker(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        params = {"start": "2026-01-01", "end": "2026-01-03", "format": "pdf"}
+
+        response = self.client.get("/display/matrix/", params)
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, f"/download/{job.pk}/", target_status_code=202)
+
+        self.assertEqual(job.params["kind"], "matrix")
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.DONE, job.error)
+        self.assertTrue(job.file.name.endswith(".pdf"))
+        self.assertTrue(job.file.read().startswith(b"%PDF"))
+
+        response = self.client.get("/display/matrix/", params)
+        self.assertRedirects(response, f"/api/v1/reports/{job.pk}/download/", fetch_redirect_response=False)
+
+
+# ================= PARTITIONS =================
+class ArchiveMonthTests(TestCase):
+    january, february = date(2025, 1, 1), date(2025, 2, 1)
+
+    def setUp(self):
+        archive = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive)
+        self.enterContext(override_settings(
+            STORAGES=dict(settings.STORAGES, archive={
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": archive},
+            }),
+            ATTENDANCE_ARCHIVE_STORAGE="archive",
+        ))
+        cache.clear()
+
+        self.ann, self.bob = make_workers(2)
+        save_slot_attendance(1, {self.ann.id: True, self.bob.id: False}, day=date(2025, 1, 10))
+        save_slot_attendance(1, {self.ann.id: True}, day=date(2025, 2, 10))
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+
+    def maintain(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        try:
+            call_command("attendance_partitions", "maintain", "--archive", "--retain", "1", *args,
+                         stdout=stdout, stderr=stderr)
+        finally:
+            self.output = stdout.getvalue() + stderr.getvalue()
+
+    def test_archived_month_reads_back_from_its_file(self):
+        self.assertEqual(archive_month(self.january), (archive_name(self.january), 2))
+
+        self.assertFalse(Attendance.objects.filter(date__lt=self.february).exists())
+        self.assertEqual(
+            [(row["date"], int(row["worker_id"]), row["present"]) for row in iter_archived(self.january, date(2025, 1, 31))],
+            [(date(2025, 1, 10), self.ann.id, True), (date(2025, 1, 10), self.bob.id, False)],
+        )
+        self.assertEqual(offline_months(date(2024, 12, 1), date(2025, 3, 31)), [self.january])
+        self.assertNotIn(self.january, closed_months(retain=1))
+        with self.assertRaises(ValueError):
+            archive_month(self.january)
+
+    def test_detached_months_are_closed_only_for_archiving(self):
+        if not is_partitioned():
+            self.skipTest("Attendance is only partitioned on PostgreSQL.")
+        detach_partition(self.january)
+
+        self.assertEqual(closed_months(retain=1), [self.february])
+        self.assertEqual(closed_months(retain=1, detached=True), [self.january, self.february])
+        self.assertEqual(offline_months(None, None), [self.january])
+
+    def test_file_left_by_a_failed_run_is_replaced(self):
+        storage = archive_storage()
+        storage.save(archive_name(self.january), ContentFile(b"half a file"))
+
+        self.assertEqual(archive_month(self.january)[1], 2)
+        self.assertEqual(len(list(iter_archived(self.january, date(2025, 1, 31)))), 2)
+
+    def test_one_failed_month_does_not_stop_the_rest(self):
+        def archive(month):
+            if month == self.january:
+                raise OSError("storage unavailable")
+            return archive_month(month)
+
+        with mock.patch("workers.management.commands.attendance_partitions.archive_month", archive):
+            with self.assertRaisesMessage(CommandError, "1 month(s) failed: 2025-01"):
+                self.maintain()
+        self.assertIn("Failed 2025-01: storage unavailable", self.output)
+        self.assertIn("Archived 2025-02", self.output)
+
+        # The next run only has January left to do.
+        self.maintain()
+        self.assertIn("Archived 2025-01", self.output)
+        self.assertNotIn("2025-02", self.output)
+
+    def test_reports_refuse_archived_months(self):
+        archive_month(self.january)
+
+        response = self.client.get("/download/", {"start": "2025-01-01", "end": "2025-02-28", "format": "csv"})
+        self.assertContains(response, "2025-01 has been archived", status_code=400)
+        self.assertEqual(self.client.get("/api/v1/attendance/").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/attendance/", {"start": "2025-02-01"}).status_code, 200)
+        self.assertEqual(self.client.post("/api/v1/reports/", {"start": "2025-01-05"}).status_code, 400)
+
+    def test_dashboard_labels_archived_months(self):
+        UserProfile.objects.create(user=User.objects.create_user("ann", password="pw"), worker=self.ann,
+                                   mobile="1", dob=date(1990, 1, 1))
+        archive_month(self.january)
+
+        self.client.force_login(User.objects.get(username="ann"))
+        response = self.client.get("/user/", {"month": "2025-01"})
+        self.assertEqual(response.context["months"], [(self.february, False), (self.january, True)])
+        self.assertContains(response, "have been archived")
+
+
+# ================= SEARCH =================
+@mock.patch.dict("workers.search._trigram", {"default": False})
+class WorkerSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch("workers.search._index", None))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.anjali = Worker.objects.create(
+                name="Anjali Sharma", dob=date(1990, 1, 1), phone="9000000001", email="anjali@site.in"
+            )
+            Worker.objects.create(name="Anil Kumar", dob=date(1990, 1, 1), phone="9000000002")
+            Worker.objects.create(name="Bob Stone", dob=date(1990, 1, 1), phone="5550000")
+
+    def names(self, q, **kwargs):
+        return [row["name"] for row in search(q, **kwargs)]
+
+    def test_fuzzy_matches_best_first(self):
+        self.assertEqual(self.names("anjli sharma")[0], "Anjali Sharma")
+        self.assertEqual(self.names("anil")[0], "Anil Kumar")
+        self.assertEqual(self.names("9000000001")[0], "Anjali Sharma")
+        self.assertEqual(self.names("anjali@site"), ["Anjali Sharma"])
+        self.assertEqual(search("anjali")[0]["score"], 1.0)
+        self.assertEqual(self.names("a"), [])
+        self.assertEqual(len(search("90000000", limit=1)), 1)
+
+    def test_lookups_do_not_query_the_table(self):
+        search("anjali")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names("sharma"), ["Anjali Sharma"])
+
+    @override_settings(CACHE_SHARED=True)
+    def test_index_follows_roster_writes(self):
+        self.assertEqual(self.names("zebulon"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Worker.objects.create(name="Zebulon Quix", dob=date(1990, 1, 1), phone="1")
+            self.anjali.delete()
+
+        self.assertEqual(self.names("zebulon"), ["Zebulon Quix"])
+        self.assertEqual(self.names("anjali"), [])
+
+    @override_settings(CACHE_SHARED=False)
+    def test_unshared_index_is_rebuilt_after_its_ttl(self):
+        search("anjali")
+        # Written by another process: this one's clock doesn't move.
+        Worker.objects.bulk_create([Worker(name="Zorro Vega", dob=date(1990, 1, 1), phone="2")])
+        self.assertEqual(self.names("zorro"), [])
+
+        with mock.patch("workers.search.INDEX_TTL", 0):
+            self.assertEqual(self.names("zorro"), ["Zorro Vega"])
+
+    def test_typeahead_endpoint(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        response = self.client.get("/api/v1/workers/search/", {"q": "anjli", "limit": 1})
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.anjali.id])
+
+
+# ================= REPORT JOBS =================
+class ClaimJobTests(TestCase):
+    def job(self, key):
+        return ReportJob.objects.create(params_hash=key, params={"format": "pdf"})
+
+    def test_oldest_pending_job_first(self):
+        first, second = self.job("a"), self.job("b")
+
+        self.assertEqual(claim_job(), first.pk)
+        self.assertEqual(claim_job(), second.pk)
+        self.assertIsNone(claim_job())
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (ReportJob.RUNNING, 1))
+        self.assertIsNotNone(first.started_at)
+
+    def test_released_job_is_retried_until_out_of_attempts(self):
+        job = self.job("a")
+        for attempt in range(1, MAX_ATTEMPTS):
+            self.assertEqual(claim_job(), job.pk)
+            release_job(job.pk, "died")
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (ReportJob.PENDING, attempt))
+
+        self.assertEqual(claim_job(), job.pk)
+        release_job(job.pk, "died")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ReportJob.FAILED, "died"))
+        self.assertIsNone(claim_job())
+
+
+class RunJobTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.media = media
+        cache.clear()
+
+        self.worker = make_workers(1)[0]
+        save_slot_attendance(1, {self.worker.id: True}, day=date(2026, 1, 5))
+        self.user = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.filters = parse_report_filters({"start": "2026-01-01", "end": "2026-01-31"})
+
+    def test_renamed_workers_and_slots_get_a_new_report(self):
+        job, _ = enqueue_report(self.filters, self.user)
+        self.assertEqual(enqueue_report(self.filters, self.user), (job, False))
+
+        self.worker.name = "renamed"
+        self.worker.save()
+        renamed, created = enqueue_report(self.filters, self.user)
+        self.assertTrue(created)
+
+        ReportJob.objects.update(status=ReportJob.FAILED)
+        job, _ = enqueue_report(self.filters, self.user)
+        Slot.objects.create(name="Morning", start_time=time(8), end_time=time(12))
+        self.assertTrue(enqueue_report(self.filters, self.user)[1])
+
+    def test_job_taken_over_while_rendering_is_left_to_the_new_run(self):
+        job, _ = enqueue_report(self.filters, self.user)
+        self.assertEqual(claim_job(), job.pk)
+
+        def render_slowly(filters):
+            # The worker stalls past STALE_AFTER: another one takes the job.
+            requeue_stale(stale_after=timedelta(0))
+            self.assertEqual(claim_job(), job.pk)
+            return BytesIO(b"%PDF")
+
+        with mock.patch("workers.reports.render_job", render_slowly):
+            run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.file.name), (ReportJob.RUNNING, 2, ""))
+        # Nor is its file kept.
+        self.assertEqual([name for _, _, names in os.walk(self.media) for name in names], [])
+
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.DONE)
+
+    def test_browser_without_javascript_waits_on_the_job(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/download/", {"start": "2026-01-01", "end": "2026-01-31"})
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, f"/download/{job.pk}/", fetch_redirect_response=False)
+
+        # Reloading the status page reads the job; it never queues another.
+        save_slot_attendance(2, {self.worker.id: True}, day=date(2026, 1, 6))
+        response = self.client.get(f"/download/{job.pk}/")
+        self.assertEqual((response.status_code, response["Refresh"]), (202, "5"))
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+        run_job(claim_job())
+        response = self.client.get(f"/download/{job.pk}/")
+        self.assertRedirects(response, f"/api/v1/reports/{job.pk}/download/", fetch_redirect_response=False)
+
+
+# ================= CONDITIONAL GET =================
+@override_settings(CACHE_SHARED=True)
+class PageValidatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        self.slot = Slot.objects.create(name="All day", start_time=time(0), end_time=time(23, 59, 59))
+        self.workers = make_workers(2)
+        # The CSRF cookie is part of the ETag; let the first page set it.
+        self.client.get("/display/")
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_page_is_not_modified(self):
+        response = self.client.get("/display/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertIn("Last-Modified", response)
+
+        again = self.revalidate("/display/", response)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], response["ETag"])
+
+        # Another day's attendance doesn't change today's page.
+        with self.captureOnCommitCallbacks(execute=True):
+            save_slot_attendance(self.slot.id, {self.workers[0].id: True}, day=date(2020, 1, 1))
+        self.assertEqual(self.revalidate("/display/", response).status_code, 304)
+
+    def test_changed_page_is_sent_again(self):
+        response = self.client.get("/display/")
+        with self.captureOnCommitCallbacks(execute=True):
+            save_slot_attendance(self.slot.id, {self.workers[0].id: True})
+
+        again = self.revalidate("/display/", response)
+        self.assertEqual(again.status_code, 200)
+        self.assertNotEqual(again["ETag"], response["ETag"])
+        self.assertContains(again, self.workers[0].name)
+
+    def test_other_query_or_user_is_sent_again(self):
+        response = self.client.get("/display/")
+        self.assertEqual(self.revalidate("/display/?date=2020-01-01", response).status_code, 200)
+
+        self.client.force_login(User.objects.create_user("other", password="pw", is_staff=True))
+        self.assertEqual(self.revalidate("/display/", response).status_code, 200)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_no_validators_without_a_shared_cache(self):
+        response = self.client.get("/display/")
+        self.assertNotIn("ETag", response)
+        self.assertEqual(self.client.get("/display/", HTTP_IF_NONE_MATCH='"x"').status_code, 200)
@@ -1,14 +1,22 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
 
     path('add/', views.add_worker, name='add_worker'),
+    path('add/import/', views.import_workers_view, name='import_workers'),
+    path('add/export/', views.export_workers, name='export_workers'),
+
+    path('roster/', views.roster_window, name='roster_window'),
+
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('perf-stats/', views.perf_stats, name='perf_stats'),
 
     path('edit/<int:worker_id>/', views.edit_worker, name='edit_worker'),
 
     path('display/', views.display, name='display'),
+    path('display/matrix/', views.attendance_matrix, name='attendance_matrix'),
 
     path('manage-slots/', views.manage_slots, name='manage_slots'),
 
@@ -20,6 +28,18 @@ urlpatterns = [
 path('make-admin/', views.create_admin, name='create_admin'),
 path('edit/<int:id>/', views.edit_worker, name='edit_worker'),
 path('download/', views.download_attendance, name='download_attendance'),
+path('download/<int:job_id>/', views.report_status, name='report_status'),
 
     path('profile/', views.profile_view, name='profile'),
+
+    path('api/v1/workers/', api.workers, name='api_workers'),
+    path('api/v1/workers/search/', api.worker_search, name='api_worker_search'),
+    path('api/v1/slots/', api.slots, name='api_slots'),
+    path('api/v1/attendance/', api.attendance, name='api_attendance'),
+    path('api/v1/attendance/changes/', api.attendance_changes, name='api_attendance_changes'),
+    path('api/v1/attendance/sync/', api.attendance_sync, name='api_attendance_sync'),
+
+    path('api/v1/reports/', api.report_jobs, name='api_report_jobs'),
+    path('api/v1/reports/<int:job_id>/', api.report_job, name='api_report_job'),
+    path('api/v1/reports/<int:job_id>/download/', api.report_job_download, name='api_report_job_download'),
 ]
@@ -1,63 +1,214 @@
 from django.shortcuts import render, redirect
-from .models import Worker, Attendance, UserProfile, Slot
+from .models import Worker, Attendance, UserProfile, Slot, DailySlotSummary, WorkerMonthlySummary, ReportJob
+from .attendance import save_slot_attendance
+from .pagination import keyset_page, parse_cursor, parse_limit, search_workers
+from .slots import get_schedule
+from .exports import (
+    CONTENT_TYPES, aiter_report_rows, astream_csv, iter_report_rows,
+    parse_report_filters, report_filename, slot_names, stream_csv,
+)
+from .matrix import (
+    build_matrix, iter_matrix_csv_rows, iter_matrix_html_rows, matrix_csv_header, matrix_filename, matrix_legend,
+    parse_matrix_filters,
+)
+from .summaries import month_end, month_start, presence_only, worker_summary
+from .importers import EXPORT_HEADER, UNREADABLE_FILE_ERRORS, import_workers, iter_rows, iter_worker_rows
+from .partitions import offline_months, require_live
+from .perf import stats as perf_view_stats
+from .auth import login_allowed, login_failed, login_succeeded
+from .reports import enqueue_report, job_filename, job_filters
+from .routers import primary, reporting
+from .cache import (
+    changes, display_key, hashed, records as records_cache, rosters, shared, stats as cache_region_stats,
+    user_key, worker_key,
+)
+from asgiref.sync import sync_to_async
+from collections import defaultdict
 from datetime import date, datetime
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpResponse, HttpResponseForbidden
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotFound,
+    JsonResponse, StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+# ================= ROSTER HELPERS =================
+def roster_workers():
+    return Worker.objects.only("id", "name")
+
+
+async def aroster_page(request, queryset, name):
+    q = request.GET.get("q", "").strip()
+    after = parse_cursor(request.GET.get("after"))
+    before = parse_cursor(request.GET.get("before"))
+
+    # Picked from the typeahead: just that worker, not a page of the roster.
+    worker = parse_cursor(request.GET.get("worker"))
+    if worker is not None:
+        queryset = queryset.filter(pk=worker)
+
+    page = await rosters.aget_or_set(
+        f"{name}:{hashed(q, after, before, worker)}",
+        sync_to_async(lambda: keyset_page(search_workers(queryset, q), after=after, before=before)),
+    )
 
-# For PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+    return page, q
+
+
+def _present_ids(slot, worker_ids):
+    return Attendance.objects.filter(
+        date=date.today(),
+        slot=slot.id,
+        present=True,
+        worker_id__in=worker_ids,
+    ).values_list("worker_id", flat=True)
+
+
+async def amarked_present(slot, worker_ids):
+    return {worker_id async for worker_id in _present_ids(slot, worker_ids)}
+
+
+# ================= ASYNC HELPERS =================
+async def arequest_user(request):
+    """
+    Load the user without blocking the event loop, and keep it on
+    ``request.user`` so templates rendered afterwards don't query again.
+    """
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+arender = sync_to_async(render)
+
+
+# ================= CONDITIONAL GET =================
+def page_validators(request, stamps, *keys):
+    """
+    ETag and Last-Modified for a page built from data last changed at
+    ``stamps`` (``changes`` clock readings); ``keys`` are anything else
+    the page varies on. Returns (response, headers): a 304 when the
+    browser's copy is still current, else None, and the headers for the
+    full page.
+
+    Without a shared cache the readings only move in the process that
+    made the change, so no validators are sent at all.
+    """
+    if not shared():
+        return None, {}
+
+    etag = quote_etag(hashed(
+        settings.RELEASE,
+        # Every page shows the user in the nav bar, and forms embed the CSRF token.
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        request.get_full_path(),
+        *keys,
+        *stamps,
+    ))
+    last_modified = int(max(stamps))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        # Kept by the browser only, and revalidated on every load.
+        "Cache-Control": "private, no-cache",
+    }
+
+    response = None
+    # Flashed messages show once, so a page carrying them is always rendered.
+    if not len(messages.get_messages(request)):
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        validated(response, headers)
+    return response, headers
+
+
+def validated(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+    return response
 
 
 # ================= HOME (ADMIN ONLY) =================
 @login_required
-def home(request):
-    if not request.user.is_staff:
+async def home(request):
+    user = await arequest_user(request)
+    if not user.is_staff:
         return redirect("user_dashboard")
 
-    workers = Worker.objects.all()
-    active_slot = get_current_slot()
+    active_slot = await sync_to_async(get_current_slot)()
 
     if request.method == "POST":
 
         if active_slot is None:
-            return render(request, "home.html", {
-                "workers": workers,
+            page, q = await aroster_page(request, roster_workers(), "home")
+            return await arender(request, "home.html", {
+                "workers": page,
+                "page": page,
+                "q": q,
+                "marked": set(),
                 "active_slot": None,
                 "error": "Attendance can only be filled during active slot time!"
             })
 
-        slot = active_slot.id
+        # Only the workers rendered on the submitted page are written,
+        # so saving one page never overwrites marks made on another.
+        page_ids = [
+            worker_id for worker_id in map(parse_cursor, request.POST.getlist("worker_ids"))
+            if worker_id is not None
+        ]
+
+        marks = {
+            worker_id: f"present_{worker_id}" in request.POST
+            async for worker_id in Worker.objects.filter(id__in=page_ids).values_list("id", flat=True)
+        }
 
-        for worker in workers:
-            checkbox_name = f"present_{worker.id}"
-            present = checkbox_name in request.POST
+        result = await sync_to_async(save_slot_attendance)(active_slot.id, marks)
 
-            Attendance.objects.update_or_create(
-                worker=worker,
-                date=date.today(),
-                slot=slot,
-                defaults={"present": present}
-            )
+        changed = result["changed"].values()
+        if changed:
+            messages.success(request, (
+                f"Attendance saved: {sum(1 for new in changed if new)} marked present, "
+                f"{sum(1 for new in changed if not new)} marked absent."
+            ))
+        else:
+            messages.success(request, "No changes to save.")
+
+        return redirect(request.get_full_path())
 
-        return redirect("home")
+    page, q = await aroster_page(request, roster_workers(), "home")
 
-    return render(request, "home.html", {
-        "workers": workers,
-        "active_slot": active_slot
+    marked = set()
+    if active_slot:
+        marked = await amarked_present(active_slot, [w.id for w in page])
+
+    return await arender(request, "home.html", {
+        "workers": page,
+        "page": page,
+        "q": q,
+        "marked": marked,
+        "active_slot": active_slot,
+        "today": date.today(),
     })
 
 
 # ================= ADD WORKER (ADMIN ONLY) =================
 @login_required
-def add_worker(request):
-    if not request.user.is_staff:
+async def add_worker(request):
+    user = await arequest_user(request)
+    if not user.is_staff:
         return HttpResponseForbidden("You are not allowed here.")
 
     if request.method == "POST":
-        Worker.objects.create(
+        await Worker.objects.acreate(
             name=request.POST.get("name"),
             dob=request.POST.get("dob"),
             phone=request.POST.get("phone"),
@@ -66,37 +217,229 @@ def add_worker(request):
         )
         return redirect("add_worker")
 
-    workers = Worker.objects.all()
-    return render(request, "add_worker.html", {"workers": workers})
+    stamps = await changes.aread("rosters", user_key(user.pk))
+    not_modified, headers = page_validators(request, stamps)
+    if not_modified:
+        return not_modified
+
+    page, q = await aroster_page(request, Worker.objects.all(), "add_worker")
+
+    response = await arender(request, "add_worker.html", {
+        "workers": page,
+        "page": page,
+        "q": q,
+        "roster_version": stamps[0],
+    })
+    return validated(response, headers)
+
+
+# ================= BULK IMPORT / EXPORT (ADMIN ONLY) =================
+@login_required
+def import_workers_view(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    if request.method != "POST" or not request.FILES.get("file"):
+        return redirect("add_worker")
+
+    upload = request.FILES["file"]
+    try:
+        result = import_workers(
+            iter_rows(upload, upload.name),
+            skip_invalid=bool(request.POST.get("skip_invalid")),
+        )
+    except UNREADABLE_FILE_ERRORS:
+        messages.error(request, f"Import cancelled: {upload.name} is not a UTF-8 CSV or an .xlsx file.")
+        return redirect("add_worker")
+
+    if result.committed:
+        messages.success(request, f"Import finished: {result}.")
+    else:
+        messages.error(request, f"Import cancelled: {result}.")
+
+    for line, error in result.errors:
+        messages.warning(request, f"Row {line}: {error}")
+
+    return redirect("add_worker")
+
+
+@login_required
+def export_workers(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    response = StreamingHttpResponse(
+        stream_csv(iter_worker_rows(), header=EXPORT_HEADER),
+        content_type=CONTENT_TYPES["csv"],
+    )
+    response["Content-Disposition"] = f'attachment; filename="workers_{date.today()}.csv"'
+    return response
+
+
+# ================= ROSTER WINDOW (JSON, ADMIN ONLY) =================
+@login_required
+async def roster_window(request):
+    user = await arequest_user(request)
+    if not user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    q = request.GET.get("q", "").strip()
+    after = parse_cursor(request.GET.get("after"))
+    limit = parse_limit(request.GET.get("limit"))
+
+    page = await rosters.aget_or_set(
+        f"window:{hashed(q, after, limit)}",
+        sync_to_async(lambda: keyset_page(
+            search_workers(Worker.objects.values("id", "name", "phone", "photo"), q),
+            after=after,
+            limit=limit,
+        )),
+    )
+
+    active_slot = await sync_to_async(get_current_slot)()
+    marked = await amarked_present(active_slot, [row["id"] for row in page]) if active_slot else set()
+
+    results = [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "phone": row["phone"],
+            "photo": default_storage.url(row["photo"]) if row["photo"] else None,
+            "present": row["id"] in marked,
+        }
+        for row in page
+    ]
+
+    return JsonResponse({
+        "results": results,
+        "next": page.next_after,
+        "slot": active_slot.id if active_slot else None,
+    })
+
+
+# ================= CACHE STATS (JSON, ADMIN ONLY) =================
+@login_required
+def cache_stats(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    return JsonResponse({"regions": cache_region_stats()})
+
+
+# ================= PERF STATS (JSON, ADMIN ONLY) =================
+@login_required
+def perf_stats(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    return JsonResponse({"views": perf_view_stats()})
 
 
 # ================= DISPLAY / RECORDS (ADMIN ONLY) =================
 @login_required
-def display(request):
-    from datetime import date
-    from .models import Attendance, Slot
+@reporting
+async def display(request):
+    user = await arequest_user(request)
+    if not user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    try:
+        day = date.fromisoformat(request.GET.get("date", ""))
+    except ValueError:
+        day = date.today()
+
+    # Supervisors keep this page open and reload it all day; most reloads
+    # end here, before any query or template.
+    *data_stamps, user_stamp = await changes.aread("records", "rosters", display_key(day), user_key(user.pk))
+    not_modified, headers = page_validators(request, [*data_stamps, user_stamp], day)
+    if not_modified:
+        return not_modified
+
+    response = await arender(request, "blog/display.html", {
+        "today": day,
+        "data": await records_cache.aget_or_set(display_key(day), lambda: day_records(day)),
+        "data_version": hashed(day, *data_stamps),
+    })
+    return validated(response, headers)
 
-    today = date.today()
 
-    slots = Slot.objects.all()
+def present_names(day):
+    return Attendance.objects.filter(date=day, present=True).order_by("worker__name").values_list(
+        "slot", "worker__name"
+    )
+
+
+@primary
+async def day_records(day):
+    slots = [slot async for slot in Slot.objects.all()]
+
+    # One query for every present worker of the day, bucketed by slot here.
+    names = defaultdict(list)
+    async for slot, name in present_names(day):
+        names[slot].append(name)
+
+    # Per-slot totals come precomputed from the daily summary table.
+    counts = {
+        row["slot"]: row
+        async for row in DailySlotSummary.objects.filter(date=day).values(
+            "slot", "present_count", "absent_count"
+        )
+    }
+
+    # Without absent rows, everyone on that day's roster who isn't present
+    # is absent.
+    roster = await Worker.objects.filter(created_at__date__lte=day).acount() if presence_only() else None
 
     data = []
 
     for slot in slots:
-        records = Attendance.objects.filter(
-            date=today,
-            slot=slot.id,
-            present=True
-        ).select_related("worker")
-
+        totals = counts.get(slot.id, {})
+        present = totals.get("present_count", 0)
         data.append({
             "slot": slot,
-            "records": records
+            "records": names.get(slot.id, []),
+            "present": present,
+            "absent": roster - present if roster is not None else totals.get("absent_count", 0),
         })
 
-    return render(request, "blog/display.html", {
-        "today": today,
-        "data": data
+    return data
+
+
+@login_required
+@reporting
+async def attendance_matrix(request):
+    user = await arequest_user(request)
+    if not user.is_staff:
+        return HttpResponseForbidden("Not allowed")
+
+    try:
+        filters = parse_matrix_filters(request.GET)
+        await sync_to_async(require_live)(filters["start"], filters["end"])
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # Drawn by run_report_worker, like the report PDFs: a month of a large
+    # roster takes about a second.
+    if filters["format"] == "pdf":
+        return await aqueued_report(filters, user)
+
+    # HTML and CSV read the same matrix, built from one query.
+    matrix = await sync_to_async(build_matrix)(filters)
+    filename = matrix_filename(filters)
+
+    if filters["format"] == "csv":
+        # The matrix is already in memory, so there is nothing to stream.
+        rows = iter_matrix_csv_rows(matrix)
+        response = HttpResponse(stream_csv(rows, matrix_csv_header(matrix)), content_type=CONTENT_TYPES["csv"])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    return await arender(request, "blog/attendance_matrix.html", {
+        "filters": filters,
+        "matrix": matrix,
+        "rows": iter_matrix_html_rows(matrix),
+        "legend": matrix_legend(),
+        "slots": [slot async for slot in Slot.objects.order_by("start_time", "id").values_list("id", "name")],
     })
 
 
@@ -137,9 +480,17 @@ def login_view(request):
         password = request.POST.get("password")
         login_type = request.POST.get("login_type")
 
+        # Refused before authenticate() so a password-guessing storm
+        # never reaches the deliberately slow hash check.
+        if not login_allowed(request, username):
+            return render(request, "login.html", {
+                "error": "Too many failed attempts. Try again in a few minutes."
+            }, status=429)
+
         user = authenticate(request, username=username, password=password)
 
         if user is not None:
+            login_succeeded(request, username)
             login(request, user)
 
             if login_type == "admin":
@@ -154,6 +505,7 @@ def login_view(request):
             else:
                 return redirect("user_dashboard")
 
+        login_failed(request, username)
         return render(request, "login.html", {"error": "Invalid username or password"})
 
     return render(request, "login.html")
@@ -190,22 +542,23 @@ def register_view(request):
                 email=email or ""
             )
 
+            worker = Worker.objects.create(
+                name=name,
+                dob=dob or "2000-01-01",
+                phone=mobile,
+                email=email,
+                photo=photo
+            )
+
             UserProfile.objects.create(
                 user=user,
+                worker=worker,
                 mobile=mobile,
                 dob=dob or "2000-01-01",
                 photo=photo,
                 email=email
             )
 
-            Worker.objects.create(
-                name=name,
-                dob=dob or "2000-01-01",
-                phone=mobile,
-                email=email,
-                photo=photo
-            )
-
             return redirect("login")
 
         except Exception as e:
@@ -220,64 +573,138 @@ def register_view(request):
 @login_required
 def profile_view(request):
 
-    profile, created = UserProfile.objects.get_or_create(
-        user=request.user,
-        defaults={
-            "mobile": "",
-            "dob": "2000-01-01",
-        }
-    )
+    # The auth backend loads the profile together with the user.
+    try:
+        profile = request.user.userprofile
+    except UserProfile.DoesNotExist:
+        profile, created = UserProfile.objects.get_or_create(
+            user=request.user,
+            defaults={
+                "mobile": "",
+                "dob": "2000-01-01",
+            }
+        )
 
     if request.method == "POST":
 
+        # request.user may come from the cache: write only this form's
+        # fields, onto rows loaded now, so a newer password, is_active or
+        # worker link is never overwritten.
+        profile = UserProfile.objects.get(pk=profile.pk)
+        fields = ["dob", "email"]
+
         photo = request.FILES.get("photo")
         if photo:
             profile.photo = photo
+            fields.append("photo")
 
         profile.dob = request.POST.get("dob")
         profile.email = request.POST.get("email")
 
         if request.user.is_staff:
-            request.user.first_name = request.POST.get("name")
+            user = User.objects.get(pk=request.user.pk)
+            user.first_name = request.POST.get("name")
+            user.save(update_fields=["first_name"])
             profile.mobile = request.POST.get("mobile")
-            request.user.save()
+            fields.append("mobile")
 
-        profile.save()
+        profile.save(update_fields=fields)
         return redirect("profile")
 
     return render(request, "profile.html", {"profile": profile})
 
 
 # ================= USER DASHBOARD =================
+def user_profile(user):
+    return UserProfile.objects.select_related("worker").filter(user=user)
+
+
+def month_records(worker, month):
+    return Attendance.objects.filter(
+        worker=worker,
+        date__range=(month, month_end(month)),
+    ).order_by("-date", "slot").values_list("date", "slot", "present")
+
+
+def worker_months(worker):
+    return WorkerMonthlySummary.objects.filter(worker=worker).order_by("-month").values_list("month", flat=True)
+
+
+def linked_worker(user):
+    """
+    The worker behind a user account, by primary key through the profile.
+
+    Accounts created before the link existed fall back to one email
+    lookup and are linked on the way, so it only happens once.
+    """
+    profile = user_profile(user).first()
+
+    if profile and profile.worker:
+        return profile.worker
+
+    if not user.email:
+        return None
+
+    matches = list(Worker.objects.filter(email__iexact=user.email)[:2])
+    if len(matches) != 1:
+        return None
+
+    worker = matches[0]
+    if profile and not UserProfile.objects.filter(worker=worker).exists():
+        profile.worker = worker
+        profile.save(update_fields=["worker"])
+
+    return worker
+
+
 @login_required
-def user_dashboard(request):
+async def user_dashboard(request):
+    user = await arequest_user(request)
 
-    worker = Worker.objects.filter(email=request.user.email).first()
+    worker = await sync_to_async(linked_worker)(user)
 
     if not worker:
-        return render(request, "user_dashboard.html", {
+        return await arender(request, "user_dashboard.html", {
             "records": [],
             "error": "Your worker profile is not linked. Contact admin."
         })
 
-    records = Attendance.objects.filter(worker=worker).order_by("-date")
-
-    return render(request, "user_dashboard.html", {
-        "records": records
+    try:
+        month = date.fromisoformat(f"{request.GET.get('month')}-01")
+    except ValueError:
+        month = month_start(date.today())
+
+    # The streak and the default month roll over with the date.
+    stamps = await changes.aread("slots", "archives", worker_key(worker.id), user_key(user.pk))
+    not_modified, headers = page_validators(request, stamps, worker.id, month, date.today())
+    if not_modified:
+        return not_modified
+
+    records = month_records(worker, month)
+
+    names = await sync_to_async(slot_names)()
+
+    # Summaries outlive archiving, so the list still has archived months;
+    # they are labelled rather than shown as months without a mark.
+    months = [month async for month in worker_months(worker)]
+    archived = set(await sync_to_async(offline_months)(min(months + [month]), max(months + [month])))
+
+    response = await arender(request, "user_dashboard.html", {
+        "records": [
+            {"date": day, "slot": names.get(slot, slot), "present": present}
+            async for day, slot, present in records
+        ],
+        "month": month,
+        "months": [(m, m in archived) for m in months],
+        "archived": month in archived,
+        "summary": await sync_to_async(worker_summary)(worker.id),
     })
+    return validated(response, headers)
 
 
 # ================= SLOT HELPER =================
 def get_current_slot():
-    now = datetime.now().time()
-
-    slots = Slot.objects.filter(is_active=True)
-
-    for slot in slots:
-        if slot.start_time <= now <= slot.end_time:
-            return slot
-
-    return None
+    return get_schedule().active_at(datetime.now().time())
 
 
 # ================= MANAGE SLOTS =================
@@ -304,7 +731,10 @@ def manage_slots(request):
 
         return redirect("manage_slots")
 
-    return render(request, "manage_slots.html", {"slots": slots})
+    return render(request, "manage_slots.html", {
+        "slots": slots,
+        "overlaps": get_schedule().overlaps,
+    })
 @login_required
 
 @login_required
@@ -350,39 +780,73 @@ def create_admin(request):
 
     return HttpResponse("Send POST request with username & password")
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from django.http import HttpResponse
-
-@login_required
-def download_attendance(request):
-
-    today = date.today()
-
-    records = Attendance.objects.filter(date=today, present=True).select_related("worker")
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="attendance_{today}.pdf"'
+async def aqueued_report(filters, user):
+    """
+    Queue a file for run_report_worker and send the browser to it, or
+    to its status page until it is ready.
+    """
+    job, _ = await sync_to_async(enqueue_report)(filters, user)
+    if job.status == ReportJob.DONE:
+        return redirect("api_report_job_download", job.pk)
+    return redirect("report_status", job.pk)
 
-    p = canvas.Canvas(response, pagesize=A4)
 
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(200, 800, f"Attendance Report - {today}")
+@login_required
+async def report_status(request, job_id):
+    """
+    Where a browser without JavaScript waits for a queued file. Reloading
+    it only reads the job, where reloading the request that queued it
+    would queue a new one each time the data changed.
+    """
+    user = await arequest_user(request)
+    if not user.is_staff:
+        return HttpResponseForbidden("Not allowed")
 
-    y = 760
-    p.setFont("Helvetica", 12)
+    job = await ReportJob.objects.filter(pk=job_id).afirst()
+    if job is None:
+        return HttpResponseNotFound("No such report.")
+    if job.status == ReportJob.DONE:
+        return redirect("api_report_job_download", job.pk)
+    if job.status == ReportJob.FAILED:
+        return HttpResponse(f"The report failed: {job.error}", content_type="text/plain")
+
+    response = HttpResponse(
+        f"Preparing {job_filename(job_filters(job.params))}. This page reloads until the download starts.",
+        status=202,
+        content_type="text/plain",
+    )
+    response["Refresh"] = "5"
+    return response
 
-    if not records:
-        p.drawString(100, y, "No attendance marked today.")
-    else:
-        for r in records:
-            text = f"{r.worker.name}  |  Slot: {r.slot}"
-            p.drawString(100, y, text)
-            y -= 25
 
-            if y < 50:
-                p.showPage()
-                y = 800
+@login_required
+@reporting
+async def download_attendance(request):
+    user = await arequest_user(request)
+    if not user.is_staff:
+        return HttpResponseForbidden("Not allowed")
 
-    p.save()
-    return response
+    try:
+        filters = parse_report_filters(request.GET)
+        await sync_to_async(require_live)(filters["start"], filters["end"])
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    if filters["format"] == "csv":
+        filename = report_filename(filters)
+        # Each server streams its own kind of iterator; handing it the
+        # other kind makes Django buffer the whole export first.
+        if isinstance(request, ASGIRequest):
+            content = astream_csv(aiter_report_rows(filters))
+        else:
+            content = stream_csv(await sync_to_async(iter_report_rows)(filters))
+
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES["csv"])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    # PDF and Excel are rendered by run_report_worker. The report form
+    # queues them through the job API (static/js/report_jobs.js); without
+    # JavaScript the browser lands here.
+    return await aqueued_report(filters, user)